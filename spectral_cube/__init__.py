@@ -9,8 +9,9 @@ from .dask_spectral_cube import (DaskSpectralCube, DaskVaryingResolutionSpectral
 from .stokes_spectral_cube import StokesSpectralCube
 from .masks import (MaskBase, InvertedMask, CompositeMask,
                     BooleanArrayMask, LazyMask, LazyComparisonMask,
-                    FunctionMask)
-from .lower_dimensional_structures import (OneDSpectrum, Projection, Slice)
+                    FunctionMask, SlicedMask)
+from .lower_dimensional_structures import (OneDSpectrum, Projection, Slice,
+                                           SpectrumCollection)
 
 # Import the following sub-packages to make sure the I/O functions are registered
 from .io import casa_image
@@ -24,5 +25,5 @@ __all__ = ['SpectralCube', 'VaryingResolutionSpectralCube',
            'DaskSpectralCube', 'DaskVaryingResolutionSpectralCube',
             'StokesSpectralCube', 'CompositeMask', 'LazyComparisonMask',
             'LazyMask', 'BooleanArrayMask', 'FunctionMask',
-            'OneDSpectrum', 'Projection', 'Slice'
+            'OneDSpectrum', 'Projection', 'Slice', 'SpectrumCollection'
             ]
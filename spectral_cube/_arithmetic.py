@@ -0,0 +1,190 @@
+from __future__ import print_function, absolute_import, division
+
+import operator
+
+import numpy as np
+
+try:
+    import numexpr
+    NUMEXPR_INSTALLED = True
+except ImportError:
+    NUMEXPR_INSTALLED = False
+
+from . import cube_utils
+
+"""
+Lazily-evaluated arithmetic for cubes backed by numpy arrays.
+
+Arithmetic between cubes, or between a cube and a scalar or array, builds a
+tree of `LazyArithmeticArray` nodes instead of computing a new array for
+every operator.  The tree is only evaluated when data are requested, and then
+for just the requested view: in a single `numexpr` expression if it is
+installed, or by evaluating the operators on that view otherwise.  Requests
+for the whole array are evaluated in slabs of channels, so that the
+temporaries of the intermediate operators are never the size of the cube.
+"""
+
+_OPERATORS = {operator.add: '+',
+              operator.sub: '-',
+              operator.mul: '*',
+              operator.truediv: '/',
+              operator.pow: '**'}
+
+
+def _is_full_view(view):
+    if not isinstance(view, tuple):
+        view = (view,)
+    return all(item is Ellipsis or
+               (isinstance(item, slice) and item == slice(None))
+               for item in view)
+
+
+class FilledData(object):
+    """
+    The data of a cube with the masked values replaced by ``fill``, read only
+    for the views that are requested.
+    """
+
+    def __init__(self, cube, fill):
+        self._cube = cube
+        self._fill = fill
+        self.shape = cube.shape
+        self.ndim = cube.ndim
+        self.dtype = np.result_type(cube._data.dtype, np.float64)
+
+    def __getitem__(self, view):
+        return self._cube._get_filled_data(view=view, fill=self._fill)
+
+
+class LazyArithmeticArray(object):
+    """
+    An array-like node of a lazily-evaluated arithmetic expression.
+
+    Parameters
+    ----------
+    function : function
+        One of the operators in ``_OPERATORS``
+    operands : list
+        Scalars, arrays that broadcast to the shape of the result, or
+        array-like objects (such as other `LazyArithmeticArray` instances)
+        with the full shape that can be sliced.
+    """
+
+    # Make numpy arrays defer to the reflected operators below
+    __array_priority__ = 1000
+
+    def __init__(self, function, operands):
+        if function not in _OPERATORS:
+            raise ValueError("Unsupported lazy operator {0}".format(function))
+        self._function = function
+        self._operands = operands
+
+        self.shape = np.broadcast(*(np.broadcast_to(False, np.shape(operand))
+                                    for operand in operands)).shape
+        samples = [operand if np.ndim(operand) == 0
+                   else np.ones(1, dtype=operand.dtype)
+                   for operand in operands]
+        self.dtype = np.asarray(function(*samples)).dtype
+
+    @property
+    def ndim(self):
+        return len(self.shape)
+
+    @property
+    def size(self):
+        return int(np.prod(self.shape))
+
+    @property
+    def base(self):
+        return None
+
+    def _operand_view(self, operand, view):
+        if np.ndim(operand) == 0:
+            return operand
+        if isinstance(operand, np.ndarray):
+            return np.broadcast_to(operand, self.shape)[view]
+        if operand.shape == self.shape:
+            return operand[view]
+        return np.broadcast_to(np.asarray(operand), self.shape)[view]
+
+    def _leaves(self, leaves):
+        """
+        Collect the operands that are not expressions themselves, and the
+        numexpr string of the expression in terms of their names.
+        """
+        terms = []
+        for operand in self._operands:
+            if isinstance(operand, LazyArithmeticArray):
+                terms.append(operand._leaves(leaves))
+            else:
+                name = 'x{0}'.format(len(leaves))
+                leaves.append((name, operand))
+                terms.append(name)
+        return '({0} {1} {2})'.format(terms[0], _OPERATORS[self._function],
+                                      terms[1])
+
+    def _evaluate(self, view):
+        if NUMEXPR_INSTALLED and self.dtype.kind == 'f':
+            leaves = []
+            expression = self._leaves(leaves)
+            local_dict = {name: self._operand_view(operand, view)
+                          for name, operand in leaves}
+            if all(np.asarray(value).dtype.kind == 'f'
+                   for value in local_dict.values()):
+                result = numexpr.evaluate(expression, local_dict=local_dict)
+                return result.astype(self.dtype, copy=False)
+
+        return self._function(*(operand._evaluate(view)
+                                if isinstance(operand, LazyArithmeticArray)
+                                else self._operand_view(operand, view)
+                                for operand in self._operands))
+
+    def __getitem__(self, view):
+        if _is_full_view(view):
+            return self.__array__()
+        return np.asarray(self._evaluate(view))
+
+    def __array__(self, dtype=None):
+        """
+        Evaluate the whole expression, one slab of channels at a time.
+        """
+        out = np.empty(self.shape, dtype=self.dtype)
+        planesize = max(1, self.size // max(self.shape[0], 1))
+        nplanes = int(max(1, cube_utils.MEMORY_THRESHOLD // 10 //
+                          (planesize * self.dtype.itemsize)))
+        for start in range(0, self.shape[0], nplanes):
+            view = (slice(start, start + nplanes),)
+            out[view] = self._evaluate(view)
+        if dtype is not None:
+            return out.astype(dtype, copy=False)
+        return out
+
+    def astype(self, dtype):
+        return self.__array__(dtype=dtype)
+
+    def __add__(self, other):
+        return LazyArithmeticArray(operator.add, [self, other])
+
+    def __radd__(self, other):
+        return LazyArithmeticArray(operator.add, [other, self])
+
+    def __sub__(self, other):
+        return LazyArithmeticArray(operator.sub, [self, other])
+
+    def __rsub__(self, other):
+        return LazyArithmeticArray(operator.sub, [other, self])
+
+    def __mul__(self, other):
+        return LazyArithmeticArray(operator.mul, [self, other])
+
+    def __rmul__(self, other):
+        return LazyArithmeticArray(operator.mul, [other, self])
+
+    def __truediv__(self, other):
+        return LazyArithmeticArray(operator.truediv, [self, other])
+
+    def __rtruediv__(self, other):
+        return LazyArithmeticArray(operator.truediv, [other, self])
+
+    def __pow__(self, other):
+        return LazyArithmeticArray(operator.pow, [self, other])
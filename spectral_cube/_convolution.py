@@ -0,0 +1,615 @@
+from __future__ import print_function, absolute_import, division
+
+import numpy as np
+
+from astropy import convolution
+from astropy import units as u
+
+try:
+    import scipy.fft as _fft
+    _next_fast_len = _fft.next_fast_len
+    SCIPY_FFT = True
+except ImportError:
+    _fft = np.fft
+    SCIPY_FFT = False
+
+    def _next_fast_len(n):
+        return n
+
+try:
+    from scipy import ndimage
+    SCIPY_NDIMAGE = True
+except ImportError:
+    SCIPY_NDIMAGE = False
+
+from .cube_utils import MEMORY_THRESHOLD
+
+"""
+Convolution engines that apply a single kernel to many planes at once.
+
+`astropy.convolution.convolve_fft` recomputes the padded kernel transform and
+allocates new complex buffers on every call.  When the same kernel is applied
+to every channel of a cube, the kernel transform can be computed once and the
+planes can be transformed in batches that share a single padded buffer.
+Separable kernels (e.g., Gaussians aligned with the pixel grid) are instead
+applied as a sequence of 1D convolutions, one per axis.
+"""
+
+# keyword arguments of `~astropy.convolution.convolve_fft` that the engine
+# reproduces; any other keyword falls back to the astropy implementation
+_ENGINE_KWARGS = ('boundary', 'fill_value', 'nan_treatment', 'preserve_nan',
+                  'normalize_kernel')
+
+# boundary modes of `~astropy.convolution.convolve` and their
+# `scipy.ndimage` equivalents
+_BOUNDARY_MODES = {'fill': 'constant', 'extend': 'nearest', 'wrap': 'wrap'}
+
+# keyword arguments consumed by the cube's parallel application machinery
+_APPLY_KWARGS = ('num_cores', 'verbose', 'use_memmap', 'parallel',
+                 'memmap_dir', 'update_function')
+
+
+def fft_engine_supported(convolve, kwargs, extra_kwargs=_APPLY_KWARGS):
+    """
+    Determine whether a call to ``convolve(..., **kwargs)`` can be handled by
+    `FFTConvolver`.
+
+    Parameters
+    ----------
+    convolve : function
+        The convolution function requested by the user
+    kwargs : dict
+        The keyword arguments that would be passed to ``convolve``, possibly
+        mixed with those of
+        `~spectral_cube.SpectralCube.apply_function_parallel_spatial`
+    extra_kwargs : tuple
+        Keyword arguments that are accepted in addition to those handled by
+        the engine
+
+    Returns
+    -------
+    supported : bool
+    """
+    if convolve is not convolution.convolve_fft:
+        return False
+    if any(key not in _ENGINE_KWARGS + tuple(extra_kwargs) for key in kwargs):
+        return False
+    if kwargs.get('boundary', 'fill') != 'fill':
+        return False
+    if kwargs.get('nan_treatment', 'interpolate') not in ('interpolate', 'fill'):
+        return False
+    if not kwargs.get('normalize_kernel', True):
+        return False
+    return True
+
+
+def separable_factors(kernel, rtol=1e-10):
+    """
+    Factor a 2D kernel into two 1D kernels.
+
+    Parameters
+    ----------
+    kernel : `~astropy.convolution.Kernel` or `~numpy.ndarray`
+        The 1D or 2D kernel
+    rtol : float
+        The relative tolerance within which the outer product of the factors
+        must reproduce the kernel
+
+    Returns
+    -------
+    factors : tuple or None
+        The normalized ``(y, x)`` kernels whose outer product is the
+        normalized kernel, or `None` if the kernel is not separable or has an
+        even size.  A 1D kernel gives a single factor.
+    """
+    kernel = np.asarray(getattr(kernel, 'array', kernel), dtype='float')
+    if (kernel.ndim not in (1, 2) or not np.all(np.isfinite(kernel)) or
+            any(size % 2 == 0 for size in kernel.shape)):
+        return None
+
+    if kernel.ndim == 1:
+        if kernel.sum() == 0:
+            return None
+        return (kernel / kernel.sum(),)
+
+    peak = np.unravel_index(np.argmax(np.abs(kernel)), kernel.shape)
+    if kernel[peak] == 0:
+        return None
+    ky = kernel[:, peak[1]]
+    kx = kernel[peak[0], :] / kernel[peak]
+    if not np.allclose(np.outer(ky, kx), kernel, rtol=rtol,
+                       atol=rtol * np.abs(kernel[peak])):
+        return None
+
+    if ky.sum() == 0 or kx.sum() == 0:
+        return None
+    return ky / ky.sum(), kx / kx.sum()
+
+
+def engine_supported(convolve, kernel, kwargs, extra_kwargs=_APPLY_KWARGS):
+    """
+    Determine whether a call to ``convolve(..., kernel, **kwargs)`` can be
+    handled by `make_convolver`.
+
+    Parameters
+    ----------
+    convolve : function
+        The convolution function requested by the user
+    kernel : `~astropy.convolution.Kernel` or `~numpy.ndarray`
+        The 1D or 2D kernel
+    kwargs : dict
+        The keyword arguments that would be passed to ``convolve``
+    extra_kwargs : tuple
+        Keyword arguments that are accepted in addition to those handled by
+        the engines
+
+    Returns
+    -------
+    supported : bool
+    """
+    ndim = np.ndim(getattr(kernel, 'array', kernel))
+    if ndim == 2 and fft_engine_supported(convolve, kwargs,
+                                          extra_kwargs=extra_kwargs):
+        return True
+    if not SCIPY_NDIMAGE:
+        return False
+    if ndim == 1 and fft_engine_supported(convolve, kwargs,
+                                          extra_kwargs=extra_kwargs):
+        return separable_factors(kernel) is not None
+    if convolve is not convolution.convolve:
+        return False
+    if any(key not in _ENGINE_KWARGS + tuple(extra_kwargs) for key in kwargs):
+        return False
+    if kwargs.get('boundary', 'fill') not in _BOUNDARY_MODES:
+        return False
+    if not np.isfinite(kwargs.get('fill_value', 0.)):
+        return False
+    if kwargs.get('nan_treatment', 'interpolate') not in ('interpolate', 'fill'):
+        return False
+    if not kwargs.get('normalize_kernel', True):
+        return False
+    return separable_factors(kernel) is not None
+
+
+def make_convolver(convolve, kernel, shape=None, axes=None, workers=None,
+                   **kwargs):
+    """
+    Build the engine that reproduces ``convolve(img, kernel, **kwargs)``.
+    Check `engine_supported` first.
+
+    Separable kernels use `SeparableConvolver`; other kernels, which are only
+    supported for `~astropy.convolution.convolve_fft`, use `FFTConvolver`.
+
+    Parameters
+    ----------
+    convolve : function
+        `~astropy.convolution.convolve` or `~astropy.convolution.convolve_fft`
+    kernel : `~astropy.convolution.Kernel` or `~numpy.ndarray`
+        The 1D or 2D kernel
+    shape : tuple
+        The shape of the images to be convolved
+    axes : tuple
+        The axes along which the kernel is applied.  Defaults to the last
+        axes.
+    workers : int or None
+        The number of threads used by `FFTConvolver`
+    kwargs : dict
+        Passed to the engine
+    """
+    factors = separable_factors(kernel) if SCIPY_NDIMAGE else None
+    if axes is None:
+        axes = tuple(range(-np.ndim(getattr(kernel, 'array', kernel)), 0))
+    if convolve is convolution.convolve_fft:
+        if factors is None:
+            return FFTConvolver(kernel, shape, workers=workers, **kwargs)
+        # convolve_fft sets pixels without any valid data to zero
+        return SeparableConvolver(factors, axes, shape=shape,
+                                  empty_value=0., **kwargs)
+    if factors is None:
+        raise ValueError("The kernel is not separable.")
+    return SeparableConvolver(factors, axes, shape=shape, **kwargs)
+
+
+class SeparableConvolver(object):
+    """
+    Convolve arrays with a separable kernel as a sequence of 1D convolutions
+    using `scipy.ndimage.convolve1d`.  The cost per pixel scales with the sum,
+    rather than the product, of the kernel sizes.
+
+    The results match `~astropy.convolution.convolve` with the outer product
+    of the 1D kernels and ``normalize_kernel=True``.  Non-finite values are
+    handled by convolving the weights with the same kernels.
+
+    Parameters
+    ----------
+    factors : sequence of `~numpy.ndarray`
+        The odd-sized 1D kernels.  Each is normalized to unit sum.
+    axes : sequence of int
+        The axis along which each kernel is applied
+    shape : tuple, optional
+        The shape of the planes that are convolved, used by `batch_size`
+    boundary : 'fill', 'extend' or 'wrap'
+        How values outside of the array are treated, as for
+        `~astropy.convolution.convolve`
+    fill_value : float
+        The value assumed outside of the array for ``boundary='fill'``.  If
+        it is not finite, the convolution is renormalized at the edges.
+    nan_treatment : 'interpolate' or 'fill'
+        With 'interpolate', non-finite pixels are given zero weight and the
+        result is divided by the convolved weights.  With 'fill', they are
+        replaced by ``fill_value``.
+    preserve_nan : bool
+        Set pixels that were non-finite in the input back to NaN
+    empty_value : float
+        The value of pixels with no valid data within the kernel
+    normalize_kernel : True
+        The kernels are always normalized.
+    """
+
+    def __init__(self, factors, axes, shape=None, boundary='fill',
+                 fill_value=0., nan_treatment='interpolate', preserve_nan=False,
+                 empty_value=np.nan, normalize_kernel=True):
+
+        if not SCIPY_NDIMAGE:
+            raise ImportError("Scipy could not be imported: the separable "
+                              "convolution engine won't work.")
+        if boundary not in _BOUNDARY_MODES:
+            raise ValueError("boundary must be one of {0}"
+                             .format(sorted(_BOUNDARY_MODES)))
+        if not normalize_kernel:
+            raise ValueError("The kernel is always normalized.")
+        if nan_treatment not in ('interpolate', 'fill'):
+            raise ValueError("nan_treatment must be 'interpolate' or 'fill'")
+
+        self.factors = []
+        for factor in factors:
+            factor = np.asarray(factor, dtype='float')
+            if factor.ndim != 1 or factor.size % 2 == 0:
+                raise ValueError("The 1D kernels must have an odd size.")
+            self.factors.append(factor / factor.sum())
+        self.axes = tuple(axes)
+
+        self.shape = shape
+        self.mode = _BOUNDARY_MODES[boundary]
+        self.fill_value = fill_value
+        self.nan_treatment = nan_treatment
+        self.preserve_nan = preserve_nan
+        self.empty_value = empty_value
+
+    def batch_size(self, nplanes):
+        """
+        The number of planes to convolve at once, chosen to keep the
+        temporary arrays below `~spectral_cube.cube_utils.MEMORY_THRESHOLD`
+        elements.
+        """
+        per_plane = 3 * int(np.prod(self.shape)) if self.shape else 1
+        return int(max(1, min(nplanes, MEMORY_THRESHOLD // 10 // per_plane)))
+
+    def _passes(self, data, cval):
+        for factor, axis in zip(self.factors, self.axes):
+            data = ndimage.convolve1d(data, factor, axis=axis, mode=self.mode,
+                                      cval=cval, output=np.float64)
+        return data
+
+    def convolve(self, data, out=None, valid=None):
+        """
+        Convolve an array.
+
+        Parameters
+        ----------
+        data : `~numpy.ndarray`
+            The array to convolve
+        out : `~numpy.ndarray`, optional
+            An array with the same shape as ``data`` to write the result to
+        valid : `~numpy.ndarray`, optional
+            A boolean array; pixels where it is `False` are treated like
+            non-finite pixels.
+
+        Returns
+        -------
+        out : `~numpy.ndarray`
+        """
+        data = np.asarray(data)
+
+        finite_fill = np.isfinite(self.fill_value)
+        pad_value = self.fill_value if finite_fill else 0.
+        # Outside of the array, the weight is only zero for a non-finite fill
+        pad_weight = 1. if finite_fill or self.mode != 'constant' else 0.
+
+        bad = ~np.isfinite(data)
+        if valid is not None:
+            bad |= ~valid
+        anybad = bad.any()
+        renormalize = (self.nan_treatment == 'interpolate' and
+                       (anybad or pad_weight == 0))
+
+        if anybad:
+            replacement = (pad_value if self.nan_treatment == 'fill' else 0.)
+            data = np.where(bad, replacement, data)
+
+        conv = self._passes(data, pad_value)
+        if renormalize:
+            wt = self._passes((~bad).astype(np.float64), pad_weight)
+            small = wt < 10 * np.finfo(wt.dtype).eps
+            with np.errstate(divide='ignore', invalid='ignore'):
+                conv /= wt
+            conv[small] = self.empty_value
+
+        if self.preserve_nan and anybad:
+            conv[bad] = np.nan
+
+        if out is None:
+            return conv
+        out[...] = conv
+        return out
+
+
+class FFTConvolver(object):
+    """
+    Convolve a stack of images with a single 2D kernel using real FFTs.
+
+    The results match `~astropy.convolution.convolve_fft` with
+    ``boundary='fill'`` and ``normalize_kernel=True``.
+
+    Parameters
+    ----------
+    kernel : `~astropy.convolution.Kernel2D` or `~numpy.ndarray`
+        The convolution kernel.  It is normalized to unit sum.
+    shape : tuple
+        The ``(ny, nx)`` shape of the images to be convolved
+    fill_value : float
+        The value assumed outside of the image.  If it is not finite, the
+        convolution is renormalized at the image edges instead.
+    nan_treatment : 'interpolate' or 'fill'
+        With 'interpolate', non-finite pixels are given zero weight and the
+        result is divided by the convolved weights.  With 'fill', they are
+        replaced by ``fill_value``.
+    preserve_nan : bool
+        Set pixels that were non-finite in the input back to NaN
+    workers : int or None
+        Number of threads used by `scipy.fft`.  Ignored if `scipy.fft` is not
+        available.
+    boundary : 'fill'
+        Only the 'fill' boundary of `~astropy.convolution.convolve_fft` is
+        supported.
+    normalize_kernel : True
+        The kernel is always normalized.
+    """
+
+    def __init__(self, kernel, shape, fill_value=0., nan_treatment='interpolate',
+                 preserve_nan=False, workers=None, boundary='fill',
+                 normalize_kernel=True):
+
+        if boundary != 'fill':
+            raise ValueError("Only boundary='fill' is supported.")
+        if not normalize_kernel:
+            raise ValueError("The kernel is always normalized.")
+        if nan_treatment not in ('interpolate', 'fill'):
+            raise ValueError("nan_treatment must be 'interpolate' or 'fill'")
+
+        kernel = np.array(getattr(kernel, 'array', kernel), dtype='float')
+        if kernel.ndim != 2:
+            raise ValueError("The kernel must be two-dimensional.")
+        kernel[~np.isfinite(kernel)] = 0
+        kernel_sum = kernel.sum()
+        if kernel_sum == 0:
+            raise ValueError("The kernel can't be normalized, because its "
+                             "sum is zero.")
+        kernel /= kernel_sum
+
+        self.shape = tuple(shape)
+        self.fill_value = fill_value
+        self.nan_treatment = nan_treatment
+        self.preserve_nan = preserve_nan
+        self.workers = workers
+
+        # Padding by the full kernel size avoids any wrap-around
+        self.padded_shape = tuple(_next_fast_len(int(ns + nk - 1))
+                                  for ns, nk in zip(self.shape, kernel.shape))
+
+        # Place the kernel center at the origin of the padded array
+        bigkernel = np.zeros(self.padded_shape)
+        bigkernel[:kernel.shape[0], :kernel.shape[1]] = kernel
+        bigkernel = np.roll(bigkernel,
+                            (-(kernel.shape[0] // 2), -(kernel.shape[1] // 2)),
+                            axis=(0, 1))
+        self._kernel_fft = self._rfft(bigkernel)
+
+    def _rfft(self, arr):
+        if SCIPY_FFT:
+            return _fft.rfft2(arr, axes=(-2, -1), workers=self.workers)
+        return _fft.rfft2(arr, axes=(-2, -1))
+
+    def _irfft(self, arr):
+        if SCIPY_FFT:
+            return _fft.irfft2(arr, s=self.padded_shape, axes=(-2, -1),
+                               workers=self.workers)
+        return _fft.irfft2(arr, s=self.padded_shape, axes=(-2, -1))
+
+    def batch_size(self, nplanes):
+        """
+        The number of planes to transform at once, chosen to keep the padded
+        buffer (plus the corresponding weights) below
+        `~spectral_cube.cube_utils.MEMORY_THRESHOLD` elements.
+        """
+        per_plane = 2 * self.padded_shape[0] * self.padded_shape[1]
+        return int(max(1, min(nplanes, MEMORY_THRESHOLD // 10 // per_plane)))
+
+    def convolve(self, images, out=None):
+        """
+        Convolve a stack of images.
+
+        Parameters
+        ----------
+        images : `~numpy.ndarray`
+            An array of shape ``(n, ny, nx)`` or ``(ny, nx)``
+        out : `~numpy.ndarray`, optional
+            An array with the same shape as ``images`` to write the result to
+
+        Returns
+        -------
+        out : `~numpy.ndarray`
+        """
+        images = np.asarray(images)
+        if images.shape[-2:] != self.shape or images.ndim not in (2, 3):
+            raise ValueError("Image shape {0} does not match the shape {1} "
+                             "the convolver was built for."
+                             .format(images.shape, self.shape))
+
+        if out is None:
+            out = np.empty(images.shape, dtype='float')
+
+        if images.ndim == 2:
+            images = images[None]
+            outview = out[None]
+        else:
+            outview = out
+
+        ny, nx = self.shape
+        batch = self.batch_size(images.shape[0])
+        finite_fill = np.isfinite(self.fill_value)
+        pad_value = self.fill_value if finite_fill else 0.
+
+        buf = None
+        for start in range(0, images.shape[0], batch):
+            planes = images[start:start + batch]
+            nb = planes.shape[0]
+
+            bad = ~np.isfinite(planes)
+            anybad = bad.any()
+            renormalize = (self.nan_treatment == 'interpolate' and
+                           (anybad or not finite_fill))
+
+            if buf is None or buf.shape[0] != nb * (1 + renormalize):
+                buf = np.empty((nb * (1 + renormalize),) + self.padded_shape)
+
+            data = buf[:nb]
+            data.fill(pad_value)
+            data[:, :ny, :nx] = planes
+            if anybad:
+                if self.nan_treatment == 'fill':
+                    data[:, :ny, :nx][bad] = pad_value
+                else:
+                    data[:, :ny, :nx][bad] = 0
+
+            if renormalize:
+                # The weights are convolved in the same transform as the data.
+                # With a finite fill value, the padding has unit weight, so
+                # only the bad pixels need to be transformed.
+                weights = buf[nb:]
+                weights.fill(0)
+                if finite_fill:
+                    weights[:, :ny, :nx] = bad
+                else:
+                    weights[:, :ny, :nx] = ~bad
+
+            ft = self._rfft(buf)
+            ft *= self._kernel_fft
+            result = self._irfft(ft)
+
+            conv = result[:nb, :ny, :nx]
+            if renormalize:
+                wt = result[nb:, :ny, :nx]
+                if finite_fill:
+                    wt = 1 - wt
+                small = wt < 10 * np.finfo(wt.dtype).eps
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    conv = conv / wt
+                conv[small] = 0.0
+
+            if self.preserve_nan and anybad:
+                conv[bad] = np.nan
+
+            outview[start:start + nb] = conv
+
+        return out
+
+
+def _kernel_covariance(beam, pixscale):
+    """
+    The (xx, yy, xy) elements of the covariance matrix of a beam, in units of
+    pixels squared.  Unlike (major, minor, pa), these are continuous for
+    nearly round beams.
+    """
+    fwhm_to_sigma = 1. / np.sqrt(8 * np.log(2))
+    scale = pixscale.to(u.deg).value
+    smaj = beam.major.to(u.deg).value / scale * fwhm_to_sigma
+    smin = beam.minor.to(u.deg).value / scale * fwhm_to_sigma
+    theta = (beam.pa + 90 * u.deg).to(u.rad).value
+    cos, sin = np.cos(theta), np.sin(theta)
+    return np.array([smaj**2 * cos**2 + smin**2 * sin**2,
+                     smaj**2 * sin**2 + smin**2 * cos**2,
+                     (smaj**2 - smin**2) * sin * cos])
+
+
+def group_beam_kernels(target, beams, pixscale, goodbeams=None,
+                       allow_smaller=False, tolerance=0.):
+    """
+    Group channels that need the same kernel to be convolved to ``target``.
+
+    Each distinct beam is deconvolved only once, and deconvolved beams whose
+    kernels agree to within ``tolerance`` share a single kernel.
+
+    Parameters
+    ----------
+    target : `~radio_beam.Beam`
+        The beam to convolve to
+    beams : `~radio_beam.Beams`
+        The beam of each channel
+    pixscale : `~astropy.units.Quantity`
+        The angular size of a pixel
+    goodbeams : `~numpy.ndarray`, optional
+        A boolean array; channels where it is `False` are not convolved
+    allow_smaller : bool
+        If `False`, raise an exception when a beam can not be deconvolved
+        from ``target``.  Otherwise, leave these channels unconvolved.
+    tolerance : float
+        The largest difference between elements of the kernel covariance
+        matrices, relative to the larger of the x and y variances of the first
+        kernel of a group, for two kernels to be considered equal.
+
+    Returns
+    -------
+    kernels : list of `~astropy.convolution.Kernel2D`
+        The kernel of each group
+    groups : `~numpy.ndarray`
+        The index into ``kernels`` of each channel, or -1 for channels that
+        should not be convolved
+    """
+    if goodbeams is None:
+        goodbeams = np.ones(len(beams), dtype='bool')
+
+    groups = np.full(len(beams), -1, dtype='int')
+
+    # Deconvolve each distinct beam only once
+    channels_by_beam = {}
+    for ii, (bm, valid) in enumerate(zip(beams, goodbeams)):
+        if not valid or bm == target:
+            continue
+        key = (bm.major.to(u.deg).value, bm.minor.to(u.deg).value,
+               bm.pa.to(u.deg).value)
+        channels_by_beam.setdefault(key, (bm, []))[1].append(ii)
+
+    kernels = []
+    covariances = []
+    for bm, channels in channels_by_beam.values():
+        try:
+            deconvolved = target.deconvolve(bm)
+        except ValueError:
+            if allow_smaller:
+                continue
+            else:
+                raise
+
+        cov = _kernel_covariance(deconvolved, pixscale)
+        for igroup, ref in enumerate(covariances):
+            if np.all(np.abs(cov - ref) <= tolerance * max(ref[0], ref[1])):
+                break
+        else:
+            igroup = len(kernels)
+            kernels.append(deconvolved.as_kernel(pixscale))
+            covariances.append(cov)
+
+        groups[channels] = igroup
+
+    return kernels, groups
@@ -1,3 +1,5 @@
+import tempfile
+
 import numpy as np
 
 from astropy import units as u
@@ -6,10 +8,13 @@ from astropy.wcs import WCS
 from astropy.utils.console import ProgressBar
 import warnings
 
+from . import cube_utils
+from . import wcs_utils
 from .utils import BadVelocitiesWarning
-from .cube_utils import _map_context
 from .lower_dimensional_structures import VaryingResolutionOneDSpectrum, OneDSpectrum
-from .spectral_cube import VaryingResolutionSpectralCube
+from .masks import LazyMask
+from .spectral_cube import (BaseSpectralCube, VaryingResolutionSpectralCube,
+                            _reproject_kwargs, _reproject_tile)
 
 
 def fourier_shift(x, shift, axis=0, add_pad=False, pad_size=None):
@@ -127,59 +132,276 @@ def get_chunks(num_items, chunk):
     return chunks
 
 
-def _spectrum_shifter(inputs):
-    spec, shift, add_pad, pad_size = inputs
-    return fourier_shift(spec, shift, add_pad=add_pad, pad_size=pad_size)
+def _fourier_shift_block(spectra, shifts, pad_size=None):
+    '''
+    Shift a block of spectra in the Fourier plane at once.
 
+    This is equivalent to calling `fourier_shift` on each spectrum (column),
+    but the spectra are padded once, and transformed together with the
+    masks of those that contain NaNs, using one real FFT and a matrix of
+    per-spectrum phase ramps.
 
-def stack_spectra(cube, velocity_surface, v0=None,
-                  stack_function=np.nanmean,
-                  xy_posns=None, num_cores=1,
-                  chunk_size=-1,
-                  progressbar=False, pad_edges=True,
-                  vdiff_tol=0.01):
+    Parameters
+    ----------
+    spectra : np.ndarray
+        Array of shape ``(nchan, nspectra)``
+    shifts : np.ndarray
+        The shift, in pixels, of each spectrum
+    pad_size : tuple, optional
+        Number of channels to pad before and after the spectra.
+
+    Returns
+    -------
+    shifted : np.ndarray
+        The shifted (and padded) spectra.
     '''
-    Shift spectra in a cube according to a given velocity surface (peak
-    velocity, centroid, rotation model, etc.).
+    nanmask = ~np.isfinite(spectra)
+    nonan = np.where(nanmask, 0., spectra)
+    if pad_size is not None:
+        nonan = np.pad(nonan, (pad_size, (0, 0)), mode='constant',
+                       constant_values=0)
+        nanmask_padded = np.pad(nanmask, (pad_size, (0, 0)), mode='constant',
+                                constant_values=0)
+    else:
+        nanmask_padded = nanmask
+
+    nspectra = spectra.shape[1]
+    has_nan = nanmask.any(axis=0)
+
+    # The masks of the spectra with NaNs are shifted with the data
+    block = np.concatenate([nonan, nanmask_padded[:, has_nan]], axis=1)
+    block_shifts = np.concatenate([shifts, shifts[has_nan]])
+
+    nchan = block.shape[0]
+    phase = np.exp(-2j * np.pi * np.fft.rfftfreq(nchan)[:, None] *
+                   block_shifts[None, :])
+    block = np.fft.irfft(np.fft.rfft(block, axis=0) * phase, n=nchan, axis=0)
+
+    shifted = block[:, :nspectra]
+    shifted[:, has_nan] = np.where(block[:, nspectra:] > 0.5, np.nan,
+                                   shifted[:, has_nan])
+    shifted[:, nanmask.all(axis=0)] = np.nan
+
+    return shifted
+
+
+def _gather_shift_indices(nchan, shifts):
+    '''
+    Channel positions, in the unshifted spectra, sampled by each channel of
+    the spectra shifted by ``shifts``.  Non-finite shifts are set to zero and
+    returned as a mask.
+    '''
+    badshift = ~np.isfinite(shifts)
+    shifts = np.where(badshift, 0., shifts)
+    return np.arange(nchan)[:, None] - shifts[None, :], badshift
+
+
+def _roll_shift_block(spectra, shifts, pad_size=None):
+    '''
+    Shift a block of spectra by whole channels.
+
+    The shifts are rounded to the nearest integer, and the shifted spectra
+    are gathered with one fancy-indexing operation.  Like `np.roll`, channels
+    shifted past the edges wrap around.
 
     Parameters
     ----------
-    cube : SpectralCube
-        The cube
-    velocity_field : Quantity
-        A Quantity array with m/s or equivalent units
-    stack_function : function
-        A function that can operate over a list of numpy arrays (and accepts
-        ``axis=0``) to combine the spectra.  `numpy.nanmean` is the default,
-        though one might consider `numpy.mean` or `numpy.median` as other
-        options.
-    xy_posns : list, optional
-        List the spatial positions to include in the stack. For example,
-        if the data is masked by some criterion, the valid points can be given
-        as `xy_posns = np.where(mask)`.
-    num_cores : int, optional
-        Choose number of cores to run on. Defaults to 1.
-    chunk_size : int, optional
-        To limit memory usage, the shuffling of spectra can be done in chunks.
-        Chunk size sets the number of spectra that, if memory-mapping is used,
-        is the number of spectra loaded into memory. Defaults to -1, which is
-        all spectra.
-    progressbar : bool, optional
-        Print progress through every chunk iteration.
-    pad_edges : bool, optional
-        Pad the edges of the shuffled spectra to stop data from rolling over.
-        Default is True. The rolling over occurs since the FFT treats the
-        boundary as periodic. This should only be disabled if you know that
-        the velocity range exceeds the range that a spectrum has to be
-        shuffled to reach `v0`.
-    vdiff_tol : float, optional
-        Allowed tolerance for changes in the spectral axis spacing. Default
-        is 0.01, or 1%.
+    spectra : np.ndarray
+        Array of shape ``(nchan, nspectra)``
+    shifts : np.ndarray
+        The shift, in pixels, of each spectrum
+    pad_size : tuple, optional
+        Number of channels to pad before and after the spectra.
 
     Returns
     -------
-    stack_spec : OneDSpectrum
-        The stacked spectrum.
+    shifted : np.ndarray
+        The shifted (and padded) spectra.
+    '''
+    if pad_size is not None:
+        spectra = np.pad(spectra, (pad_size, (0, 0)), mode='constant',
+                         constant_values=0)
+    nchan = spectra.shape[0]
+
+    positions, badshift = _gather_shift_indices(nchan, shifts)
+    indices = np.round(positions).astype(int) % nchan
+    shifted = np.take_along_axis(spectra, indices, axis=0).astype(float)
+    shifted[:, badshift] = np.nan
+
+    return shifted
+
+
+def _linear_shift_block(spectra, shifts, pad_size=None):
+    '''
+    Shift a block of spectra by linear interpolation between channels.
+
+    Each shifted channel is interpolated from the two nearest unshifted
+    channels, so it is NaN if either of them is NaN (unless the shift is an
+    exact number of channels).  Like `np.roll`, channels shifted past the
+    edges wrap around.
+
+    Parameters
+    ----------
+    spectra : np.ndarray
+        Array of shape ``(nchan, nspectra)``
+    shifts : np.ndarray
+        The shift, in pixels, of each spectrum
+    pad_size : tuple, optional
+        Number of channels to pad before and after the spectra.
+
+    Returns
+    -------
+    shifted : np.ndarray
+        The shifted (and padded) spectra.
+    '''
+    if pad_size is not None:
+        spectra = np.pad(spectra, (pad_size, (0, 0)), mode='constant',
+                         constant_values=0)
+    nchan = spectra.shape[0]
+
+    positions, badshift = _gather_shift_indices(nchan, shifts)
+    lower = np.floor(positions)
+    weight = positions - lower
+    lower = lower.astype(int) % nchan
+
+    below = np.take_along_axis(spectra, lower, axis=0)
+    above = np.take_along_axis(spectra, (lower + 1) % nchan, axis=0)
+    shifted = np.where(weight == 0, below,
+                       below * (1 - weight) + above * weight)
+    shifted[:, badshift] = np.nan
+
+    return shifted
+
+
+_SHIFT_METHODS = {'fft': _fourier_shift_block,
+                  'roll': _roll_shift_block,
+                  'linear': _linear_shift_block}
+
+
+def _check_shift_method(method):
+    if method not in _SHIFT_METHODS:
+        raise ValueError("method must be one of {0}."
+                         .format(", ".join(sorted(_SHIFT_METHODS))))
+
+
+# Stacking functions that can be accumulated one block of spectra at a time,
+# as (ignore NaNs, divide by the number of spectra)
+_STREAMING_STACKS = {np.nanmean: (True, True),
+                     np.mean: (False, True),
+                     np.nansum: (True, False),
+                     np.sum: (False, False)}
+
+
+def _map_shifted_blocks(block_function, cube, xy_posns, pix_shifts, pad_size,
+                        method='fft', num_cores=1, chunk_size=-1,
+                        progressbar=False):
+    '''
+    Shift the spectra at ``xy_posns`` by ``pix_shifts`` in blocks, and apply
+    ``block_function(indices, shifted)`` to each block.
+
+    The spectra are read in slabs of whole rows of the cube and shifted in
+    blocks of up to ``chunk_size`` spectra with the shift kernel given by
+    ``method``.  With ``num_cores`` > 1, the slabs are handled by a pool of
+    threads.  Returns the results of ``block_function`` for every block.
+    '''
+    shift_block = _SHIFT_METHODS[method]
+
+    ys, xs = (np.asarray(posns) for posns in xy_posns)
+    nspectra = ys.size
+    if chunk_size == -1:
+        chunk_size = max(nspectra, 1)
+
+    # Read slabs of rows, skipping rows without any spectra to shift
+    order = np.argsort(ys, kind='stable')
+    nrows = int(max(1, cube_utils.MEMORY_THRESHOLD // 10 //
+                    (cube.shape[0] * cube.shape[2])))
+    slabs = []
+    start = 0
+    while start < nspectra:
+        stop = np.searchsorted(ys[order], ys[order[start]] + nrows)
+        slabs.append(order[start:stop])
+        start = stop
+
+    def map_slab(indices):
+        y0, x0 = ys[indices].min(), xs[indices].min()
+        view = (slice(None), slice(y0, ys[indices].max() + 1),
+                slice(x0, xs[indices].max() + 1))
+        data = np.asarray(cube._get_filled_data(view=view,
+                                                fill=cube._fill_value))
+
+        results = []
+        for block in range(0, indices.size, chunk_size):
+            members = indices[block:block + chunk_size]
+            shifted = shift_block(data[:, ys[members] - y0, xs[members] - x0],
+                                  pix_shifts[members], pad_size=pad_size)
+            results.append(block_function(members, shifted))
+        return results
+
+    if progressbar:
+        slabs = ProgressBar(slabs)
+
+    if num_cores is not None and num_cores > 1:
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=num_cores) as executor:
+            partials = list(executor.map(map_slab, slabs))
+    else:
+        partials = [map_slab(indices) for indices in slabs]
+
+    return [result for partial in partials for result in partial]
+
+
+def _stack_shifted_spectra(cube, xy_posns, pix_shifts, pad_size,
+                           stack_function=np.nanmean, **kwargs):
+    '''
+    Shift the spectra at ``xy_posns`` by ``pix_shifts`` and stack them.
+
+    Stacking functions in ``_STREAMING_STACKS`` are accumulated block by
+    block, so the memory use does not depend on the number of spectra;
+    other functions are applied to an array of all the shifted spectra.
+    Keyword arguments are passed to `_map_shifted_blocks`.
+    '''
+    nchan = cube.shape[0]
+    if pad_size is not None:
+        nchan += sum(pad_size)
+
+    if stack_function not in _STREAMING_STACKS:
+        all_shifted = np.empty((np.size(xy_posns[0]), nchan))
+
+        def fill_block(members, shifted):
+            all_shifted[members] = shifted.T
+
+        _map_shifted_blocks(fill_block, cube, xy_posns, pix_shifts, pad_size,
+                            **kwargs)
+        return stack_function(all_shifted, axis=0)
+
+    ignore_nan, average = _STREAMING_STACKS[stack_function]
+
+    def accumulate_block(members, shifted):
+        if ignore_nan:
+            finite = np.isfinite(shifted)
+            return (np.where(finite, shifted, 0).sum(axis=1),
+                    finite.sum(axis=1))
+        return shifted.sum(axis=1), members.size
+
+    partials = _map_shifted_blocks(accumulate_block, cube, xy_posns,
+                                   pix_shifts, pad_size, **kwargs)
+
+    total = sum((partial[0] for partial in partials), np.zeros(nchan))
+    if average:
+        count = sum((partial[1] for partial in partials), np.zeros(nchan))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return total / count
+    return total
+
+
+def _velocity_shifts(cube, velocity_surface, v0, xy_posns, pad_edges,
+                     vdiff_tol):
+    '''
+    Find the pixel shifts that move the velocities in ``velocity_surface`` at
+    ``xy_posns`` to ``v0``, and the padding needed to keep every shifted
+    spectrum from wrapping around.
+
+    Returns the shifts, the padding (or None) and the spectral unit.
     '''
 
     if not np.isfinite(velocity_surface).any():
@@ -191,10 +413,6 @@ def stack_spectra(cube, velocity_surface, v0=None,
         raise ValueError("Velocity surface map does not match cube spatial "
                          "dimensions.")
 
-    if xy_posns is None:
-        # Only compute where a shift can be found
-        xy_posns = np.where(np.isfinite(velocity_surface))
-
     if v0 is None:
         # Set to the mean velocity of the cube if not given.
         v0 = cube.spectral_axis.mean()
@@ -244,9 +462,6 @@ def stack_spectra(cube, velocity_surface, v0=None,
     pix_shifts = vdiff_sign * ((velocity_surface.to(vel_unit) -
                                 v0.to(vel_unit)) / vdiff).value[xy_posns]
 
-    # May a header copy so we can start altering
-    new_header = cube[:, 0, 0].header.copy()
-
     if pad_edges:
         # Enables padding the whole cube such that no spectrum will wrap around
         # This is critical if a low-SB component is far off of the bright
@@ -263,46 +478,98 @@ def stack_spectra(cube, velocity_surface, v0=None,
             # same for positive
             max_pos_shift = 0
 
-        # The total pixel size of the new spectral axis
-        num_vel_pix = cube.spectral_axis.size + max_pos_shift - max_neg_shift
-        new_header['NAXIS1'] = num_vel_pix
-
-        # Adjust CRPIX in header
-        new_header['CRPIX1'] += -max_neg_shift
-
         pad_size = (-max_neg_shift, max_pos_shift)
 
     else:
         pad_size = None
 
-    all_shifted_spectra = []
+    return pix_shifts, pad_size, vel_unit
 
-    if chunk_size == -1:
-        chunk_size = len(xy_posns[0])
 
-    # Create chunks of spectra for read-out.
-    chunks = get_chunks(len(xy_posns[0]), chunk_size)
-    if progressbar:
-        iterat = ProgressBar(chunks)
-    else:
-        iterat = chunks
+def stack_spectra(cube, velocity_surface, v0=None,
+                  stack_function=np.nanmean,
+                  xy_posns=None, num_cores=1,
+                  chunk_size=-1,
+                  progressbar=False, pad_edges=True,
+                  vdiff_tol=0.01, method='fft'):
+    '''
+    Shift spectra in a cube according to a given velocity surface (peak
+    velocity, centroid, rotation model, etc.).
+
+    Parameters
+    ----------
+    cube : SpectralCube
+        The cube
+    velocity_field : Quantity
+        A Quantity array with m/s or equivalent units
+    stack_function : function
+        A function that can operate over a list of numpy arrays (and accepts
+        ``axis=0``) to combine the spectra.  `numpy.nanmean` is the default,
+        though one might consider `numpy.mean` or `numpy.median` as other
+        options.
+    xy_posns : list, optional
+        List the spatial positions to include in the stack. For example,
+        if the data is masked by some criterion, the valid points can be given
+        as `xy_posns = np.where(mask)`.
+    num_cores : int, optional
+        Choose number of threads used to shift the slabs of spectra read from
+        the cube. Defaults to 1.
+    chunk_size : int, optional
+        To limit memory usage, the shuffling of spectra is done in chunks.
+        Chunk size sets the number of spectra shifted together in one FFT.
+        Defaults to -1, which is all of the spectra in a slab of the cube.
+        The mean and sum stacking functions (`numpy.mean`, `numpy.nanmean`,
+        `numpy.sum` and `numpy.nansum`) are accumulated chunk by chunk, so
+        the shifted spectra are never all held in memory at once.
+    progressbar : bool, optional
+        Print progress through every slab of the cube.
+    pad_edges : bool, optional
+        Pad the edges of the shuffled spectra to stop data from rolling over.
+        Default is True. The rolling over occurs since the FFT treats the
+        boundary as periodic. This should only be disabled if you know that
+        the velocity range exceeds the range that a spectrum has to be
+        shuffled to reach `v0`.
+    vdiff_tol : float, optional
+        Allowed tolerance for changes in the spectral axis spacing. Default
+        is 0.01, or 1%.
+    method : {'fft', 'linear', 'roll'}, optional
+        How the spectra are shifted.  'fft' (the default) shifts them exactly
+        in the Fourier plane; 'linear' interpolates linearly between
+        channels; 'roll' rounds the shifts to whole channels, which is
+        fastest and is exact when the shifts are integers.
 
-    for i, chunk in enumerate(iterat):
+    Returns
+    -------
+    stack_spec : OneDSpectrum
+        The stacked spectrum.
+    '''
 
-        gen = ((cube.filled_data[:, y, x].value, shift, pad_edges, pad_size)
-               for y, x, shift in
-               zip(xy_posns[0][chunk], xy_posns[1][chunk], pix_shifts[chunk]))
+    _check_shift_method(method)
 
-        with _map_context(num_cores) as map:
+    if xy_posns is None:
+        # Only compute where a shift can be found
+        xy_posns = np.where(np.isfinite(velocity_surface))
 
-            shifted_spectra = map(_spectrum_shifter, gen)
+    pix_shifts, pad_size, vel_unit = \
+        _velocity_shifts(cube, velocity_surface, v0, xy_posns, pad_edges,
+                         vdiff_tol)
 
-            all_shifted_spectra.extend([out for out in shifted_spectra])
+    # May a header copy so we can start altering
+    new_header = cube[:, 0, 0].header.copy()
+
+    if pad_size is not None:
+        # The total pixel size of the new spectral axis
+        new_header['NAXIS1'] = cube.spectral_axis.size + sum(pad_size)
 
-    shifted_spectra_array = np.array(all_shifted_spectra)
-    assert shifted_spectra_array.ndim == 2
+        # Adjust CRPIX in header
+        new_header['CRPIX1'] += pad_size[0]
 
-    stacked = stack_function(shifted_spectra_array, axis=0)
+    stacked = _stack_shifted_spectra(cube, xy_posns, pix_shifts, pad_size,
+                                     stack_function=stack_function,
+                                     num_cores=num_cores,
+                                     chunk_size=chunk_size,
+                                     progressbar=progressbar,
+                                     method=method)
 
     if hasattr(cube, 'beams'):
         stack_spec = VaryingResolutionOneDSpectrum(stacked, unit=cube.unit,
@@ -319,10 +586,110 @@ def stack_spectra(cube, velocity_surface, v0=None,
     return stack_spec
 
 
-def stack_cube(cube, linelist, vmin, vmax, average=np.nanmean, convolve_beam=None):
+def shuffle_cube(cube, velocity_surface, v0=None, xy_posns=None,
+                 num_cores=1, chunk_size=-1, progressbar=False,
+                 pad_edges=True, vdiff_tol=0.01, method='fft',
+                 use_memmap=True, memmap_dir=None):
+    '''
+    Shift every spectrum in a cube according to a given velocity surface,
+    returning the velocity-aligned ("shuffled") cube.
+
+    The spectra are shifted in the same way as in `stack_spectra`, but are
+    kept instead of being combined.
+
+    Parameters
+    ----------
+    cube : SpectralCube
+        The cube
+    velocity_surface : Quantity
+        A Quantity array with m/s or equivalent units
+    v0 : Quantity, optional
+        The velocity the spectra are shifted to.  Defaults to the mean of the
+        spectral axis.
+    xy_posns : list, optional
+        List the spatial positions to shift. The other spectra are set to
+        NaN.  Defaults to all of the positions with a finite velocity.
+    num_cores : int, optional
+        Choose number of threads used to shift the slabs of spectra read from
+        the cube. Defaults to 1.
+    chunk_size : int, optional
+        The number of spectra shifted together.  Defaults to -1, which is all
+        of the spectra in a slab of the cube.
+    progressbar : bool, optional
+        Print progress through every slab of the cube.
+    pad_edges : bool, optional
+        Pad the edges of the shuffled spectra to stop data from rolling over.
+        Default is True.
+    vdiff_tol : float, optional
+        Allowed tolerance for changes in the spectral axis spacing. Default
+        is 0.01, or 1%.
+    method : {'fft', 'linear', 'roll'}, optional
+        How the spectra are shifted.  See `stack_spectra`.
+    use_memmap : bool, optional
+        If specified, the shuffled cube will be written to a memory-mapped
+        temporary file on disk rather than kept in memory.
+    memmap_dir : str, optional
+        The directory in which to create the memory-mapped file.
+
+    Returns
+    -------
+    shuffled : SpectralCube
+        The cube of shifted spectra.
+    '''
+
+    _check_shift_method(method)
+
+    if isinstance(cube, VaryingResolutionSpectralCube):
+        raise ValueError("VaryingResolutionSpectralCubes must be "
+                         "convolved to a common resolution with "
+                         "`convolve_to` before shuffling.")
+
+    if xy_posns is None:
+        xy_posns = np.where(np.isfinite(velocity_surface))
+
+    pix_shifts, pad_size, _ = \
+        _velocity_shifts(cube, velocity_surface, v0, xy_posns, pad_edges,
+                         vdiff_tol)
+
+    wcs = cube.wcs.deepcopy()
+    shape = cube.shape
+    if pad_size is not None:
+        wcs.wcs.crpix[2] += pad_size[0]
+        shape = (shape[0] + sum(pad_size),) + shape[1:]
+
+    if use_memmap:
+        ntf = tempfile.NamedTemporaryFile(dir=memmap_dir)
+        shuffled = np.memmap(ntf, mode='w+', shape=shape, dtype='float64')
+    else:
+        shuffled = np.empty(shape, dtype='float64')
+    shuffled[:] = np.nan
+
+    ys, xs = (np.asarray(posns) for posns in xy_posns)
+
+    def fill_block(members, shifted):
+        shuffled[:, ys[members], xs[members]] = shifted
+
+    _map_shifted_blocks(fill_block, cube, xy_posns, pix_shifts, pad_size,
+                        method=method, num_cores=num_cores,
+                        chunk_size=chunk_size, progressbar=progressbar)
+
+    mask = LazyMask(np.isfinite, data=shuffled, wcs=wcs)
+
+    return cube._new_cube_with(data=shuffled, wcs=wcs, mask=mask)
+
+
+def stack_cube(cube, linelist, vmin, vmax, average=np.nanmean,
+               convolve_beam=None, num_cores=None, use_memmap=True,
+               memmap_dir=None):
     """
     Create a stacked cube by averaging on a common velocity grid.
 
+    The spectral slab around each line is linearly interpolated onto the
+    velocity grid of the first line one channel at a time, so only a plane
+    of each line is held in memory.  `numpy.nanmean`, `numpy.mean`,
+    `numpy.nansum` and `numpy.sum` are accumulated line by line; other
+    functions are applied to the stack of one channel from every line.
+
     Parameters
     ----------
     cube : SpectralCube
@@ -341,39 +708,277 @@ def stack_cube(cube, linelist, vmin, vmax, average=np.nanmean, convolve_beam=Non
         If the cube is a VaryingResolutionSpectralCube, a convolution beam is
         required to put the cube onto a common grid prior to spectral
         interpolation.
-    """
+    num_cores : int or None
+        The number of threads to use to compute the output channels.
+        Defaults to one.
+    use_memmap : bool
+        If specified, the stacked cube will be written to a memory-mapped
+        temporary file on disk rather than kept in memory.
+    memmap_dir : str, optional
+        The directory in which to create the memory-mapped file.
 
-    line_cube = cube.with_spectral_unit(u.km/u.s,
-                                        velocity_convention='radio',
-                                        rest_value=linelist[0])
-    if isinstance(line_cube, VaryingResolutionSpectralCube):
-        if convolve_beam is None:
-            raise ValueError("When stacking VaryingResolutionSpectralCubes, "
-                             "you must specify a target beam size with the "
-                             "keyword `convolve_beam`")
-        reference_cube = line_cube.spectral_slab(vmin, vmax).convolve_to(convolve_beam)
-    else:
-        reference_cube = line_cube.spectral_slab(vmin, vmax)
-
-    cutout_cubes = [reference_cube.filled_data[:].value]
+    Returns
+    -------
+    stacked : SpectralCube
+        The stacked cube, on the spectral grid of the first line.
+    """
 
-    for restval in linelist[1:]:
+    line_cubes = []
+    for restval in linelist:
         line_cube = cube.with_spectral_unit(u.km/u.s,
                                             velocity_convention='radio',
                                             rest_value=restval)
         line_cutout = line_cube.spectral_slab(vmin, vmax)
 
         if isinstance(line_cube, VaryingResolutionSpectralCube):
+            if convolve_beam is None:
+                raise ValueError("When stacking VaryingResolutionSpectralCubes, "
+                                 "you must specify a target beam size with the "
+                                 "keyword `convolve_beam`")
             line_cutout = line_cutout.convolve_to(convolve_beam)
 
-        regridded = line_cutout.spectral_interpolate(reference_cube.spectral_axis)
+        line_cubes.append(line_cutout)
+
+    reference_cube = line_cubes[0]
+    spectral_grid = reference_cube.spectral_axis
+
+    # The channels of each line on either side of each output channel
+    line_weights = []
+    for line_cutout in line_cubes:
+        inaxis = line_cutout.spectral_axis.to(spectral_grid.unit).value
+        reverse = inaxis.size > 1 and inaxis[1] < inaxis[0]
+        lower, upper, weight, _ = \
+            cube_utils.linear_interpolation_weights(spectral_grid.value,
+                                                    inaxis[::-1] if reverse
+                                                    else inaxis)
+        if reverse:
+            lower, upper = inaxis.size - 1 - lower, inaxis.size - 1 - upper
+        line_weights.append((lower, upper, weight))
+
+    shape = reference_cube.shape
+    if use_memmap:
+        ntf = tempfile.NamedTemporaryFile(dir=memmap_dir)
+        stacked = np.memmap(ntf, mode='w+', shape=shape, dtype='float64')
+    else:
+        stacked = np.empty(shape, dtype='float64')
+
+    def line_plane(line_cutout, weights, channel):
+        lower, upper, weight = (wts[channel] for wts in weights)
+        plane = np.asarray(line_cutout._get_filled_data(view=(lower,),
+                                                        fill=np.nan),
+                           dtype='float64')
+        if weight == 0:
+            return plane
+        upper_plane = np.asarray(line_cutout._get_filled_data(view=(upper,),
+                                                              fill=np.nan))
+        return plane * (1 - weight) + upper_plane * weight
+
+    def stack_channels(channels):
+        for channel in channels:
+            planes = (line_plane(line_cutout, weights, channel)
+                      for line_cutout, weights in zip(line_cubes,
+                                                      line_weights))
+
+            if average not in _STREAMING_STACKS:
+                stacked[channel] = average(np.array(list(planes)), axis=0)
+                continue
+
+            ignore_nan, mean = _STREAMING_STACKS[average]
+            total = np.zeros(shape[1:])
+            count = np.zeros(shape[1:]) if ignore_nan else len(line_cubes)
+            for plane in planes:
+                if ignore_nan:
+                    finite = np.isfinite(plane)
+                    total += np.where(finite, plane, 0)
+                    count += finite
+                else:
+                    total += plane
+            if mean:
+                with np.errstate(invalid='ignore', divide='ignore'):
+                    total /= count
+            stacked[channel] = total
+
+    if num_cores is not None and num_cores > 1:
+        from concurrent.futures import ThreadPoolExecutor
+        blocks = np.array_split(np.arange(shape[0]), num_cores)
+        with ThreadPoolExecutor(max_workers=num_cores) as executor:
+            list(executor.map(stack_channels, blocks))
+    else:
+        stack_channels(range(shape[0]))
+
+    mask = LazyMask(np.isfinite, data=stacked, wcs=reference_cube.wcs)
+
+    return reference_cube._new_cube_with(data=stacked, mask=mask)
+
+
+def _positive(weight):
+    return weight > 0
 
-        cutout_cubes.append(regridded.filled_data[:].value)
 
-    stacked_cube = average(cutout_cubes, axis=0)
+def mosaic_cubes(cubes, header, weights=None, order='bilinear',
+                 num_cores=None, use_memmap=True, memmap_dir=None):
+    """
+    Combine overlapping cubes onto a common grid as their weighted average.
+
+    The output is built one spatial tile at a time.  For each tile, the
+    part of each cube that overlaps it is read and reprojected with
+    `SpectralCube.reproject`'s tiling, and the weighted sum of the data and
+    the sum of the weights are accumulated.  With ``num_cores`` threads, each
+    thread holds a single output tile (and one input subcube) at a time.
+
+    Parameters
+    ----------
+    cubes : list of SpectralCube
+        The cubes to combine.  Their units must be convertible to the unit of
+        the first cube.
+    header : `astropy.io.fits.Header`
+        A header specifying the output cube in valid WCS
+    weights : list, optional
+        The weight of each cube, e.g. its inverse noise variance or its
+        primary beam response.  Each can be a number, a 2D array (or
+        `~spectral_cube.lower_dimensional_structures.Projection`) on the
+        spatial grid of the cube, a 3D array with the shape of the cube, or a
+        cube with the same shape and WCS as the cube.  By default, all of the
+        valid pixels have a weight of one.
+    order : int or str, optional
+        The order of the interpolation, as in `SpectralCube.reproject`
+    num_cores : int or None
+        The number of threads used to process output tiles at the same time.
+    use_memmap : bool
+        If `True`, the output arrays are memory mapped temporary files on
+        disk.
+    memmap_dir : str or None
+        The directory in which to write the memory mapped output.
+
+    Returns
+    -------
+    mosaic : SpectralCube
+        The weighted average of the cubes, masked where no cube contributes
+    weight : SpectralCube
+        The sum of the weights of the cubes contributing to each pixel
+    """
+
+    reproj_kwargs = _reproject_kwargs()
+
+    for cube in cubes:
+        if isinstance(cube, VaryingResolutionSpectralCube):
+            raise ValueError("VaryingResolutionSpectralCubes must be "
+                             "convolved to a common resolution with "
+                             "`convolve_to` before mosaicking.")
+
+    if weights is None:
+        weights = [1.] * len(cubes)
+    elif len(weights) != len(cubes):
+        raise ValueError("A weight is required for each cube.")
+
+    normalized_weights = []
+    for cube, weight in zip(cubes, weights):
+        if isinstance(weight, BaseSpectralCube):
+            if (weight.shape != cube.shape or
+                    not wcs_utils.check_equality(weight.wcs, cube.wcs,
+                                                 warn_missing=True)):
+                raise ValueError("Weight cubes must have the same shape and "
+                                 "WCS as their cube.")
+        else:
+            weight = np.asarray(getattr(weight, 'value', weight))
+            if weight.ndim > 0 and weight.shape not in (cube.shape,
+                                                        cube.shape[1:]):
+                raise ValueError("Weights must be scalars, or match the "
+                                 "spatial or the full shape of their cube.")
+        normalized_weights.append(weight)
+
+    wcs_out = WCS(header)
+    shape_out = tuple([header['NAXIS{0}'.format(i + 1)] for i in
+                       range(header['NAXIS'])][::-1])
+
+    unit = cubes[0].unit
+    scales = [cube.unit.to(unit) for cube in cubes]
+
+    nthreads = num_cores if num_cores is not None and num_cores > 1 else 1
+    # All cubes share one tiling of the output
+    tilesize = min(cube._reproject_tilesize(wcs_out, shape_out,
+                                            nthreads=nthreads)
+                   for cube in cubes)
+    cube_tiles = [cube._reproject_tiles(wcs_out, shape_out, order=order,
+                                        tilesize=tilesize)
+                  for cube in cubes]
+
+    if use_memmap:
+        ntf = tempfile.NamedTemporaryFile(dir=memmap_dir)
+        mosaic = np.memmap(ntf, mode='w+', shape=shape_out, dtype='float64')
+        ntf2 = tempfile.NamedTemporaryFile(dir=memmap_dir)
+        weightsum = np.memmap(ntf2, mode='w+', shape=shape_out,
+                              dtype='float64')
+    else:
+        mosaic = np.empty(shape_out, dtype='float64')
+        weightsum = np.empty(shape_out, dtype='float64')
+
+    def reproject_weight(weight, inview, tile_wcs, outview, tile_shape):
+        if isinstance(weight, BaseSpectralCube):
+            weight = np.asarray(weight._get_filled_data(view=inview, fill=0))
+        elif weight.ndim == 0:
+            return weight
+        elif weight.ndim == 2:
+            weight, _ = _reproject_tile(weight[inview[1:]],
+                                        tile_wcs.celestial,
+                                        wcs_out.celestial[outview[1:]],
+                                        tile_shape[1:], order)
+            return weight
+        else:
+            weight = weight[inview]
+        weight, _ = _reproject_tile(weight, tile_wcs,
+                                    wcs_out[outview], tile_shape, order,
+                                    **reproj_kwargs)
+        return weight
+
+    def mosaic_tile(position):
+        row, col = position
+        outview = (slice(None),) + cube_tiles[0][row][col][0]
+        tile_shape = mosaic[outview].shape
+
+        datasum = np.zeros(tile_shape)
+        tileweights = np.zeros(tile_shape)
+        for cube, tiles, weight, scale in zip(cubes, cube_tiles,
+                                              normalized_weights, scales):
+            inview = tiles[row][col][1]
+            if inview is None:
+                continue
+            inview = (slice(None),) + inview
+
+            data = np.asarray(cube._get_filled_data(view=inview, fill=np.nan))
+            tile_wcs = wcs_utils.slice_wcs(cube.wcs, inview, shape=cube.shape)
+            data, footprint = _reproject_tile(data, tile_wcs,
+                                              wcs_out[outview], tile_shape,
+                                              order, **reproj_kwargs)
+            weight = np.broadcast_to(reproject_weight(weight, inview, tile_wcs,
+                                                      outview, tile_shape),
+                                     tile_shape)
+
+            valid = (footprint > 0) & np.isfinite(data) & np.isfinite(weight)
+            datasum += np.where(valid, data * scale * weight, 0)
+            tileweights += np.where(valid, weight, 0)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mosaic[outview] = np.where(tileweights > 0,
+                                       datasum / tileweights, np.nan)
+        weightsum[outview] = tileweights
+
+    positions = [(row, col) for row in range(len(cube_tiles[0]))
+                 for col in range(len(cube_tiles[0][row]))]
+    if nthreads > 1:
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=nthreads) as executor:
+            list(executor.map(mosaic_tile, positions))
+    else:
+        for position in positions:
+            mosaic_tile(position)
 
-    hdu = reference_cube.hdu
+    mask = LazyMask(_positive, data=weightsum, wcs=wcs_out)
 
-    hdu.data = stacked_cube
+    mosaic_cube = cubes[0]._new_cube_with(data=mosaic, wcs=wcs_out, mask=mask,
+                                          unit=unit)
+    weight_cube = cubes[0]._new_cube_with(data=weightsum, wcs=wcs_out,
+                                          mask=mask,
+                                          unit=u.dimensionless_unscaled)
 
-    return hdu
+    return mosaic_cube, weight_cube
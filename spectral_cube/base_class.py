@@ -3,6 +3,7 @@ from astropy import log
 import numpy as np
 import warnings
 import abc
+import numbers
 
 import astropy
 from astropy.io.fits import Card
@@ -28,18 +29,106 @@ DOPPLER_CONVENTIONS['optical'] = u.doppler_optical
 DOPPLER_CONVENTIONS['relativistic'] = u.doppler_relativistic
 
 
+# Number of entries a metadata cache may hold before it is cleared
+_METADATA_CACHE_SIZE = 64
+
+
+def _metadata_key_item(dependency, references):
+    """
+    Strings, numbers, units, shapes and `None` are compared by value; other
+    dependencies (WCSes, headers, beams...) by identity.  Those are kept in
+    ``references`` so that their ``id`` is not reused while the key is in use.
+    WCSes are also compared by the state returned by
+    `~spectral_cube.wcs_utils.wcs_state`, so that in-place modifications are
+    detected.
+    """
+    if (dependency is None or
+            isinstance(dependency, (str, numbers.Number, u.UnitBase, tuple))):
+        try:
+            hash(dependency)
+            return dependency
+        except TypeError:
+            pass
+    references.append(dependency)
+    if isinstance(dependency, astropy.wcs.WCS):
+        return ('id', id(dependency), wcs_utils.wcs_state(dependency))
+    return ('id', id(dependency))
+
+
+def _header_state(header):
+    """
+    A snapshot of the contents of a header, to tell whether it has been
+    modified in-place.  The cards are read directly because going through the
+    `~astropy.io.fits.Header` interface costs nearly as much as rebuilding the
+    header.
+    """
+    if header is None:
+        return ()
+    return tuple([(card._keyword, card._value) for card in header._cards])
+
+
 class BaseNDClass(object):
 
     _cache = {}
 
+    # Values derived from the WCS, header, unit and metadata; see
+    # `_cached_metadata`.  Shared by the objects derived from this one.
+    _metadata_cache = None
+
+    def _cached_metadata(self, name, function, *dependencies):
+        """
+        Return ``function()``, computed once for as long as ``dependencies``
+        are unchanged.
+
+        The cache is shared with derived objects (e.g., masked cubes), which
+        get the cached value if their dependencies are the same.  Objects such
+        as beams are compared by identity, so modifying them in-place is not
+        detected; WCSes are compared by identity and by the state returned by
+        `wcs_utils.wcs_state`, and headers should be passed as `_header_state`.  The
+        returned value is shared too, so callers must copy it before
+        returning it to the user.
+        """
+        cache = self._metadata_cache
+        if cache is None:
+            cache = self._metadata_cache = {}
+
+        references = []
+        key = (name,) + tuple(_metadata_key_item(dependency, references)
+                              for dependency in dependencies)
+
+        try:
+            return cache[key][1]
+        except KeyError:
+            pass
+
+        value = function()
+        if len(cache) >= _METADATA_CACHE_SIZE:
+            cache.clear()
+        cache[key] = (references, value)
+
+        return value
+
     @property
     def _nowcs_header(self):
         """
         Return a copy of the header with no WCS information attached
         """
+        return self._cached_metadata('nowcs_header', self._make_nowcs_header,
+                                     _header_state(self._header)).copy()
+
+    def _make_nowcs_header(self):
         log.debug("Stripping WCS from header")
         return wcs_utils.strip_wcs_from_header(self._header)
 
+    @property
+    def _celestial_wcs(self):
+        """
+        The celestial part of the WCS, which is shared and must not be modified
+        in-place.
+        """
+        return self._cached_metadata('celestial_wcs',
+                                     lambda: self._wcs.celestial, self._wcs)
+
     @property
     def wcs(self):
         return self._wcs
@@ -62,8 +151,24 @@ class HeaderMixinClass(object):
         raise TypeError("Classes inheriting from HeaderMixin must define a "
                         "wcs method")
 
+    def _header_dependencies(self):
+        """
+        Everything the header is built from.  The header is rebuilt if the
+        WCS, unit, shape or the contents of ``_header`` change, or if a
+        ``meta`` entry is added or replaced.
+        """
+        dependencies = (self._wcs, _header_state(self._header), self.unit,
+                        self.shape, getattr(self, '_spectral_unit', None))
+        for key, value in self.meta.items():
+            dependencies += (key, value)
+        return dependencies
+
     @property
     def header(self):
+        return self._cached_metadata('header', self._make_header,
+                                     *self._header_dependencies()).copy()
+
+    def _make_header(self):
         header = self._nowcs_header
 
         wcsheader = self.wcs.to_header() if self.wcs is not None else {}
@@ -177,10 +282,24 @@ class SpatialCoordMixinClass(object):
 
         >>> y, x = c.world[:, :]
 
+        Notes
+        -----
+        When the spectral and celestial axes are separable (the usual case),
+        the coordinates are computed once per channel and once per spatial
+        pixel and the returned arrays are read-only broadcast views of those.
+        Copy them before modifying them in-place.
         """
 
         self._raise_wcs_no_celestial()
 
+        if self._use_separable_world(view):
+            # Broadcast the cached 1D spectral and 2D celestial coordinates;
+            # basic slicing of these returns views, not new arrays
+            world = [u.Quantity(np.broadcast_to(w.value, self.shape)[view],
+                                w.unit, copy=False)
+                     for w in self._separable_world()]
+            return world[::-1]  # reverse WCS -> numpy order
+
         # the next 3 lines are equivalent to (but more efficient than)
         # inds = np.indices(self._data.shape)
         # inds = [i[view] for i in inds]
@@ -206,6 +325,95 @@ class SpatialCoordMixinClass(object):
 
         return world[::-1]  # reverse WCS -> numpy order
 
+    def _world_is_separable(self):
+        """
+        Whether the celestial coordinates depend only on the two spatial pixel
+        axes and the spectral coordinate only on the spectral pixel axis, such
+        that the world coordinates can be computed with `_separable_world`.
+        """
+        wcs = self._wcs
+
+        if wcs.wcs.naxis != self.ndim or self.ndim not in (2, 3):
+            return False
+
+        if sorted((wcs.wcs.lng, wcs.wcs.lat)) != [0, 1]:
+            return False
+
+        if (wcs.sip is not None or
+                any(dist is not None for dist in (wcs.cpdis1, wcs.cpdis2,
+                                                  wcs.det2im1, wcs.det2im2))):
+            return False
+
+        if self.ndim == 3:
+            pc = wcs.wcs.get_pc()
+            return (wcs.wcs.spec == 2 and
+                    not np.any(pc[2, :2]) and not np.any(pc[:2, 2]))
+
+        return True
+
+    def _separable_world_key(self):
+        # key on the coordinate system rather than the object, since sliced
+        # or derived objects may share a cache with their parent, and so that
+        # in-place modifications of the WCS are detected
+        return ('separable_world', wcs_utils.wcs_state(self._wcs),
+                self.shape, getattr(self, '_spectral_unit', None))
+
+    def _use_separable_world(self, view):
+        """
+        Decide whether ``world[view]`` should be served from the cached
+        separable coordinates.  Small views (e.g., single pixels or a single
+        spectrum) are cheaper to evaluate directly unless the coordinate grids
+        have already been computed.
+        """
+        if not self._world_is_separable():
+            return False
+        if self._separable_world_key() in self._cache:
+            return True
+        nview = np.broadcast_to(np.empty((), dtype=bool), self.shape)[view].size
+        return nview >= self.shape[-2] * self.shape[-1]
+
+    def _separable_world(self):
+        """
+        The world coordinates of a separable WCS, evaluated once along the
+        spectral axis and once on the celestial grid.
+
+        Returns
+        -------
+        world : list of `~astropy.units.Quantity`
+            The world coordinates in WCS order, shaped so that they broadcast
+            against the data: ``(1, ny, nx)`` for the celestial coordinates
+            and ``(nspec, 1, 1)`` for the spectral coordinate.
+        """
+        spectral_unit = getattr(self, '_spectral_unit', None)
+        key = self._separable_world_key()
+
+        if key not in self._cache:
+            ny, nx = self.shape[-2:]
+
+            ypix, xpix = np.mgrid[:ny, :nx]
+            pix = [xpix.ravel(), ypix.ravel()]
+            if self.ndim == 3:
+                pix.append(np.zeros(xpix.size))
+            celestial = self._wcs.all_pix2world(np.column_stack(pix), 0).T
+
+            world = [celestial[ii].reshape((1,) * (self.ndim - 2) + (ny, nx))
+                     * u.Unit(self._wcs.wcs.cunit[ii])
+                     for ii in range(2)]
+
+            if self.ndim == 3:
+                nspec = self.shape[0]
+                pix = np.zeros((nspec, 3))
+                pix[:, 2] = np.arange(nspec)
+                spectral = (self._wcs.all_pix2world(pix, 0)[:, 2] *
+                            u.Unit(self._wcs.wcs.cunit[2]))
+                if spectral_unit is not None:
+                    spectral = spectral.to(spectral_unit)
+                world.append(spectral.reshape((nspec, 1, 1)))
+
+            self._cache[key] = world
+
+        return self._cache[key]
+
     def flattened_world(self, view=()):
         """
         Retrieve the world coordinates corresponding to the extracted flattened
@@ -578,6 +786,56 @@ class MultiBeamMixinClass(object):
             A new radio beam object that is the average of the unmasked beams
         """
 
+        if getattr(self, '_cache', None) is None:
+            # e.g. spectra created by slicing, which have no cache of their own
+            self._cache = {}
+
+        cache_key = self._average_beams_key(threshold, mask)
+        if cache_key in self._cache:
+            new_beam = self._cache[cache_key]
+        else:
+            new_beam = self._average_beams(threshold, mask)
+            self._cache[cache_key] = new_beam
+
+        if warn:
+            warnings.warn("Arithmetic beam averaging is being performed.  This is "
+                          "not a mathematically robust operation, but is being "
+                          "permitted because the beams differ by "
+                          "<{0}".format(threshold),
+                          BeamAverageWarning
+                         )
+        return new_beam
+
+    def _average_beams_key(self, threshold, mask):
+        """
+        The key under which the result of `average_beams` is cached.  It
+        depends on the values of the beams and of ``goodbeams_mask``, so
+        changing either of them invalidates the cached average.
+        """
+        if isinstance(threshold, dict):
+            threshold = tuple(sorted(threshold.items()))
+
+        if isinstance(mask, str):
+            # the mask is computed from the cube's own (immutable) mask
+            mask_key = (mask, self._mask)
+        else:
+            mask = np.asarray(mask)
+            mask_key = (mask.shape, mask.tobytes())
+
+        beams = self.unmasked_beams
+        beams_key = tuple(getattr(beams, attr).to_value(u.deg).tobytes()
+                          for attr in ('major', 'minor', 'pa'))
+        goodbeams_key = np.asarray(self.goodbeams_mask, dtype='bool').tobytes()
+
+        return ('average_beams', threshold, mask_key, beams_key,
+                goodbeams_key)
+
+    def _average_beams(self, threshold, mask):
+        """
+        Compute the average beam and check the beam areas against it; see
+        `average_beams`.
+        """
+
         use_dask = isinstance(self._data, da.Array)
 
         if mask == 'compute':
@@ -610,13 +868,7 @@ class MultiBeamMixinClass(object):
                              "or a bug.")
 
         self._check_beam_areas(threshold, mean_beam=new_beam, mask=beam_mask)
-        if warn:
-            warnings.warn("Arithmetic beam averaging is being performed.  This is "
-                          "not a mathematically robust operation, but is being "
-                          "permitted because the beams differ by "
-                          "<{0}".format(threshold),
-                          BeamAverageWarning
-                         )
+
         return new_beam
 
 
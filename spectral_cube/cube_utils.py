@@ -1,6 +1,7 @@
 from __future__ import print_function, absolute_import, division
 
 import contextlib
+import numbers
 import warnings
 try:
     import builtins
@@ -246,6 +247,81 @@ class SliceIndexer(object):
                         "``[0,:,:]`` in order to access this property.")
 
 
+def _view_items(view, ndim):
+    """
+    Expand ``view`` to a tuple with one index per axis, or return `None` if
+    it has more indices than axes.
+    """
+    if not isinstance(view, tuple):
+        view = (view,)
+    ellipses = [ii for ii, item in enumerate(view) if item is Ellipsis]
+    if len(ellipses) > 1:
+        return None
+    elif ellipses:
+        ii = ellipses[0]
+        view = (view[:ii] + (slice(None),) * (ndim - len(view) + 1) +
+                view[ii + 1:])
+    if len(view) > ndim:
+        return None
+    return view + (slice(None),) * (ndim - len(view))
+
+
+def _is_integer_index(item):
+    return (isinstance(item, numbers.Integral) and
+            not isinstance(item, (bool, np.bool_)))
+
+
+def compose_views(view1, view2, shape):
+    """
+    Combine two views of an array of shape ``shape`` into one, so that
+    ``data[compose_views(view1, view2, data.shape)]`` is
+    ``data[view1][view2]``.
+
+    Only integers and slices are supported.  The result has one integer or
+    slice (with explicit start, stop and step) per axis of ``shape``, or is
+    `None` if the views cannot be combined that way, e.g. if either contains
+    an index array.
+    """
+    view1 = _view_items(view1, len(shape))
+    if view1 is None:
+        return None
+
+    indices = []
+    for item, size in zip(view1, shape):
+        if isinstance(item, slice):
+            indices.append(range(*item.indices(size)))
+        elif _is_integer_index(item):
+            indices.append(range(size)[item])
+        else:
+            return None
+
+    view2 = _view_items(view2, sum(isinstance(index, range)
+                                   for index in indices))
+    if view2 is None:
+        return None
+    view2 = iter(view2)
+
+    view = []
+    for index in indices:
+        if not isinstance(index, range):
+            view.append(index)
+            continue
+        item = next(view2)
+        if isinstance(item, slice):
+            index = index[item]
+            # a stop of -1 means "before the first element" for a range, but
+            # "before the last element" for a slice
+            view.append(slice(index.start,
+                              index.stop if index.stop >= 0 else None,
+                              index.step))
+        elif _is_integer_index(item):
+            view.append(index[item])
+        else:
+            return None
+
+    return tuple(view)
+
+
 # TODO: make this into a proper configuration item
 # TODO: make threshold depend on memory?
 MEMORY_THRESHOLD=1e8
@@ -441,8 +517,7 @@ def _map_context(numcores):
     if numcores is not None and numcores > 1:
         try:
             from joblib import Parallel, delayed
-            from joblib.pool import has_shareable_memory
-            map = lambda x,y: Parallel(n_jobs=numcores)(delayed(has_shareable_memory)(x))(y)
+            map = lambda x,y: Parallel(n_jobs=numcores)(delayed(x)(item) for item in y)
             parallel = True
         except ImportError:
             map = lambda x,y: list(builtins.map(x,y))
@@ -486,3 +561,637 @@ def convert_bunit(bunit):
             unit = None
 
     return unit
+
+
+def linear_interpolation_weights(x, xp):
+    """
+    Compute the indices and weights needed to linearly interpolate data
+    sampled at the increasing positions ``xp`` onto the positions ``x``.
+
+    The interpolated values are ``fp[lower] * (1 - weight) + fp[upper] *
+    weight``, which reproduces `numpy.interp` (including returning the
+    nearest sample outside of the range of ``xp``) but lets the same weights
+    be applied to many arrays at once.
+
+    Parameters
+    ----------
+    x : `~numpy.ndarray`
+        The positions to interpolate onto
+    xp : `~numpy.ndarray`
+        The increasing positions of the samples
+
+    Returns
+    -------
+    lower, upper : `~numpy.ndarray`
+        The indices of the samples on either side of each ``x``.  These are
+        equal where ``x`` coincides with a sample or lies outside of ``xp``.
+    weight : `~numpy.ndarray`
+        The weight of the ``upper`` sample
+    outside : `~numpy.ndarray`
+        Boolean array that is `True` where ``x`` lies outside of ``xp``
+    """
+    x = np.asarray(x, dtype='float')
+    xp = np.asarray(xp, dtype='float')
+
+    outside = (x < xp[0]) | (x > xp[-1])
+
+    if xp.size == 1:
+        zeros = np.zeros(x.shape, dtype='int')
+        return zeros, zeros, np.zeros(x.shape), outside
+
+    upper = np.clip(np.searchsorted(xp, x, side='right'), 1, xp.size - 1)
+    lower = upper - 1
+    weight = np.clip((x - xp[lower]) / (xp[upper] - xp[lower]), 0, 1)
+
+    # Use a single sample where no interpolation is needed so that a NaN in
+    # the unused neighbour does not propagate
+    at_upper = weight == 1
+    lower[at_upper] = upper[at_upper]
+    weight[at_upper] = 0
+    upper[weight == 0] = lower[weight == 0]
+
+    return lower, upper, weight, outside
+
+
+def resampling_weights(nin, factor=None, lower=None, upper=None, weight=None,
+                       kernel=None):
+    """
+    Build the sparse matrix that maps ``nin`` input channels onto output
+    channels, combining an optional smoothing kernel with either block
+    averaging or linear interpolation.
+
+    Parameters
+    ----------
+    nin : int
+        The number of input channels
+    factor : int, optional
+        Average blocks of ``factor`` input channels.  The last block may be
+        incomplete.
+    lower, upper, weight : `~numpy.ndarray`, optional
+        The output of `linear_interpolation_weights`, used if ``factor`` is
+        not given
+    kernel : `~astropy.convolution.Kernel1D` or `~numpy.ndarray`, optional
+        A kernel with an odd size applied to the input channels before
+        resampling
+
+    Returns
+    -------
+    rows : list of tuple
+        For each output channel, the ``(indices, weights)`` of the input
+        channels it combines.  The indices are sorted.  The weights are not
+        normalized, so that they can be renormalized where some input
+        channels are masked.
+    """
+    if factor is not None:
+        factor = int(factor)
+        rows = [(np.arange(start, min(start + factor, nin)),
+                 np.ones(min(start + factor, nin) - start))
+                for start in range(0, nin, factor)]
+    else:
+        rows = []
+        for lo, up, wt in zip(lower, upper, weight):
+            if lo == up:
+                rows.append((np.array([lo]), np.array([1.])))
+            elif lo < up:
+                rows.append((np.array([lo, up]), np.array([1 - wt, wt])))
+            else:
+                rows.append((np.array([up, lo]), np.array([wt, 1 - wt])))
+
+    if kernel is None:
+        return rows
+
+    kernel = np.asarray(getattr(kernel, 'array', kernel), dtype='float')
+    if kernel.ndim != 1 or kernel.size % 2 == 0:
+        raise ValueError("The kernel must be one-dimensional with an odd size.")
+    # offsets of the input channels that contribute to a smoothed channel
+    offsets = kernel.size // 2 - np.arange(kernel.size)
+
+    smoothed_rows = []
+    for indices, weights in rows:
+        allindices = (indices[:, None] + offsets[None, :]).ravel()
+        allweights = (weights[:, None] * kernel[None, :]).ravel()
+        keep = (allindices >= 0) & (allindices < nin)
+        uniq, inverse = np.unique(allindices[keep], return_inverse=True)
+        smoothed_rows.append((uniq, np.bincount(inverse,
+                                                weights=allweights[keep])))
+
+    return smoothed_rows
+
+
+# Reductions that accept a tuple of axes, so that blocks can be reduced in
+# place on a reshaped view of the data
+_BLOCK_REDUCERS = (np.sum, np.mean, np.max, np.min, np.nansum, np.nanmean,
+                   np.nanmax, np.nanmin, np.any, np.all)
+
+
+def block_reduce(data, factors, estimator=np.nanmean):
+    """
+    Reduce ``data`` over non-overlapping blocks of shape ``factors``.
+
+    Where the length of an axis is not a multiple of its factor, the last
+    block along that axis is reduced over the remaining elements.
+
+    Parameters
+    ----------
+    data : `~numpy.ndarray`
+        The array to reduce
+    factors : sequence of int
+        The size of the blocks along each axis of ``data``
+    estimator : function
+        The reduction, called as ``estimator(array, axis=...)``.  Common numpy
+        reductions (e.g., `numpy.nanmean`, `numpy.sum` or `numpy.max`) are
+        applied to a reshaped view of the data over all the block axes at
+        once; any other function is called with a single axis over a copy of
+        the blocks.
+
+    Returns
+    -------
+    reduced : `~numpy.ndarray`
+        The reduced array, with the same dtype as ``data`` if it is a
+        floating point or boolean array
+    """
+    factors = [int(factor) for factor in factors]
+    if len(factors) != data.ndim:
+        raise ValueError("A factor is needed for each axis of the data.")
+
+    dtype = data.dtype if data.dtype.kind in 'fcb' else np.float64
+    newshape = [-(-size // factor) for size, factor in zip(data.shape, factors)]
+    reduced = np.empty(newshape, dtype=dtype)
+
+    # Split each axis into the whole blocks and an incomplete last block, and
+    # reduce each combination of the two separately
+    segments = []
+    for size, factor in zip(data.shape, factors):
+        nfull = size // factor
+        axis_segments = [(slice(0, nfull * factor), slice(0, nfull), factor)]
+        if size % factor:
+            axis_segments.append((slice(nfull * factor, size),
+                                  slice(nfull, nfull + 1), size % factor))
+        segments.append([segment for segment in axis_segments
+                         if segment[1].stop > segment[1].start])
+
+    block_axes = tuple(range(1, 2 * data.ndim, 2))
+
+    for region in itertools.product(*segments):
+        inview = tuple(segment[0] for segment in region)
+        outview = tuple(segment[1] for segment in region)
+        blocks = data[inview].reshape([size for segment in region
+                                       for size in ((segment[1].stop -
+                                                     segment[1].start),
+                                                    segment[2])])
+        if estimator in _BLOCK_REDUCERS:
+            reduced[outview] = estimator(blocks, axis=block_axes)
+        else:
+            # Move the block axes to the end and flatten them into one
+            outshape = blocks.shape[::2]
+            blocks = np.moveaxis(blocks, block_axes,
+                                 range(data.ndim, 2 * data.ndim))
+            blocks = blocks.reshape(outshape + (-1,))
+            reduced[outview] = estimator(blocks, axis=-1)
+
+    return reduced
+
+
+def downsample_blocks(factor, axis, ndim):
+    """
+    Convert the ``factor`` and ``axis`` arguments of ``downsample_axis``,
+    which may be single values or sequences, into a block size per axis.
+    """
+    axes = np.atleast_1d(axis).tolist()
+    factors = np.atleast_1d(factor).tolist()
+    if len(factors) == 1:
+        factors = factors * len(axes)
+    if len(factors) != len(axes):
+        raise ValueError("factor must be a single value or have one value "
+                         "per axis.")
+    if len(set(axes)) != len(axes):
+        raise ValueError("Each axis can only be downsampled once.")
+
+    blocks = [1] * ndim
+    for ax, fac in zip(axes, factors):
+        if int(fac) != fac or fac < 1:
+            raise ValueError("Downsampling factors must be positive integers.")
+        blocks[ax] = int(fac)
+    return blocks
+
+
+_SIGMA_CLIP_FUNCTIONS = {'median': np.nanmedian,
+                         'mean': np.nanmean,
+                         'std': np.nanstd}
+_SIGMA_CLIP_KWARGS = ('sigma_lower', 'sigma_upper', 'maxiters', 'cenfunc',
+                      'stdfunc')
+
+
+def sigma_clip_spectra(data, sigma=3, sigma_lower=None, sigma_upper=None,
+                       maxiters=5, cenfunc='median', stdfunc='std'):
+    """
+    Iteratively sigma clip all of the spectra in ``data`` at once.
+
+    This follows `astropy.stats.sigma_clip` with ``axis=0``, but the center
+    and standard deviation are computed with vectorized operations along the
+    spectral axis, and only for the spectra that have not yet converged.
+
+    Parameters
+    ----------
+    data : `~numpy.ndarray`
+        An array with the spectral axis first.  NaN values are ignored.
+    sigma, sigma_lower, sigma_upper : float
+        The number of standard deviations below (``sigma_lower``) and above
+        (``sigma_upper``) the center beyond which values are clipped.  Both
+        default to ``sigma``.
+    maxiters : int or None
+        The maximum number of iterations, or `None` to iterate until no
+        values are clipped.
+    cenfunc : {'median', 'mean'} or callable
+        The function used to compute the center, called with ``axis=0``
+    stdfunc : {'std'} or callable
+        The function used to compute the standard deviation, called with
+        ``axis=0``
+
+    Returns
+    -------
+    clipped : `~numpy.ndarray`
+        A floating point copy of ``data`` in which the clipped values are NaN
+    """
+    sigma_lower = sigma if sigma_lower is None else sigma_lower
+    sigma_upper = sigma if sigma_upper is None else sigma_upper
+
+    cenfunc = _SIGMA_CLIP_FUNCTIONS.get(cenfunc, cenfunc)
+    stdfunc = _SIGMA_CLIP_FUNCTIONS.get(stdfunc, stdfunc)
+
+    shape = data.shape
+    clipped = np.array(data, dtype=np.result_type(data.dtype, np.float32))
+    clipped = clipped.reshape(shape[0], -1)
+
+    # The spectra that may still have values clipped
+    active = np.arange(clipped.shape[1])
+    iteration = 0
+    while active.size > 0 and (maxiters is None or iteration < maxiters):
+        spectra = clipped[:, active]
+        with warnings.catch_warnings():
+            # All-NaN spectra give empty slice warnings
+            warnings.simplefilter('ignore', RuntimeWarning)
+            center = cenfunc(spectra, axis=0)
+            std = stdfunc(spectra, axis=0)
+        with np.errstate(invalid='ignore'):
+            bad = ((spectra < center - sigma_lower * std) |
+                   (spectra > center + sigma_upper * std))
+        changed = bad.any(axis=0)
+        spectra[bad] = np.nan
+        clipped[:, active] = spectra
+        active = active[changed]
+        iteration += 1
+
+    return clipped.reshape(shape)
+
+
+def polynomial_baselines(data, order, fit_channels=None):
+    """
+    Fit a polynomial baseline to all of the spectra in ``data`` at once.
+
+    All spectra share the same channels, so the design matrix is built once.
+    Spectra for which all of the ``fit_channels`` are valid are fit together
+    with a single pseudo-inverse, and the remaining spectra are grouped by
+    their pattern of valid channels so that each group needs one
+    pseudo-inverse.
+
+    Parameters
+    ----------
+    data : `~numpy.ndarray`
+        An array with the spectral axis first.  NaN values are ignored.
+    order : int
+        The order of the polynomial
+    fit_channels : `~numpy.ndarray`, optional
+        A boolean array that is `True` for the channels to fit, e.g. outside
+        of the windows containing lines.  By default all channels are used.
+
+    Returns
+    -------
+    baselines : `~numpy.ndarray`
+        The fit baselines, with the same shape as ``data``.  Spectra with no
+        more valid channels than ``order`` are NaN.
+    coefficients : `~numpy.ndarray`
+        The polynomial coefficients, in increasing order of power, with shape
+        ``(order + 1,) + data.shape[1:]``.  The polynomials are in terms of
+        the channel index scaled onto [-1, 1].
+    """
+    nspec = data.shape[0]
+    if fit_channels is None:
+        fit_channels = np.ones(nspec, dtype='bool')
+
+    design = np.polynomial.polynomial.polyvander(np.linspace(-1, 1, nspec),
+                                                 order)
+    spectra = data.reshape(nspec, -1)
+    valid = np.isfinite(spectra) & fit_channels[:, None]
+    nvalid = valid.sum(axis=0)
+    coefficients = np.full((order + 1, spectra.shape[1]), np.nan)
+
+    # Spectra with all of the fit channels valid share one pseudo-inverse
+    complete = nvalid == fit_channels.sum()
+    if complete.any() and fit_channels.sum() > order:
+        coefficients[:, complete] = np.dot(np.linalg.pinv(design[fit_channels]),
+                                           spectra[fit_channels][:, complete])
+
+    partial = np.flatnonzero(~complete & (nvalid > order))
+    if partial.size > 0:
+        patterns, inverse = np.unique(np.packbits(valid[:, partial], axis=0),
+                                      axis=1, return_inverse=True)
+        members = np.argsort(inverse, kind='stable')
+        bounds = np.cumsum(np.bincount(inverse))
+        for group in np.split(partial[members], bounds[:-1]):
+            channels = valid[:, group[0]]
+            coefficients[:, group] = np.dot(np.linalg.pinv(design[channels]),
+                                            spectra[channels][:, group])
+
+    baselines = np.dot(design, coefficients)
+
+    return (baselines.reshape(data.shape),
+            coefficients.reshape((order + 1,) + data.shape[1:]))
+
+
+def _gaussian_model(x, params):
+    """
+    Evaluate sums of Gaussians, and their Jacobians, for many spectra.
+
+    ``params`` has shape ``(nspec, 3 * ncomponents)``, holding the amplitude,
+    mean and standard deviation of each component in turn.  Returns the
+    ``(nspec, nchan)`` models and the ``(nspec, nchan, 3 * ncomponents)``
+    derivatives with respect to the parameters.
+    """
+    amplitude = params[:, 0::3, None]
+    mean = params[:, 1::3, None]
+    stddev = params[:, 2::3, None]
+
+    offset = x - mean
+    gauss = np.exp(-0.5 * (offset / stddev) ** 2)
+    model = (amplitude * gauss).sum(axis=1)
+
+    jacobian = np.empty(model.shape + (params.shape[1],))
+    jacobian[:, :, 0::3] = gauss.transpose(0, 2, 1)
+    dmean = amplitude * gauss * offset / stddev ** 2
+    jacobian[:, :, 1::3] = dmean.transpose(0, 2, 1)
+    jacobian[:, :, 2::3] = (dmean * offset / stddev).transpose(0, 2, 1)
+
+    return model, jacobian
+
+
+def gaussian_moment_guesses(x, data, ncomponents=1):
+    """
+    Initial guesses for Gaussian fits, from the moments of the spectra.
+
+    A single component is seeded with the peak, and the intensity-weighted
+    mean and standard deviation of the positive part of each spectrum.  With
+    several components, each is placed at the peak of the spectrum left after
+    subtracting the previous ones, with the moment width divided among them.
+
+    Parameters
+    ----------
+    x : `~numpy.ndarray`
+        The spectral axis values
+    data : `~numpy.ndarray`
+        An array with the spectral axis first.  NaN values are ignored.
+    ncomponents : int
+        The number of Gaussian components
+
+    Returns
+    -------
+    guesses : `~numpy.ndarray`
+        The amplitude, mean and standard deviation of each component, with
+        shape ``(3 * ncomponents,) + data.shape[1:]``.  Spectra without any
+        positive values are NaN.
+    """
+    x = np.asarray(x, dtype='float')
+    spectra = data.reshape(data.shape[0], -1)
+    valid = np.isfinite(spectra)
+    spectra = np.where(valid, spectra, 0)
+
+    positive = np.clip(spectra, 0, None)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        moment0 = positive.sum(axis=0)
+        moment1 = np.dot(x, positive) / moment0
+        moment2 = (positive * (x[:, None] - moment1) ** 2).sum(axis=0) / moment0
+    width = np.maximum(np.sqrt(moment2) / ncomponents,
+                       np.abs(np.diff(x)).min() if x.size > 1 else 1)
+
+    guesses = np.empty((ncomponents, 3, spectra.shape[1]))
+    if ncomponents == 1:
+        guesses[0] = np.where(valid.any(axis=0), spectra.max(axis=0), np.nan), \
+            moment1, width
+    else:
+        residual = spectra.copy()
+        columns = np.arange(spectra.shape[1])
+        for component in range(ncomponents):
+            peak = residual.argmax(axis=0)
+            amplitude = residual[peak, columns]
+            guesses[component] = amplitude, x[peak], width
+            residual -= amplitude * np.exp(-0.5 * ((x[:, None] - x[peak]) /
+                                                   width) ** 2)
+        guesses[:, :, ~np.isfinite(moment1)] = np.nan
+
+    return guesses.reshape((3 * ncomponents,) + data.shape[1:])
+
+
+def fit_gaussians(x, data, ncomponents=1, guesses=None, maxiter=100,
+                  tolerance=1e-8):
+    """
+    Fit sums of Gaussians to all of the spectra in ``data`` at once.
+
+    The fits use a Levenberg-Marquardt solver in which every spectrum still
+    being fit takes a step together: the Jacobians, normal equations and
+    damped solves are computed for the whole batch with array operations.
+    Spectra drop out of the batch as they converge.
+
+    Parameters
+    ----------
+    x : `~numpy.ndarray`
+        The spectral axis values
+    data : `~numpy.ndarray`
+        An array with the spectral axis first.  NaN values are ignored.
+    ncomponents : int
+        The number of Gaussian components
+    guesses : `~numpy.ndarray`, optional
+        The initial amplitude, mean and standard deviation of each component,
+        with shape ``(3 * ncomponents,)`` or ``(3 * ncomponents,) +
+        data.shape[1:]``.  By default these are found with
+        `gaussian_moment_guesses`.
+    maxiter : int
+        The maximum number of iterations
+    tolerance : float
+        The fit to a spectrum has converged when a step reduces its sum of
+        squared residuals by less than this fraction.
+
+    Returns
+    -------
+    parameters : `~numpy.ndarray`
+        The amplitude, mean and standard deviation of each component, ordered
+        by mean, with shape ``(3 * ncomponents,) + data.shape[1:]``.  Spectra
+        with no more valid channels than parameters are NaN.
+    uncertainties : `~numpy.ndarray`
+        The standard errors of the parameters, from the covariance matrix
+        scaled by the reduced chi-squared of the fit.
+    """
+    nparams = 3 * ncomponents
+    outshape = (nparams,) + data.shape[1:]
+
+    x = np.asarray(x, dtype='float')
+    if guesses is None:
+        guesses = gaussian_moment_guesses(x, data, ncomponents)
+    guesses = np.asarray(guesses, dtype='float')
+    if guesses.ndim == 1:
+        guesses = guesses.reshape((nparams,) + (1,) * (data.ndim - 1))
+    guesses = np.broadcast_to(guesses, outshape).reshape(nparams, -1).T
+
+    # Work in units of channels about the centre of the axis, so the
+    # damping is well-scaled
+    x0 = x.mean()
+    dx = np.abs(np.diff(x)).mean() if x.size > 1 else 1.
+    x = (x - x0) / dx
+    scale = np.tile([1., dx, dx], ncomponents)
+    shift = np.tile([0., x0, 0.], ncomponents)
+
+    spectra = data.reshape(data.shape[0], -1).T
+    valid = np.isfinite(spectra)
+    weights = valid.astype('float')
+    spectra = np.where(valid, spectra, 0)
+    nvalid = valid.sum(axis=1)
+
+    parameters = np.full((spectra.shape[0], nparams), np.nan)
+    uncertainties = np.full((spectra.shape[0], nparams), np.nan)
+
+    fit = np.flatnonzero((nvalid > nparams) &
+                         np.isfinite(guesses).all(axis=1))
+    params = (guesses[fit] - shift) / scale
+
+    def residuals(indices, params):
+        model, jacobian = _gaussian_model(x, params)
+        resid = (spectra[fit[indices]] - model) * weights[fit[indices]]
+        return resid, jacobian * weights[fit[indices], :, None]
+
+    def normal_equations(resid, jacobian):
+        return (np.einsum('snp,snq->spq', jacobian, jacobian),
+                np.einsum('snp,sn->sp', jacobian, resid))
+
+    resid, _ = residuals(slice(None), params)
+    chi2 = (resid ** 2).sum(axis=1)
+    damping = np.full(fit.size, 1e-3)
+    active = np.arange(fit.size)
+    diagonal = np.arange(nparams)
+
+    for iteration in range(maxiter):
+        if active.size == 0:
+            break
+
+        resid, jacobian = residuals(active, params[active])
+        alpha, beta = normal_equations(resid, jacobian)
+        curvature = alpha[:, diagonal, diagonal]
+        alpha[:, diagonal, diagonal] += damping[active, None] * \
+            np.maximum(curvature, 1e-12 * curvature.max(axis=1, keepdims=True)
+                       + np.finfo(float).tiny)
+        try:
+            step = np.linalg.solve(alpha, beta[..., None])[..., 0]
+        except np.linalg.LinAlgError:
+            step = np.einsum('spq,sq->sp', np.linalg.pinv(alpha), beta)
+
+        trial = params[active] + step
+        trial_resid, _ = residuals(active, trial)
+        trial_chi2 = (trial_resid ** 2).sum(axis=1)
+
+        better = trial_chi2 < chi2[active]
+        improved = active[better]
+        converged = np.zeros(active.size, dtype='bool')
+        converged[better] = (chi2[improved] - trial_chi2[better] <=
+                             tolerance * chi2[improved])
+        params[improved] = trial[better]
+        chi2[improved] = trial_chi2[better]
+        damping[improved] /= 10
+        damping[active[~better]] *= 10
+
+        # Stop where no step reduces the residuals any more
+        converged |= damping[active] > 1e10
+        active = active[~converged]
+
+    # Standard errors from the covariance matrix, scaled by the reduced
+    # chi-squared
+    resid, jacobian = residuals(slice(None), params)
+    alpha, _ = normal_equations(resid, jacobian)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        variance = np.linalg.pinv(alpha)[:, diagonal, diagonal] * \
+            (chi2 / (nvalid[fit] - nparams))[:, None]
+    errors = np.sqrt(np.abs(variance))
+
+    params[:, 2::3] = np.abs(params[:, 2::3])
+
+    # Order the components by their mean
+    order = np.argsort(params[:, 1::3], axis=1)
+    order = (3 * order[:, :, None] + np.arange(3)).reshape(fit.size, nparams)
+    params = np.take_along_axis(params, order, axis=1)
+    errors = np.take_along_axis(errors, order, axis=1)
+
+    parameters[fit] = params * scale + shift
+    uncertainties[fit] = errors * scale
+
+    return (parameters.T.reshape(outshape), uncertainties.T.reshape(outshape))
+
+
+def peak_search(planes, refine=False):
+    """
+    Find the peak of every spectrum in a single pass over the channels.
+
+    Only the running maximum, the channel of the maximum and (when refining)
+    the values of the channels on either side of it are kept, so the planes
+    can be read one at a time.
+
+    Parameters
+    ----------
+    planes : iterable of `~numpy.ndarray`
+        The channels, in order.  NaN values are ignored.
+    refine : bool
+        Fit a parabola through the peak and the channels on either side of
+        it to find the position and value of the peak to a fraction of a
+        channel.
+
+    Returns
+    -------
+    peak : `~numpy.ndarray`
+        The peak value, NaN for spectra with no valid values
+    index : `~numpy.ndarray`
+        The channel of the peak, -1 for spectra with no valid values
+    offset : `~numpy.ndarray`
+        The offset of the refined peak from ``index``, between -0.5 and 0.5
+        (zero if ``refine`` is not set, or the peak is at an edge or next
+        to a NaN)
+    """
+    peak = index = before = after = previous = None
+
+    for channel, plane in enumerate(planes):
+        plane = np.asarray(plane, dtype='float')
+        if peak is None:
+            peak = np.full(plane.shape, -np.inf)
+            index = np.full(plane.shape, -1, dtype='int')
+            before = np.full(plane.shape, np.nan)
+            after = np.full(plane.shape, np.nan)
+            previous = np.full(plane.shape, np.nan)
+
+        if refine:
+            after = np.where(index == channel - 1, plane, after)
+
+        higher = plane > peak
+        peak[higher] = plane[higher]
+        index[higher] = channel
+        if refine:
+            before[higher] = previous[higher]
+            after[higher] = np.nan
+            previous = plane
+
+    peak[index == -1] = np.nan
+
+    offset = np.zeros(peak.shape)
+    if refine:
+        with np.errstate(invalid='ignore', divide='ignore'):
+            curvature = before - 2 * peak + after
+            offset = 0.5 * (before - after) / curvature
+        offset = np.where(np.isfinite(offset) & (curvature < 0),
+                          np.clip(offset, -0.5, 0.5), 0)
+        peak = peak - 0.25 * np.where(offset != 0, before - after, 0) * offset
+
+    return peak, index, offset
@@ -25,12 +25,16 @@ from astropy import stats
 from astropy import convolution
 from astropy import wcs
 
+from . import cube_utils
 from . import wcs_utils
 from .spectral_cube import SpectralCube, VaryingResolutionSpectralCube, SIGMA2FWHM, np2wcs
+from .spectral_cube import _reproject_kwargs, _reproject_tile
 from .utils import cached, VarianceWarning, SliceWarning, BeamWarning, SmoothingWarning
 from .lower_dimensional_structures import Projection
 from .masks import BooleanArrayMask, is_broadcastable_and_smaller
 from .np_compat import allbadtonan
+from ._convolution import (engine_supported, make_convolver,
+                           group_beam_kernels)
 
 __all__ = ['DaskSpectralCube', 'DaskVaryingResolutionSpectralCube']
 
@@ -650,6 +654,43 @@ class DaskSpectralCubeMixin:
         """
         return self._compute(da.nanargmin(self._get_filled_data(fill=np.inf), axis=axis))
 
+    def peak_map(self, refine=False):
+        """
+        Find the peak intensity of every spectrum, its channel and its
+        spectral coordinate (e.g., the velocity at the peak).
+
+        All three are found in a single pass through each spectrally
+        contiguous chunk, keeping only running maximum and argmax planes.
+
+        Parameters
+        ----------
+        refine : bool
+            Fit a parabola through the peak channel and its neighbours to
+            find the peak intensity and spectral coordinate to a fraction of
+            a channel.  Peaks at the edges of the spectra or next to masked
+            channels are not refined.
+
+        Returns
+        -------
+        peak : `~spectral_cube.lower_dimensional_structures.Projection`
+            The peak intensity.  Spectra that are entirely masked are NaN.
+        channel : `~numpy.ndarray`
+            The channel of the peak, or -1 for spectra that are entirely
+            masked.
+        spectral_coordinate : `~spectral_cube.lower_dimensional_structures.Projection`
+            The spectral coordinate of the peak.
+        """
+
+        def peak_block(block):
+            return np.stack(cube_utils.peak_search(block, refine=refine))
+
+        data = self._get_filled_data(fill=np.nan).rechunk((-1, 'auto', 'auto'))
+        peaks = self._compute(data.map_blocks(peak_block,
+                                              chunks=((3,),) + data.chunks[1:],
+                                              dtype=float))
+
+        return self._peak_projections(peaks[0], peaks[1].astype(int), peaks[2])
+
     def _map_blocks_to_cube(self, function, additional_arrays=None, fill=np.nan, rechunk=None, **kwargs):
         """
         Call dask's map_blocks, returning a new spectral cube.
@@ -699,16 +740,153 @@ class DaskSpectralCubeMixin:
             `False`, the computation is only carried out when accessing
             specific parts of the data or writing to disk.
         kwargs : dict
-            Passed to the sigma_clip function
+            Passed to the sigma clipper (e.g., ``sigma_lower``,
+            ``sigma_upper``, ``maxiters``, ``cenfunc`` or ``stdfunc``)
+
+        Notes
+        -----
+        Each spectrally contiguous chunk is clipped at once with
+        `cube_utils.sigma_clip_spectra`, iterating only over the spectra
+        that have not converged.  Keyword arguments of
+        `astropy.stats.sigma_clip` that this does not support make the
+        chunks be clipped with `astropy.stats.sigma_clip` instead.
         """
 
-        def spectral_sigma_clip(array):
-            result = stats.sigma_clip(array, sigma=threshold, axis=0, **kwargs)
-            return result.filled(np.nan)
+        if all(key in cube_utils._SIGMA_CLIP_KWARGS for key in kwargs):
+            def spectral_sigma_clip(array):
+                return cube_utils.sigma_clip_spectra(array, sigma=threshold,
+                                                     **kwargs)
+        else:
+            def spectral_sigma_clip(array):
+                result = stats.sigma_clip(array, sigma=threshold, axis=0,
+                                          **kwargs)
+                return result.filled(np.nan)
 
         return self.apply_function_parallel_spectral(spectral_sigma_clip,
                                                      accepts_chunks=True)
 
+    def subtract_baseline(self, order, exclude=None,
+                          return_coefficients=False):
+        """
+        Fit and subtract a polynomial baseline from every spectrum.
+
+        The baselines are fit to the channels outside of the ``exclude``
+        windows, ignoring masked values.  Each spectrally contiguous chunk is
+        fit at once with `cube_utils.polynomial_baselines`, in a single
+        ``map_blocks`` that produces both the subtracted data and the
+        coefficients.
+
+        Parameters
+        ----------
+        order : int
+            The order of the polynomial baseline
+        exclude : list of tuple, optional
+            ``(lower, upper)`` pairs of spectral values (e.g., velocities)
+            bounding the windows that are excluded from the fit, such as
+            those containing lines.  Velocity windows on a frequency cube (and
+            vice versa) are converted with the cube's velocity convention and
+            rest value.
+        return_coefficients : bool
+            Also return the fit coefficients.  These are computed straight
+            away, while the subtracted cube remains lazy.
+
+        Returns
+        -------
+        cube : DaskSpectralCube
+            The baseline-subtracted cube.  Spectra with no more valid channels
+            to fit than ``order`` are NaN.
+        coefficients : `~astropy.units.Quantity`
+            If ``return_coefficients`` is set, the ``(order + 1, ny, nx)``
+            polynomial coefficients, in increasing order of power.  The
+            polynomials are in terms of the channel index scaled onto
+            [-1, 1], i.e. ``np.linspace(-1, 1, cube.shape[0])``.
+        """
+        fit_channels = self._baseline_channels(exclude)
+        nspec = self.shape[0]
+
+        def subtract_block(block):
+            baselines, coefficients = cube_utils.polynomial_baselines(block, order,
+                                                                      fit_channels)
+            return np.concatenate([block - baselines, coefficients])
+
+        data = self._get_filled_data(fill=np.nan).rechunk((-1, 'auto', 'auto'))
+        fitted = data.map_blocks(subtract_block,
+                                 chunks=((nspec + order + 1,),) + data.chunks[1:],
+                                 dtype=float)
+
+        newcube = self._new_cube_with(data=fitted[:nspec], wcs=self.wcs,
+                                      mask=self.mask, meta=self.meta,
+                                      fill_value=self.fill_value)
+
+        if return_coefficients:
+            return newcube, u.Quantity(self._compute(fitted[nspec:]), self.unit,
+                                       copy=False)
+        return newcube
+
+    def fit_gaussians(self, ncomponents=1, guesses=None, maxiter=100,
+                      tolerance=1e-8):
+        """
+        Fit a sum of Gaussian components to every spectrum in the cube.
+
+        Each spectrally contiguous chunk is fit at once with the batched
+        Levenberg-Marquardt solver in `cube_utils.fit_gaussians`, seeded from
+        the peak and moments of each spectrum.  Masked values are ignored.
+
+        Parameters
+        ----------
+        ncomponents : int
+            The number of Gaussian components to fit
+        guesses : array, optional
+            The initial amplitude, mean and standard deviation of each
+            component, in the units of the cube and its spectral axis, with
+            shape ``(3 * ncomponents,)`` or ``(3 * ncomponents, ny, nx)``.
+            By default these are found from the moments of each spectrum.
+        maxiter : int
+            The maximum number of iterations
+        tolerance : float
+            The fit has converged when a step reduces the sum of squared
+            residuals by less than this fraction.
+
+        Returns
+        -------
+        parameters : dict
+            The fit parameters as `~spectral_cube.lower_dimensional_structures.Projection`
+            objects, with keys ``amplitude_0``, ``mean_0``, ``stddev_0``,
+            ``amplitude_1``, etc.  The components are ordered by their mean.
+            Spectra with no more valid values than parameters are NaN.
+        uncertainties : dict
+            The standard errors of the parameters, with the same keys.
+        """
+        nparams = 3 * ncomponents
+        spectral_axis = self.spectral_axis.value
+
+        # The Jacobians hold nparams copies of each chunk
+        data = self._get_filled_data(fill=np.nan).rechunk(
+            (-1, 'auto', 'auto'),
+            block_size_limit=cube_utils.MEMORY_THRESHOLD // (10 * nparams))
+        chunks = ((2 * nparams,),) + data.chunks[1:]
+
+        def fit_block(block, block_guesses=None):
+            return np.concatenate(cube_utils.fit_gaussians(spectral_axis, block,
+                                                           ncomponents,
+                                                           guesses=block_guesses,
+                                                           maxiter=maxiter,
+                                                           tolerance=tolerance))
+
+        if guesses is not None and np.ndim(guesses) > 1:
+            guesses = da.from_array(np.asarray(guesses, dtype='float'),
+                                    chunks=((nparams,),) + data.chunks[1:])
+            fitted = da.map_blocks(fit_block, data, guesses, chunks=chunks,
+                                   dtype=float)
+        else:
+            fitted = data.map_blocks(fit_block, block_guesses=guesses,
+                                     chunks=chunks, dtype=float)
+
+        fitted = self._compute(fitted)
+
+        return self._gaussian_fit_projections(fitted[:nparams],
+                                              fitted[nparams:])
+
     @add_save_to_tmp_dir_option
     def spectral_smooth(self,
                         kernel,
@@ -741,6 +919,15 @@ class DaskSpectralCubeMixin:
             raise u.UnitsError("The convolution kernel should be defined "
                                "without a unit.")
 
+        if engine_supported(convolve, kernel, kwargs, extra_kwargs=()):
+            convolver = make_convolver(convolve, kernel, axes=(0,), **kwargs)
+
+            def spectral_smooth(array):
+                return convolver.convolve(array)
+
+            return self.apply_function_parallel_spectral(spectral_smooth,
+                                                         accepts_chunks=True)
+
         def spectral_smooth(array):
             kernel_3d = kernel.array.reshape((len(kernel.array), 1, 1))
             return convolve(array, kernel_3d, normalize_kernel=True)
@@ -804,6 +991,16 @@ class DaskSpectralCubeMixin:
             Passed to the convolve function
         """
 
+        if engine_supported(convolve, kernel, kwargs, extra_kwargs=()):
+            convolver = make_convolver(convolve, kernel, self.shape[1:],
+                                       **kwargs)
+
+            def convolve_wrapper(data, **kwargs):
+                return convolver.convolve(data)
+
+            return self.apply_function_parallel_spatial(convolve_wrapper,
+                                                        accepts_chunks=True)
+
         def convolve_wrapper(data, kernel=None, **kwargs):
             return convolve(data, kernel, normalize_kernel=True, **kwargs)
 
@@ -978,6 +1175,13 @@ class DaskSpectralCubeMixin:
 
         return tuple(slices)
 
+    def _extract_pixel_spectra(self, ypix, xpix):
+        # Index all spectra in a single graph so that each chunk (e.g., each
+        # tile of a CASA image) is read only once
+        data = self._get_filled_data(fill=np.nan)
+        channels = np.arange(self.shape[0])[:, None]
+        return self._compute(data.vindex[channels, ypix[None, :], xpix[None, :]])
+
     @add_save_to_tmp_dir_option
     def downsample_axis(self, factor, axis, estimator=np.nanmean,
                         truncate=False):
@@ -997,10 +1201,11 @@ class DaskSpectralCubeMixin:
         ----------
         myarr : `~numpy.ndarray`
             The array to downsample
-        factor : int
-            The factor to downsample by
-        axis : int
-            The axis to downsample along
+        factor : int or sequence of int
+            The factor to downsample by, either a single value for all of the
+            axes or one value per axis
+        axis : int or sequence of int
+            The axis or axes to downsample along
         estimator : function
             defaults to mean.  You can downsample by summing or
             something else if you want a different estimator
@@ -1023,21 +1228,25 @@ class DaskSpectralCubeMixin:
         warnings.warn('In some cases, the final shape of the output from downsample_axis '
                       'is incorrect, so use the result with caution', UserWarning)
 
+        blocks = cube_utils.downsample_blocks(factor, axis, self.ndim)
+
         data = self._get_filled_data(fill=self._fill_value)
         mask = da.asarray(self.mask.include(), name=str(uuid.uuid4()))
 
-        if not truncate and data.shape[axis] % factor != 0:
-            padding_shape = list(data.shape)
-            padding_shape[axis] = factor - data.shape[axis] % factor
-            data_padding = da.ones(padding_shape) * np.nan
-            mask_padding = da.zeros(padding_shape, dtype=bool)
-            data = da.concatenate([data, data_padding], axis=axis)
-            mask = da.concatenate([mask, mask_padding], axis=axis).rechunk()
+        for axis, factor in enumerate(blocks):
+            if not truncate and data.shape[axis] % factor != 0:
+                padding_shape = list(data.shape)
+                padding_shape[axis] = factor - data.shape[axis] % factor
+                data_padding = da.ones(padding_shape) * np.nan
+                mask_padding = da.zeros(padding_shape, dtype=bool)
+                data = da.concatenate([data, data_padding], axis=axis)
+                mask = da.concatenate([mask, mask_padding], axis=axis).rechunk()
 
-        data = da.coarsen(estimator, data, {axis: factor}, trim_excess=True)
-        mask = da.coarsen(estimator, mask, {axis: factor}, trim_excess=True)
+        coarsening = dict(enumerate(blocks))
+        data = da.coarsen(estimator, data, coarsening, trim_excess=True)
+        mask = da.coarsen(estimator, mask, coarsening, trim_excess=True)
 
-        view = [slice(None, None, factor) if ii == axis else slice(None) for ii in range(self.ndim)]
+        view = tuple(slice(None, None, factor) for factor in blocks)
         newwcs = wcs_utils.slice_wcs(self.wcs, view, shape=self.shape)
         newwcs._naxis = list(self.shape)
 
@@ -1154,6 +1363,177 @@ class DaskSpectralCubeMixin:
 
         return newcube
 
+    @add_save_to_tmp_dir_option
+    def spectral_resample(self, spectral_grid, kernel=None, fill_value=None):
+        """
+        Smooth and resample the cube spectrally in a single pass.
+
+        Each output channel is computed directly as a weighted sum of input
+        channels, with weights combining the smoothing kernel with either
+        block averaging (for an integer downsampling factor) or linear
+        interpolation (for a spectral grid).  This is equivalent to
+        `spectral_smooth` followed by `downsample_axis` or
+        `spectral_interpolate`, in a single ``map_blocks`` call.
+
+        Masked values are given zero weight and the remaining weights are
+        renormalized, so output channels are only masked if none of their
+        input channels are included.
+
+        Parameters
+        ----------
+        spectral_grid : int or `~astropy.units.Quantity`
+            Either an integer factor by which to downsample the spectral axis,
+            averaging blocks of channels as `downsample_axis` does, or an
+            array of the spectral positions to resample onto.  The grid must
+            be linear.
+        kernel : `~astropy.convolution.Kernel1D`, optional
+            A kernel, with an odd size, to smooth the input channels with.
+            When resampling onto a coarser grid, the default is a Gaussian
+            with a FWHM of ``sqrt(outdiff**2 - indiff**2)``, which smooths to
+            the resolution of the output grid.
+        fill_value : float
+            Value for output channels that lie outside of the spectral range
+            of the cube.  The default is to use the nearest spectral channel.
+        save_to_tmp_dir : bool
+            If `True`, the computation will be carried out straight away and
+            saved to a temporary directory. This can improve performance,
+            especially if carrying out several operations sequentially. If
+            `False`, the computation is only carried out when accessing
+            specific parts of the data or writing to disk.
+
+        Returns
+        -------
+        cube : SpectralCube
+        """
+
+        if kernel is not None and isinstance(getattr(kernel, 'array', kernel),
+                                             u.Quantity):
+            raise u.UnitsError("The convolution kernel should be defined "
+                               "without a unit.")
+
+        rows, outside, outindex, newwcs = self._spectral_resampling(spectral_grid,
+                                                                    kernel=kernel)
+        nout = len(rows)
+
+        def resample_block(block):
+            valid = np.isfinite(block)
+            block = np.where(valid, block, 0)
+            out = np.empty((nout,) + block.shape[1:])
+            for row, (indices, weights) in enumerate(rows):
+                numerator = np.tensordot(weights, block[indices], axes=1)
+                denominator = np.tensordot(weights, valid[indices], axes=1)
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    result = numerator / denominator
+                result[denominator == 0] = np.nan
+                if outside[row] and fill_value is not None:
+                    result[:] = fill_value
+                out[outindex[row]] = result
+            return out
+
+        cubedata = self._get_filled_data(fill=np.nan).rechunk((-1, 'auto', 'auto'))
+
+        newcube = cubedata.map_blocks(resample_block,
+                                      chunks=((nout,),) + cubedata.chunks[1:],
+                                      dtype=float)
+
+        newbmask = BooleanArrayMask(da.isfinite(newcube), wcs=newwcs)
+
+        return self._new_cube_with(data=newcube, wcs=newwcs, mask=newbmask,
+                                   meta=self.meta, fill_value=self.fill_value)
+
+    @add_save_to_tmp_dir_option
+    def reproject(self, header, order='bilinear', filled=True, **kwargs):
+        """
+        Spatially reproject the cube into a new header.  Fills the data with
+        the cube's ``fill_value`` to replace bad values before reprojection.
+
+        If you want to reproject a cube both spatially and spectrally, you need
+        to use `spectral_interpolate` as well.
+
+        The reprojection is lazy: the output is made of spatial tiles, each of
+        which reads only the region of the cube that overlaps it when it is
+        computed.
+
+        Parameters
+        ----------
+        header : `astropy.io.fits.Header`
+            A header specifying a cube in valid WCS
+        order : int or str, optional
+            The order of the interpolation (if ``mode`` is set to
+            ``'interpolation'``). This can be either one of the following
+            strings:
+
+                * 'nearest-neighbor'
+                * 'bilinear'
+                * 'biquadratic'
+                * 'bicubic'
+
+            or an integer. A value of ``0`` indicates nearest neighbor
+            interpolation.
+        filled : bool
+            Fill the masked values with the cube's fill value before
+            reprojection?
+        kwargs : dict
+            Options of `SpectralCube.reproject` that control the output
+            array (``use_memmap``, ``num_cores`` and ``memmap_dir``) are
+            accepted and ignored, since the result is a dask array.
+        save_to_tmp_dir : bool
+            If `True`, the computation will be carried out straight away and
+            saved to a temporary directory. This can improve performance,
+            especially if carrying out several operations sequentially. If
+            `False`, the computation is only carried out when accessing
+            specific parts of the data or writing to disk.
+        """
+
+        reproj_kwargs = _reproject_kwargs()
+
+        newwcs = wcs.WCS(header)
+        shape_out = tuple([header['NAXIS{0}'.format(i + 1)] for i in
+                           range(header['NAXIS'])][::-1])
+
+        if filled:
+            data = self._get_filled_data(fill=self._fill_value)
+        else:
+            data = self._data
+
+        dtype = 'float32' if data.dtype.itemsize == 4 else 'float64'
+
+        tiles = self._reproject_tiles(newwcs, shape_out, order=order)
+
+        data_rows, footprint_rows = [], []
+        for row in tiles:
+            data_row, footprint_row = [], []
+            for outview, inview in row:
+                outview = (slice(None),) + outview
+                tile_shape = (shape_out[0],) + tuple(view.stop - view.start
+                                                     for view in outview[1:])
+                if inview is None:
+                    data_row.append(da.full(tile_shape, np.nan, dtype=dtype))
+                    footprint_row.append(da.zeros(tile_shape, dtype='bool'))
+                    continue
+                inview = (slice(None),) + inview
+                tile_wcs = wcs_utils.slice_wcs(self.wcs, inview,
+                                               shape=self.shape)
+                result = dask.delayed(_reproject_tile, nout=2)(data[inview],
+                                                               tile_wcs,
+                                                               newwcs[outview],
+                                                               tile_shape, order,
+                                                               **reproj_kwargs)
+                data_row.append(da.from_delayed(result[0], shape=tile_shape,
+                                                dtype='float64').astype(dtype))
+                footprint_row.append(da.from_delayed(result[1], shape=tile_shape,
+                                                     dtype='float64') > 0)
+            data_rows.append(data_row)
+            footprint_rows.append(footprint_row)
+
+        # The nested lists of tiles are joined along the two spatial axes
+        newdata = da.block(data_rows)
+        footprint = da.block(footprint_rows)
+
+        return self._new_cube_with(data=newdata, wcs=newwcs,
+                                   mask=BooleanArrayMask(footprint, newwcs),
+                                   meta=self.meta)
+
 
 class DaskSpectralCube(DaskSpectralCubeMixin, SpectralCube):
 
@@ -1224,9 +1604,22 @@ class DaskSpectralCube(DaskSpectralCubeMixin, SpectralCube):
                           "Skipping convolution.")
             return self
 
-        pixscale = proj_plane_pixel_area(self.wcs.celestial)**0.5 * u.deg
+        pixscale = proj_plane_pixel_area(self._celestial_wcs)**0.5 * u.deg
 
         convolution_kernel = beam.deconvolve(self.beam).as_kernel(pixscale)
+
+        if engine_supported(convolve, convolution_kernel, kwargs,
+                            extra_kwargs=()):
+            convolver = make_convolver(convolve, convolution_kernel,
+                                       self.shape[1:], **kwargs)
+
+            def convfunc(img):
+                return convolver.convolve(img)
+
+            return self.apply_function_parallel_spatial(convfunc,
+                                                        accepts_chunks=True
+                                                        ).with_beam(beam)
+
         kernel = convolution_kernel.array.reshape((1,) + convolution_kernel.array.shape)
 
         # See #631: kwargs get passed within self.apply_function_parallel_spatial
@@ -1285,6 +1678,7 @@ class DaskVaryingResolutionSpectralCube(DaskSpectralCubeMixin, VaryingResolution
     @add_save_to_tmp_dir_option
     def convolve_to(self, beam, allow_smaller=False,
                     convolve=convolution.convolve_fft,
+                    kernel_tolerance=0.,
                     **kwargs):
         """
         Convolve each channel in the cube to a specified beam
@@ -1311,6 +1705,11 @@ class DaskVaryingResolutionSpectralCube(DaskSpectralCubeMixin, VaryingResolution
             The astropy convolution function to use, either
             `astropy.convolution.convolve` or
             `astropy.convolution.convolve_fft`
+        kernel_tolerance : float
+            Channels whose convolution kernels agree to within this relative
+            tolerance share a single kernel (see
+            `~spectral_cube._convolution.group_beam_kernels`).  The default
+            only groups channels with identical beams.
         save_to_tmp_dir : bool
             If `True`, the computation will be carried out straight away and
             saved to a temporary directory. This can improve performance,
@@ -1324,8 +1723,8 @@ class DaskVaryingResolutionSpectralCube(DaskSpectralCubeMixin, VaryingResolution
             A SpectralCube with a single ``beam``
         """
 
-        if ((self.wcs.celestial.wcs.get_pc()[0,1] != 0 or
-             self.wcs.celestial.wcs.get_pc()[1,0] != 0)):
+        if ((self._celestial_wcs.wcs.get_pc()[0,1] != 0 or
+             self._celestial_wcs.wcs.get_pc()[1,0] != 0)):
             warnings.warn("The beams will produce convolution kernels "
                           "that are not aware of any misaligment "
                           "between pixel and world coordinates, "
@@ -1335,48 +1734,51 @@ class DaskVaryingResolutionSpectralCube(DaskSpectralCubeMixin, VaryingResolution
                           BeamWarning
                          )
 
-        pixscale = wcs.utils.proj_plane_pixel_area(self.wcs.celestial)**0.5*u.deg
+        pixscale = wcs.utils.proj_plane_pixel_area(self._celestial_wcs)**0.5*u.deg
 
-        beams = []
-        for bm, valid in zip(self.unmasked_beams, self.goodbeams_mask):
-            if not valid:
-                # just skip masked-out beams
-                beams.append(None)
-                continue
-            elif beam == bm:
-                # Point response when beams are equal, don't convolve.
-                beams.append(None)
-                continue
-            try:
-                beams.append(beam.deconvolve(bm))
-            except ValueError:
-                if allow_smaller:
-                    beams.append(None)
-                else:
-                    raise
-
-        # We need to pass in the beams to dask, so we hide them inside an object array
+        # Each kernel is built once and applied to its whole group of channels
+        kernels, groups = group_beam_kernels(beam, self.unmasked_beams,
+                                             pixscale,
+                                             goodbeams=self.goodbeams_mask,
+                                             allow_smaller=allow_smaller,
+                                             tolerance=kernel_tolerance)
+        # We need to pass in the groups to dask, so we put them in an array
         # that can then be chunked like the data.
-        beams = da.from_array(np.array(beams, dtype=np.object)
-                              .reshape((len(beams), 1, 1)), chunks=(-1, -1, -1))
+        groups = da.from_array(groups.reshape((len(groups), 1, 1)),
+                               chunks=(-1, -1, -1))
+
+        # Convolution engines, shared between blocks
+        convolvers = {}
 
         # See #631: kwargs get passed within self.apply_function_parallel_spatial
-        def convfunc(img, beam, **kwargs):
+        def convfunc(img, group, **kwargs):
             if img.size > 0:
                 out = np.zeros(img.shape, dtype=img.dtype)
-                for index in range(img.shape[0]):
-                    if beam[index, 0, 0] is None:
-                        out[index] = img[index]
+                group = group[:, 0, 0]
+                for igroup in np.unique(group):
+                    sel = group == igroup
+                    if igroup < 0:
+                        out[sel] = img[sel]
+                    elif engine_supported(convolve, kernels[igroup], kwargs,
+                                          extra_kwargs=()):
+                        if igroup not in convolvers:
+                            convolvers[igroup] = make_convolver(convolve,
+                                                                kernels[igroup],
+                                                                img.shape[1:],
+                                                                **kwargs)
+                        out[sel] = convolvers[igroup].convolve(img[sel])
                     else:
-                        kernel = beam[index, 0, 0].as_kernel(pixscale)
-                        out[index] = convolve(img[index], kernel, normalize_kernel=True, **kwargs)
+                        for index in np.flatnonzero(sel):
+                            out[index] = convolve(img[index], kernels[igroup],
+                                                  normalize_kernel=True,
+                                                  **kwargs)
                 return out
             else:
                 return img
 
         # Rechunk so that there is only one chunk in the image plane
         cube = self._map_blocks_to_cube(convfunc,
-                                        additional_arrays=(beams,),
+                                        additional_arrays=(groups,),
                                         rechunk=('auto', -1, -1),
                                         **kwargs)
 
@@ -1404,6 +1806,12 @@ class DaskVaryingResolutionSpectralCube(DaskSpectralCubeMixin, VaryingResolution
                              "common resolution with `convolve_to` before "
                              "attempting spectral smoothed.")
 
+    def spectral_resample(self, *args, **kwargs):
+        raise AttributeError("VaryingResolutionSpectralCubes can't be "
+                             "spectrally resampled.  Convolve to a "
+                             "common resolution with `convolve_to` before "
+                             "attempting spectral resampling.")
+
     @property
     def _mask_include(self):
         return da.from_array(MaskHandler(self), name='MaskHandler ' + str(uuid.uuid4()), chunks=self._data.chunksize)
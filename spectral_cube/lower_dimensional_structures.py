@@ -9,7 +9,9 @@ import dask.array as da
 from astropy import convolution
 from astropy import units as u
 from astropy import wcs
+from astropy.table import Table
 #from astropy import log
+from astropy.io import fits
 from astropy.io.fits import Header, HDUList, PrimaryHDU, BinTableHDU, FITS_rec
 from radio_beam import Beam, Beams
 from astropy.io.registry import UnifiedReadWriteMethod
@@ -27,8 +29,10 @@ from .base_class import (BaseNDClass, SpectralAxisMixinClass,
                          HeaderMixinClass
                         )
 from . import cube_utils
+from ._convolution import engine_supported, make_convolver
 
-__all__ = ['LowerDimensionalObject', 'Projection', 'Slice', 'OneDSpectrum']
+__all__ = ['LowerDimensionalObject', 'Projection', 'Slice', 'OneDSpectrum',
+           'SpectrumCollection']
 class LowerDimensionalObject(u.Quantity, BaseNDClass, HeaderMixinClass):
     """
     Generic class for 1D and 2D objects.
@@ -89,23 +93,50 @@ class LowerDimensionalObject(u.Quantity, BaseNDClass, HeaderMixinClass):
         else:
             newwcs = None
 
-        new = self.__class__(value=new_qty.value,
-                             unit=new_qty.unit,
-                             copy=False,
-                             wcs=newwcs,
-                             meta=self._meta,
-                             mask=(self._mask[key] if self._mask is not nomask
-                                   else None),
-                             header=self._header,
-                             **kwargs)
-
-        new._wcs = newwcs
-        new._meta = self._meta
-        new._mask=(self._mask[key] if self._mask is not nomask else nomask)
-        new._header = self._header
+        new = self._from_parts(new_qty.value, new_qty.unit,
+                               wcs=newwcs,
+                               meta=self._meta,
+                               mask=(self._mask[key]
+                                     if self._mask is not nomask
+                                     else nomask),
+                               header=self._header,
+                               fill_value=self._fill_value,
+                               wcs_tolerance=self._wcs_tolerance,
+                               **kwargs)
 
         return new
 
+    @classmethod
+    def _from_parts(cls, value, unit, wcs=None, meta=None, mask=None,
+                    header=None, fill_value=np.nan, wcs_tolerance=0.0):
+        """
+        Create a new object from trusted parts, skipping the validation and
+        copies done by ``__new__``.
+
+        This is meant for internal use when the parts come from an existing
+        object and are known to be consistent: ``value`` is an array of the
+        right dimensionality, which is not copied, and ``mask`` is a
+        `~spectral_cube.masks.MaskBase` matching ``value`` and ``wcs`` (or
+        ``nomask``), which is not validated against the WCS.  ``wcs``,
+        ``meta`` and ``header`` are shared with the new object rather than
+        copied.
+        """
+        self = u.Quantity(value, unit=unit, copy=False).view(cls)
+        self._wcs = wcs
+        self._meta = {} if meta is None else meta
+        self._wcs_tolerance = wcs_tolerance
+
+        if mask is None:
+            mask = BooleanArrayMask(np.ones(self.shape, dtype=bool), wcs,
+                                    shape=self.shape)
+        self._mask = mask
+
+        self._fill_value = fill_value
+        self._header = Header() if header is None else header
+        self._cache = {}
+
+        return self
+
     def __array_finalize__(self, obj):
         self._wcs = getattr(obj, '_wcs', None)
         self._meta = getattr(obj, '_meta', None)
@@ -114,6 +145,7 @@ class LowerDimensionalObject(u.Quantity, BaseNDClass, HeaderMixinClass):
         self._spectral_unit = getattr(obj, '_spectral_unit', None)
         self._fill_value = getattr(obj, '_fill_value', np.nan)
         self._wcs_tolerance = getattr(obj, '_wcs_tolerance', 0.0)
+        self._metadata_cache = getattr(obj, '_metadata_cache', None)
 
         if isinstance(obj, VaryingResolutionOneDSpectrum):
             self._beams = getattr(obj, '_beams', None)
@@ -211,9 +243,9 @@ class LowerDimensionalObject(u.Quantity, BaseNDClass, HeaderMixinClass):
         # versions
         # Not entirely sure the use of __class__ here is kosher, but we do want
         # self.__class__, not super()
-        new = self.__class__(value=converted_array, unit=unit, copy=True,
-                             wcs=self._wcs, meta=self._meta, mask=self._mask,
-                             header=self._header)
+        new = self._from_parts(converted_array, unit, wcs=self._wcs,
+                               meta=self._meta, mask=self._mask,
+                               header=self._header)
 
         return new
 
@@ -317,6 +349,20 @@ class Projection(LowerDimensionalObject, SpatialCoordMixinClass,
 
         return self
 
+    @classmethod
+    def _from_parts(cls, value, unit, beam=None, **kwargs):
+        self = super(Projection, cls)._from_parts(value, unit, **kwargs)
+
+        if beam is None:
+            beam = self._meta.get('beam')
+        if beam is not None:
+            self._beam = beam
+            self._meta['beam'] = beam
+
+        return self
+
+    _from_parts.__doc__ = LowerDimensionalObject._from_parts.__doc__
+
     def with_beam(self, beam):
         '''
         Attach a new beam object to the Projection.
@@ -492,14 +538,19 @@ class Projection(LowerDimensionalObject, SpatialCoordMixinClass,
                           "Skipping convolution.")
             return self
 
-        pixscale = wcs.utils.proj_plane_pixel_area(self.wcs.celestial)**0.5 * u.deg
+        pixscale = wcs.utils.proj_plane_pixel_area(self._celestial_wcs)**0.5 * u.deg
 
         convolution_kernel = \
             beam.deconvolve(self.beam).as_kernel(pixscale)
 
-        newdata = convolve(self.value, convolution_kernel,
-                           normalize_kernel=True,
-                           **kwargs)
+        if engine_supported(convolve, convolution_kernel, kwargs,
+                            extra_kwargs=()):
+            newdata = make_convolver(convolve, convolution_kernel, self.shape,
+                                     **kwargs).convolve(self.value)
+        else:
+            newdata = convolve(self.value, convolution_kernel,
+                               normalize_kernel=True,
+                               **kwargs)
 
         self = Projection(newdata, unit=self.unit, wcs=self.wcs,
                           meta=self.meta, header=self.header,
@@ -660,6 +711,23 @@ class BaseOneDSpectrum(LowerDimensionalObject, MaskableArrayMixinClass,
         else:
             self._header = Header()
 
+        self._set_initial_spectral_unit(spectral_unit)
+
+        return self
+
+    @classmethod
+    def _from_parts(cls, value, unit, spectral_unit=None, **kwargs):
+        self = super(BaseOneDSpectrum, cls)._from_parts(value, unit, **kwargs)
+        self._set_initial_spectral_unit(spectral_unit)
+        return self
+
+    _from_parts.__doc__ = LowerDimensionalObject._from_parts.__doc__
+
+    def _set_initial_spectral_unit(self, spectral_unit):
+        """
+        Set the spectral unit, or determine it from the header or WCS if it
+        is not given.
+        """
         self._spectral_unit = spectral_unit
 
         if spectral_unit is None:
@@ -668,8 +736,6 @@ class BaseOneDSpectrum(LowerDimensionalObject, MaskableArrayMixinClass,
             elif self._wcs is not None:
                 self._spectral_unit = u.Unit(self._wcs.wcs.cunit[0])
 
-        return self
-
     def __repr__(self):
         prefixstr = '<' + self.__class__.__name__ + ' '
         arrstr = np.array2string(self.filled_data[:].value, separator=',',
@@ -721,9 +787,8 @@ class BaseOneDSpectrum(LowerDimensionalObject, MaskableArrayMixinClass,
 
         return self
 
-    @property
-    def header(self):
-        header = super(BaseOneDSpectrum, self).header
+    def _make_header(self):
+        header = super(BaseOneDSpectrum, self)._make_header()
 
         # Preserve the spectrum's spectral units
         if 'CUNIT1' in header and self._spectral_unit != u.Unit(header['CUNIT1']):
@@ -740,7 +805,11 @@ class BaseOneDSpectrum(LowerDimensionalObject, MaskableArrayMixinClass,
         A `~astropy.units.Quantity` array containing the central values of
         each channel along the spectral axis.
         """
+        return self._cached_metadata('spectral_axis', self._make_spectral_axis,
+                                     self._wcs, self.size,
+                                     self._spectral_unit).copy()
 
+    def _make_spectral_axis(self):
         if self._wcs is None:
             spec_axis = np.arange(self.size) * u.one
         else:
@@ -749,6 +818,7 @@ class BaseOneDSpectrum(LowerDimensionalObject, MaskableArrayMixinClass,
             if self._spectral_unit is not None:
                 spec_axis = spec_axis.to(self._spectral_unit)
 
+        spec_axis.flags.writeable = False
         return spec_axis
 
     def quicklook(self, filename=None, drawstyle='steps-mid', **kwargs):
@@ -810,19 +880,18 @@ class BaseOneDSpectrum(LowerDimensionalObject, MaskableArrayMixinClass,
 
         if isinstance(key, slice):
 
-            new = self.__class__(value=new_qty.value,
-                                 unit=new_qty.unit,
-                                 copy=False,
-                                 wcs=wcs_utils.slice_wcs(self._wcs, key,
-                                                         shape=self.shape),
-                                 meta=self._meta,
-                                 mask=(self._mask[key]
-                                       if self._mask is not nomask
-                                       else nomask),
-                                 header=self._header,
-                                 wcs_tolerance=self._wcs_tolerance,
-                                 fill_value=self.fill_value,
-                                 **kwargs)
+            new = self._from_parts(new_qty.value, new_qty.unit,
+                                   wcs=wcs_utils.slice_wcs(self._wcs, key,
+                                                           shape=self.shape),
+                                   meta=self._meta,
+                                   mask=(self._mask[key]
+                                         if self._mask is not nomask
+                                         else nomask),
+                                   header=self._header,
+                                   wcs_tolerance=self._wcs_tolerance,
+                                   fill_value=self.fill_value,
+                                   spectral_unit=self._spectral_unit,
+                                   **kwargs)
 
             return new
         else:
@@ -1059,6 +1128,20 @@ class OneDSpectrum(BaseOneDSpectrum, BeamMixinClass):
 
         return self
 
+    @classmethod
+    def _from_parts(cls, value, unit, beam=None, **kwargs):
+        self = super(OneDSpectrum, cls)._from_parts(value, unit, **kwargs)
+
+        if beam is None:
+            beam = self._meta.get('beam')
+        if beam is not None:
+            self._beam = beam
+            self._meta['beam'] = beam
+
+        return self
+
+    _from_parts.__doc__ = LowerDimensionalObject._from_parts.__doc__
+
     def _new_spectrum_with(self, **kwargs):
         beam = kwargs.pop('beam', None)
         if 'beam' in self._meta and beam is None:
@@ -1123,6 +1206,25 @@ class VaryingResolutionOneDSpectrum(BaseOneDSpectrum, MultiBeamMixinClass):
 
         return self
 
+    @classmethod
+    def _from_parts(cls, value, unit, beams=None, goodbeams_mask=None,
+                    **kwargs):
+        VRODS = VaryingResolutionOneDSpectrum
+        self = super(VRODS, cls)._from_parts(value, unit, **kwargs)
+
+        if beams is None:
+            beams = self._meta.get('beams')
+        if beams is not None:
+            self._beams = beams
+            self._meta['beams'] = beams
+
+        if goodbeams_mask is not None:
+            self._goodbeams_mask = goodbeams_mask
+
+        return self
+
+    _from_parts.__doc__ = LowerDimensionalObject._from_parts.__doc__
+
     @property
     def hdu(self):
         warnings.warn("There are multiple beams for this spectrum that "
@@ -1169,3 +1271,482 @@ class VaryingResolutionOneDSpectrum(BaseOneDSpectrum, MultiBeamMixinClass):
         new_qty.beams = self.unmasked_beams[key]
 
         return new_qty
+
+
+class SpectrumCollection(LowerDimensionalObject, SpectralAxisMixinClass,
+                         BeamMixinClass):
+    """
+    A set of spectra that share one spectral axis, unit and beam, stored as a
+    single ``(nspectra, nchan)`` array.
+
+    Per-spectrum information, such as the position each spectrum was
+    extracted at, is kept in the columns of the ``positions`` table, which
+    has one row per spectrum.  Indexing a collection with an integer returns
+    a `OneDSpectrum`; other indices return a new `SpectrumCollection`.
+
+    Spectra in a collection are not masked: excluded values are NaN.
+
+    Parameters
+    ----------
+    value : array-like
+        The spectra, with shape ``(nspectra, nchan)``
+    wcs : `~astropy.wcs.WCS`
+        The one-dimensional spectral WCS shared by all spectra
+    positions : `~astropy.table.Table` or dict, optional
+        Per-spectrum metadata, one row per spectrum
+    beam : `~radio_beam.Beam`, optional
+        The beam shared by all spectra
+    """
+
+    def __new__(cls, value, unit=None, dtype=None, copy=True, wcs=None,
+                meta=None, mask=None, header=None, spectral_unit=None,
+                beam=None, positions=None, fill_value=np.nan,
+                wcs_tolerance=0.0):
+
+        if np.asarray(value).ndim != 2:
+            raise ValueError("value should be a 2-d array")
+
+        if wcs is not None and wcs.wcs.naxis != 1:
+            raise ValueError("wcs should have one dimension")
+
+        if mask is not None and mask is not nomask:
+            raise ValueError("SpectrumCollections cannot be masked; set "
+                             "excluded values to NaN instead.")
+
+        self = u.Quantity.__new__(cls, value, unit=unit, dtype=dtype,
+                                  copy=copy).view(cls)
+        self._wcs = wcs
+        self._meta = {} if meta is None else meta
+        self._wcs_tolerance = wcs_tolerance
+        self._mask = None
+        self._fill_value = fill_value
+
+        if header is not None:
+            self._header = header
+        else:
+            self._header = Header()
+
+        self._spectral_unit = spectral_unit
+        if spectral_unit is None and self._wcs is not None:
+            self._spectral_unit = u.Unit(self._wcs.wcs.cunit[0])
+
+        if positions is None:
+            positions = Table()
+        elif not isinstance(positions, Table):
+            positions = Table(positions)
+        if len(positions.columns) > 0 and len(positions) != self.shape[0]:
+            raise ValueError("positions must have one row per spectrum "
+                             "({0} rows for {1} spectra)"
+                             .format(len(positions), self.shape[0]))
+        self._positions = positions
+
+        if beam is None and "beam" in self.meta:
+            beam = self.meta['beam']
+
+        self._beam = None
+        if beam is not None:
+            self.beam = beam
+            self.meta['beam'] = beam
+
+        self._cache = {}
+
+        return self
+
+    def __array_finalize__(self, obj):
+        super(SpectrumCollection, self).__array_finalize__(obj)
+        self._positions = getattr(obj, '_positions', None)
+
+    def __repr__(self):
+        return ("<{0}: {1} spectra of {2} channels, unit={3}>"
+                .format(self.__class__.__name__, self.shape[0],
+                        self.shape[1], self.unit))
+
+    @property
+    def positions(self):
+        """
+        An `~astropy.table.Table` with one row of metadata per spectrum.
+        """
+        return self._positions
+
+    @property
+    def spectral_axis(self):
+        """
+        A `~astropy.units.Quantity` array containing the central values of
+        each channel along the spectral axis.
+        """
+        return self._cached_metadata('spectral_axis', self._make_spectral_axis,
+                                     self._wcs, self.shape[1],
+                                     self._spectral_unit).copy()
+
+    def _make_spectral_axis(self):
+        nchan = self.shape[1]
+
+        if self._wcs is None:
+            spec_axis = np.arange(nchan) * u.one
+        else:
+            spec_axis = self.wcs.wcs_pix2world(np.arange(nchan), 0)[0] * \
+                u.Unit(self.wcs.wcs.cunit[0])
+            if self._spectral_unit is not None:
+                spec_axis = spec_axis.to(self._spectral_unit)
+
+        spec_axis.flags.writeable = False
+        return spec_axis
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __iter__(self):
+        for ii in range(self.shape[0]):
+            yield self[ii]
+
+    def __getitem__(self, key):
+
+        if not isinstance(key, tuple):
+            key = (key,)
+        if len(key) > 2:
+            raise IndexError("Too many indices")
+
+        rows = key[0]
+        channels = key[1] if len(key) == 2 else slice(None)
+
+        if not isinstance(channels, slice):
+            # Selecting individual channels loses the spectral axis
+            return self.quantity[key]
+
+        if channels == slice(None):
+            newwcs = self._wcs
+        else:
+            newwcs = wcs_utils.slice_wcs(self._wcs, (channels,),
+                                         shape=self.shape[1:])
+
+        if isinstance(rows, (int, np.integer)):
+            meta = {}
+            meta.update(self._meta)
+            beam = {'beam': self._beam} if self._beam is not None else {}
+            return OneDSpectrum(value=self.value[rows, channels],
+                                unit=self.unit, copy=False, wcs=newwcs,
+                                meta=meta, header=self._header,
+                                spectral_unit=self._spectral_unit,
+                                fill_value=self._fill_value, **beam)
+
+        if len(self._positions.columns) > 0:
+            positions = self._positions[rows]
+        else:
+            positions = None
+
+        return self._new_collection_with(data=self.value[rows, channels],
+                                         wcs=newwcs, positions=positions)
+
+    def to(self, unit, equivalencies=[]):
+        """
+        Return a new `~spectral_cube.lower_dimensional_structures.SpectrumCollection`
+        with the specified unit.
+        See `astropy.units.Quantity.to` for further details.
+        """
+
+        new = super(SpectrumCollection, self).to(unit, equivalencies,
+                                                 freq=None)
+
+        if new is self:
+            return self
+
+        return self._new_collection_with(data=new.value, unit=new.unit)
+
+    @property
+    def _new_thing_with(self):
+        return self._new_collection_with
+
+    def _new_collection_with(self, data=None, wcs=None, unit=None, meta=None,
+                             header=None, spectral_unit=None, beam=None,
+                             positions=None, fill_value=None):
+
+        data = self.value if data is None else data
+        if unit is None:
+            unit = self.unit
+        elif not isinstance(unit, u.Unit):
+            unit = u.Unit(unit)
+
+        if meta is None:
+            meta = {}
+            meta.update(self._meta)
+        meta['BUNIT'] = unit.to_string(format='FITS')
+
+        if beam is None:
+            beam = self._beam
+
+        if positions is None and len(self._positions.columns) > 0:
+            positions = self._positions
+
+        spectral_unit = (self._spectral_unit if spectral_unit is None
+                         else u.Unit(spectral_unit))
+
+        return self.__class__(value=data, unit=unit, copy=False,
+                              wcs=self._wcs if wcs is None else wcs,
+                              meta=meta,
+                              header=self._header if header is None else header,
+                              spectral_unit=spectral_unit,
+                              beam=beam, positions=positions,
+                              fill_value=(self._fill_value if fill_value is None
+                                          else fill_value),
+                              wcs_tolerance=self._wcs_tolerance)
+
+    @property
+    def hdu(self):
+        """
+        A `~astropy.io.fits.BinTableHDU` with one row per spectrum.
+
+        The spectra are stored in the ``SPECTRUM`` array column alongside the
+        columns of ``positions``; the shared spectral WCS, unit and beam are
+        stored in the header.
+        """
+        table = Table(self._positions, copy=True)
+        if 'SPECTRUM' in table.colnames:
+            raise ValueError("'SPECTRUM' is reserved for the spectra and "
+                             "cannot be used as a column name in positions.")
+        table['SPECTRUM'] = self.value
+
+        hdu = fits.table_to_hdu(table)
+
+        header = self._nowcs_header.copy()
+        for key in ('SIMPLE', 'EXTEND', 'BITPIX', 'XTENSION', 'PCOUNT',
+                    'GCOUNT', 'TFIELDS'):
+            header.remove(key, ignore_missing=True, remove_all=True)
+        for key in list(header.keys()):
+            if key.startswith(('TTYPE', 'TFORM', 'TUNIT', 'TDIM')):
+                header.remove(key, remove_all=True)
+
+        if self._wcs is not None:
+            header.update(self._wcs.to_header())
+            # Store the spectral axis in the collection's spectral unit
+            if self._spectral_unit is not None:
+                wcs_cunit = u.Unit(header['CUNIT1'])
+                header['CDELT1'] *= wcs_cunit.to(self._spectral_unit)
+                header['CRVAL1'] *= wcs_cunit.to(self._spectral_unit)
+                header['CUNIT1'] = self._spectral_unit.to_string(format='FITS')
+
+        header['BUNIT'] = self.unit.to_string(format='FITS')
+        if self._beam is not None:
+            header = self._beam.attach_to_header(header)
+
+        hdu.header.update(header)
+
+        return hdu
+
+    @property
+    def hdulist(self):
+        return HDUList([PrimaryHDU(), self.hdu])
+
+    @staticmethod
+    def from_hdu(hdu):
+        '''
+        Return a SpectrumCollection from a FITS binary table HDU or an HDU
+        list containing one, as written by `SpectrumCollection.write`.
+        '''
+
+        if isinstance(hdu, HDUList):
+            tables = [hh for hh in hdu if isinstance(hh, BinTableHDU)]
+            if len(tables) == 0:
+                raise ValueError("HDU list does not contain a binary table.")
+            hdu = tables[0]
+
+        if not isinstance(hdu, BinTableHDU):
+            raise ValueError("HDU must be a binary table.")
+
+        table = Table.read(hdu)
+        if 'SPECTRUM' not in table.colnames:
+            raise ValueError("Table does not contain a SPECTRUM column.")
+
+        spectra = np.asarray(table['SPECTRUM'])
+        if spectra.ndim == 1:
+            spectra = spectra[:, None]
+        table.remove_column('SPECTRUM')
+
+        meta = {}
+        if "BUNIT" in hdu.header:
+            unit = convert_bunit(hdu.header["BUNIT"])
+            meta["BUNIT"] = hdu.header["BUNIT"]
+        else:
+            unit = None
+
+        spectral_unit = None
+        if 'CTYPE1' in hdu.header:
+            # Drop the table structure keywords, leaving the spectral WCS
+            wcsheader = Header([card for card in hdu.header.cards
+                                if not card.keyword.startswith(
+                                    ('XTENSION', 'BITPIX', 'NAXIS', 'PCOUNT',
+                                     'GCOUNT', 'TFIELDS', 'TTYPE', 'TFORM',
+                                     'TUNIT', 'TDIM'))])
+            wcsheader['WCSAXES'] = 1
+            mywcs = wcs.WCS(wcsheader)
+            if 'CUNIT1' in hdu.header:
+                spectral_unit = u.Unit(hdu.header['CUNIT1'])
+        else:
+            mywcs = None
+
+        beam = cube_utils.try_load_beam(hdu.header)
+
+        return SpectrumCollection(spectra, unit=unit, wcs=mywcs, meta=meta,
+                                  spectral_unit=spectral_unit, beam=beam,
+                                  positions=table if table.colnames else None)
+
+    @classmethod
+    def read(cls, filename, hdu=1, **kwargs):
+        """
+        Read a SpectrumCollection from a FITS file.
+
+        Parameters
+        ----------
+        filename : str
+            The file to read from
+        hdu : int or str
+            The binary table HDU to read
+        kwargs : dict
+            Passed to `astropy.io.fits.open`
+        """
+        with fits.open(filename, **kwargs) as hdulist:
+            return cls.from_hdu(hdulist[hdu])
+
+    def with_spectral_unit(self, unit, velocity_convention=None,
+                           rest_value=None):
+
+        newwcs, newmeta = self._new_spectral_wcs(unit,
+                                                 velocity_convention=velocity_convention,
+                                                 rest_value=rest_value)
+
+        return self._new_collection_with(wcs=newwcs, spectral_unit=unit,
+                                         meta=newmeta)
+
+    with_spectral_unit.__doc__ = BaseOneDSpectrum.with_spectral_unit.__doc__
+
+    def spectral_interpolate(self, spectral_grid,
+                             suppress_smooth_warning=False,
+                             fill_value=None):
+        """
+        Resample all of the spectra onto a specific grid
+
+        The interpolation indices and weights are computed once and applied
+        to every spectrum at the same time.
+
+        Parameters
+        ----------
+        spectral_grid : array
+            An array of the spectral positions to regrid onto
+        suppress_smooth_warning : bool
+            If disabled, a warning will be raised when interpolating onto a
+            grid that does not nyquist sample the existing grid.  Disable this
+            if you have already appropriately smoothed the data.
+        fill_value : float
+            Value for extrapolated spectral values that lie outside of
+            the spectral range defined in the original data.  The
+            default is to use the nearest spectral channel.
+
+        Returns
+        -------
+        spectra : SpectrumCollection
+        """
+
+        assert spectral_grid.ndim == 1
+
+        inaxis = self.spectral_axis.to(spectral_grid.unit)
+
+        indiff = np.mean(np.diff(inaxis))
+        outdiff = np.mean(np.diff(spectral_grid))
+
+        # account for reversed axes
+        if outdiff < 0:
+            spectral_grid = spectral_grid[::-1]
+            outdiff = np.mean(np.diff(spectral_grid))
+            outslice = slice(None, None, -1)
+        else:
+            outslice = slice(None, None, 1)
+
+        specslice = slice(None) if indiff >= 0 else slice(None, None, -1)
+        inaxis = inaxis[specslice]
+        indiff = np.mean(np.diff(inaxis))
+
+        # insanity checks
+        if indiff < 0 or outdiff < 0:
+            raise ValueError("impossible.")
+
+        assert np.all(np.diff(spectral_grid) > 0)
+        assert np.all(np.diff(inaxis) > 0)
+
+        np.testing.assert_allclose(np.diff(spectral_grid), outdiff,
+                                   err_msg="Output grid must be linear")
+
+        if outdiff > 2 * indiff and not suppress_smooth_warning:
+            warnings.warn("Input grid has too small a spacing. The data should "
+                          "be smoothed prior to resampling.",
+                          SmoothingWarning
+                         )
+
+        lower, upper, weight, outside = \
+            cube_utils.linear_interpolation_weights(spectral_grid.value,
+                                                    inaxis.value)
+
+        data = self.value[:, specslice]
+        interped = data[:, lower] * (1 - weight) + data[:, upper] * weight
+        if fill_value is not None:
+            interped[:, outside] = fill_value
+
+        newspec = np.empty((self.shape[0], spectral_grid.size),
+                           dtype=interped.dtype)
+        newspec[:, outslice] = interped
+
+        newwcs = self.wcs.deepcopy()
+        newwcs.wcs.crpix[0] = 1
+        newwcs.wcs.crval[0] = spectral_grid[0].value if outslice.step > 0 \
+            else spectral_grid[-1].value
+
+        newwcs.wcs.cunit[0] = spectral_grid.unit.to_string(format='FITS')
+        newwcs.wcs.cdelt[0] = outdiff.value if outslice.step > 0 \
+            else -outdiff.value
+
+        newwcs.wcs.set()
+
+        return self._new_collection_with(data=newspec, wcs=newwcs,
+                                         spectral_unit=spectral_grid.unit)
+
+    def spectral_smooth(self, kernel,
+                        convolve=convolution.convolve,
+                        **kwargs):
+        """
+        Smooth all of the spectra with a single call to the convolution
+        function.
+
+        Parameters
+        ----------
+        kernel : `~astropy.convolution.Kernel1D`
+            A 1D kernel from astropy
+        convolve : function
+            The astropy convolution function to use, either
+            `astropy.convolution.convolve` or
+            `astropy.convolution.convolve_fft`
+        kwargs : dict
+            Passed to the convolve function
+        """
+
+        if isinstance(kernel, convolution.Kernel1D):
+            kernel = kernel.array
+
+        # A (1, n) kernel smooths along the spectral axis only
+        kernel = np.asarray(kernel)[None, :]
+
+        newspec = convolve(self.value, kernel, normalize_kernel=True, **kwargs)
+
+        return self._new_collection_with(data=newspec)
+
+    def with_beam(self, beam):
+        '''
+        Attach a new beam object to the SpectrumCollection.
+
+        Parameters
+        ----------
+        beam : `~radio_beam.Beam`
+            A new beam object.
+        '''
+
+        meta = self.meta.copy()
+        meta['beam'] = beam
+
+        return self._new_collection_with(beam=beam, meta=meta)
@@ -14,12 +14,13 @@ import dask.array as da
 from astropy.wcs import InconsistentAxisTypesError
 from astropy.io import fits
 
+from . import cube_utils
 from . import wcs_utils
 from .utils import WCSWarning
 
 
 __all__ = ['MaskBase', 'InvertedMask', 'CompositeMask', 'BooleanArrayMask',
-           'LazyMask', 'LazyComparisonMask', 'FunctionMask']
+           'LazyMask', 'LazyComparisonMask', 'FunctionMask', 'SlicedMask']
 
 # Global version of the with_spectral_unit docs to avoid duplicating them
 with_spectral_unit_docs = """
@@ -101,6 +102,40 @@ def view_of_subset(shp1, shp2, view):
     # array[(0,0)] = array[0,0]
     return tuple(cv_view)
 
+# Results of WCS comparisons shared by all masks, keyed on the fingerprints of
+# the two WCSes and the comparison options.
+_wcs_validation_cache = {}
+_WCS_VALIDATION_CACHE_SIZE = 1024
+
+
+def _wcs_equal_cached(wcs1, wcs2, **kwargs):
+    """
+    Memoised version of `wcs_utils.check_equality` (with
+    ``warn_missing=True``) that is O(1) for repeated comparisons of the same
+    pair of coordinate systems.
+    """
+    if wcs1 is wcs2:
+        return True
+
+    key = (wcs_utils.wcs_fingerprint(wcs1),
+           wcs_utils.wcs_fingerprint(wcs2),
+           tuple(sorted((kw, tuple(val) if isinstance(val, list) else val)
+                        for kw, val in kwargs.items())))
+
+    try:
+        return _wcs_validation_cache[key]
+    except KeyError:
+        pass
+
+    result = wcs_utils.check_equality(wcs1, wcs2, warn_missing=True, **kwargs)
+
+    if len(_wcs_validation_cache) >= _WCS_VALIDATION_CACHE_SIZE:
+        _wcs_validation_cache.clear()
+    _wcs_validation_cache[key] = result
+
+    return result
+
+
 class MaskBase(object):
 
     __metaclass__ = abc.ABCMeta
@@ -526,22 +561,17 @@ class BooleanArrayMask(MaskBase):
         if new_data is not None and not is_broadcastable_and_smaller(self._mask.shape,
                                                                      new_data.shape):
             raise ValueError("data shape cannot be broadcast to match mask shape")
-        if new_wcs is not None:
-            if new_wcs not in self._wcs_whitelist:
-                try:
-                    if not wcs_utils.check_equality(new_wcs, self._wcs,
-                                                    warn_missing=True,
-                                                    **kwargs):
-                        raise ValueError("WCS does not match mask WCS")
-                    else:
-                        self._wcs_whitelist.add(new_wcs)
-                except InconsistentAxisTypesError:
-                    warnings.warn("Inconsistent axis type encountered; WCS is "
-                                  "invalid and therefore will not be checked "
-                                  "against other WCSes.",
-                                  WCSWarning
-                                  )
-                    self._wcs_whitelist.add(new_wcs)
+        if new_wcs is not None and new_wcs not in self._wcs_whitelist:
+            try:
+                if not _wcs_equal_cached(new_wcs, self._wcs, **kwargs):
+                    raise ValueError("WCS does not match mask WCS")
+            except InconsistentAxisTypesError:
+                warnings.warn("Inconsistent axis type encountered; WCS is "
+                              "invalid and therefore will not be checked "
+                              "against other WCSes.",
+                              WCSWarning
+                              )
+                self._wcs_whitelist.add(new_wcs)
 
     def _include(self, data=None, wcs=None, view=()):
         result_mask = self._mask[view]
@@ -611,8 +641,6 @@ class LazyMask(MaskBase):
         else:
             raise ValueError("Either a cube or (data & wcs) is required.")
 
-        self._wcs_whitelist = set()
-
     @property
     def shape(self):
         return self._data.shape
@@ -630,12 +658,8 @@ class LazyMask(MaskBase):
             if not is_broadcastable_and_smaller(new_data.shape, self._data.shape):
                 raise ValueError("data shape cannot be broadcast to match mask shape")
         if new_wcs is not None:
-            if new_wcs not in self._wcs_whitelist:
-                if not wcs_utils.check_equality(new_wcs, self._wcs,
-                                                warn_missing=True, **kwargs):
-                    raise ValueError("WCS does not match mask WCS")
-                else:
-                    self._wcs_whitelist.add(new_wcs)
+            if not _wcs_equal_cached(new_wcs, self._wcs, **kwargs):
+                raise ValueError("WCS does not match mask WCS")
 
     def _include(self, data=None, wcs=None, view=()):
         self._validate_wcs(data, wcs)
@@ -707,8 +731,6 @@ class LazyComparisonMask(LazyMask):
 
         self._comparison_value = comparison_value
 
-        self._wcs_whitelist = set()
-
     def _include(self, data=None, wcs=None, view=()):
         self._validate_wcs(data, wcs)
 
@@ -792,3 +814,120 @@ class FunctionMask(MaskBase):
         ``with_spectral_unit`` from other Masks
         """
         return FunctionMask(self._function)
+
+
+def _slices_lazily(mask):
+    """
+    Whether ``mask`` can be sliced with a `SlicedMask`, i.e. whether its
+    ``_include`` depends only on the view and not on the data or WCS passed.
+    """
+    if isinstance(mask, (BooleanArrayMask, LazyMask, SlicedMask)):
+        return True
+    elif isinstance(mask, InvertedMask):
+        return _slices_lazily(mask._mask)
+    elif isinstance(mask, CompositeMask):
+        return _slices_lazily(mask._mask1) and _slices_lazily(mask._mask2)
+    return False
+
+
+class SlicedMask(MaskBase):
+    """
+    A view of another mask through integers and slices.
+
+    The sliced mask shares the original one and only evaluates it for the
+    elements that are requested, so slicing is cheap.  Slicing a `SlicedMask`
+    gives a `SlicedMask` of the original mask, so chained slices are applied
+    in one step.
+
+    Parameters
+    ----------
+    mask : `MaskBase`
+        The mask to slice.  Its ``_include`` must depend only on the view, as
+        for `BooleanArrayMask` and `LazyMask`.
+    view : tuple
+        One integer or slice per axis of ``mask``
+    wcs : `~spectral_cube.wcs_utils.LazySlicedWCS`, optional
+        The sliced WCS.  By default, the WCS of ``mask`` is sliced when it is
+        first needed.
+    """
+
+    def __init__(self, mask, view, wcs=None):
+        if isinstance(mask, SlicedMask):
+            composed = cube_utils.compose_views(mask._view, view,
+                                                mask._mask.shape)
+            if composed is not None:
+                mask, view = mask._mask, composed
+        self._mask = mask
+        self._view = view
+        self._lazy_wcs = wcs
+        self._wcs_value = None
+        self._wcs_whitelist = set()
+
+    @property
+    def _wcs(self):
+        if self._wcs_value is not None:
+            return self._wcs_value
+        if self._lazy_wcs is None:
+            self._lazy_wcs = wcs_utils.LazySlicedWCS(self._mask._wcs,
+                                                     self._view,
+                                                     shape=self._mask.shape,
+                                                     drop_degenerate=True)
+        return self._lazy_wcs.wcs
+
+    @_wcs.setter
+    def _wcs(self, value):
+        self._wcs_value = value
+
+    @property
+    def shape(self):
+        return tuple(len(range(*item.indices(size)))
+                     for item, size in zip(self._view, self._mask.shape)
+                     if isinstance(item, slice))
+
+    def _validate_wcs(self, new_data=None, new_wcs=None, **kwargs):
+        """
+        Check that the new WCS matches the current one
+
+        Parameters
+        ----------
+        kwargs : dict
+            Passed to `wcs_utils.check_equality`
+        """
+        if new_data is not None and not is_broadcastable_and_smaller(self.shape,
+                                                                     new_data.shape):
+            raise ValueError("data shape cannot be broadcast to match mask shape")
+        if new_wcs is not None and new_wcs not in self._wcs_whitelist:
+            try:
+                if not _wcs_equal_cached(new_wcs, self._wcs, **kwargs):
+                    raise ValueError("WCS does not match mask WCS")
+            except InconsistentAxisTypesError:
+                warnings.warn("Inconsistent axis type encountered; WCS is "
+                              "invalid and therefore will not be checked "
+                              "against other WCSes.",
+                              WCSWarning
+                              )
+                self._wcs_whitelist.add(new_wcs)
+
+    def _include(self, data=None, wcs=None, view=()):
+        composed = cube_utils.compose_views(self._view, view, self._mask.shape)
+        if composed is None:
+            return self._mask._include(view=self._view)[view]
+        return self._mask._include(view=composed)
+
+    def __getitem__(self, view):
+        composed = cube_utils.compose_views(self._view, view, self._mask.shape)
+        if composed is None:
+            return self._mask[self._view][view]
+        return SlicedMask(self._mask, composed)
+
+    def with_spectral_unit(self, unit, velocity_convention=None, rest_value=None):
+        """
+        Get a SlicedMask copy of the original mask with a WCS in the modified
+        unit
+        """
+        newmask = self._mask.with_spectral_unit(unit,
+                                                velocity_convention=velocity_convention,
+                                                rest_value=rest_value)
+        return SlicedMask(newmask, self._view)
+
+    with_spectral_unit.__doc__ += with_spectral_unit_docs
@@ -10,6 +10,7 @@ import operator
 import re
 import itertools
 import copy
+from collections import namedtuple
 import tempfile
 import textwrap
 from pathlib import PosixPath
@@ -27,6 +28,9 @@ from astropy import convolution
 from astropy import stats
 from astropy.constants import si
 from astropy.io.registry import UnifiedReadWriteMethod
+from astropy.coordinates import SkyCoord
+from astropy.table import Table
+from astropy.wcs.utils import skycoord_to_pixel
 
 import numpy as np
 
@@ -36,11 +40,16 @@ from . import cube_utils
 from . import wcs_utils
 from . import spectral_axis
 from .masks import (LazyMask, LazyComparisonMask, BooleanArrayMask, MaskBase,
-                    is_broadcastable_and_smaller)
+                    SlicedMask, is_broadcastable_and_smaller, _slices_lazily)
 from .ytcube import ytCube
+from ._arithmetic import (FilledData, LazyArithmeticArray,
+                          _OPERATORS as _LAZY_OPERATORS)
+from ._convolution import (engine_supported, make_convolver,
+                           group_beam_kernels)
 from .lower_dimensional_structures import (Projection, Slice, OneDSpectrum,
                                            LowerDimensionalObject,
-                                           VaryingResolutionOneDSpectrum
+                                           VaryingResolutionOneDSpectrum,
+                                           SpectrumCollection
                                           )
 from .base_class import (BaseNDClass, SpectralAxisMixinClass,
                          DOPPLER_CONVENTIONS, SpatialCoordMixinClass,
@@ -151,6 +160,61 @@ def _apply_spectral_function(arguments, outcube, function, **kwargs):
         outcube[:,jj,ii] = spec
 
 
+def _check_parallel_options(num_cores, parallel):
+    """
+    Check that ``num_cores`` and ``parallel`` are consistent.
+    """
+    if num_cores == 1 and parallel:
+        warnings.warn("parallel=True was specified but num_cores=1. "
+                      "Joblib will be used to run the task with a "
+                      "single thread.")
+    elif num_cores is not None and num_cores > 1 and not parallel:
+        raise ValueError("parallel execution was not requested, but "
+                         "multiple cores were: these are incompatible "
+                         "options.  Either specify num_cores=1 or "
+                         "parallel=True")
+
+
+def _reproject_kwargs():
+    """
+    Check that a suitable version of reproject is installed and return the
+    extra keyword arguments ``reproject_interp`` needs for cubes.
+    """
+    try:
+        from reproject.version import version
+    except ImportError:
+        raise ImportError("Requires the reproject package to be"
+                          " installed.")
+
+    # Need version > 0.2 to work with cubes, >= 0.5 for memmap
+    from distutils.version import LooseVersion
+    if LooseVersion(version) < "0.5":
+        raise Warning("Requires version >=0.5 of reproject. The current "
+                      "version is: {}".format(version))
+    elif LooseVersion(version) >= "0.6":
+        return {}
+    else:
+        return {'independent_celestial_slices': True}
+
+
+def _reproject_tile(data, wcs_in, wcs_out, shape_out, order, **kwargs):
+    """
+    Helper function to reproject a subcube onto one tile of the output grid.
+    """
+    from reproject import reproject_interp
+
+    return reproject_interp((data, wcs_in), wcs_out, shape_out=shape_out,
+                            order=order, **kwargs)
+
+
+# The data, WCS, mask and shape of a cube that was sliced with
+# ``_new_view_with``, and, for the cube made from it, the view of those and the
+# data, lazy WCS and mask it was given (so that chained slices of it can be
+# applied to the original cube as long as they have not been replaced)
+_ViewBase = namedtuple('_ViewBase', ['data', 'wcs', 'mask', 'shape'])
+_ViewState = namedtuple('_ViewState', ['base', 'view', 'data', 'wcs', 'mask'])
+
+
 def _apply_spatial_function(arguments, outcube, function, **kwargs):
     """
     Helper function to apply a function to an image.
@@ -226,6 +290,22 @@ class BaseSpectralCube(BaseNDClass, MaskableArrayMixinClass,
 
         self._cache = {}
 
+    # For cubes made by ``_new_view_with``: the shared, lazily-sliced WCS and
+    # the `_ViewState` of the slicing
+    _wcs_view = None
+    _view_state = None
+
+    @property
+    def _wcs(self):
+        if self._wcs_view is not None:
+            return self._wcs_view.wcs
+        return self._wcs_value
+
+    @_wcs.setter
+    def _wcs(self, value):
+        self._wcs_view = None
+        self._wcs_value = value
+
     @property
     def _is_huge(self):
         return cube_utils.is_huge(self)
@@ -257,7 +337,7 @@ class BaseSpectralCube(BaseNDClass, MaskableArrayMixinClass,
                     raise u.UnitsError("The specified new cube unit '{0}' "
                                        "does not match the input unit '{1}'."
                                        .format(unit, data.unit))
-            else:
+            elif not isinstance(data, LazyArithmeticArray):
                 data = u.Quantity(data, unit=unit, copy=False)
         elif self._unit is not None:
             unit = self.unit
@@ -281,6 +361,14 @@ class BaseSpectralCube(BaseNDClass, MaskableArrayMixinClass,
         cube._spectral_unit = spectral_unit
         cube._spectral_scale = spectral_axis.wcs_unit_scale(spectral_unit)
 
+        # Keep the WCS object if it is unchanged, so that the new cube can
+        # use the header and other metadata cached for this one
+        if wcs is self._wcs:
+            cube._wcs = wcs
+        if self._metadata_cache is None:
+            self._metadata_cache = {}
+        cube._metadata_cache = self._metadata_cache
+
         return cube
 
     read = UnifiedReadWriteMethod(SpectralCubeRead)
@@ -812,6 +900,60 @@ class BaseSpectralCube(BaseNDClass, MaskableArrayMixinClass,
                                          reduce=False, projection=False,
                                          how=how, axis=axis, **kwargs)
 
+    def _peak_projections(self, peak, index, offset):
+        """
+        Turn the arrays of `cube_utils.peak_search` into the results of
+        `peak_map`.
+        """
+        new_wcs = wcs_utils.drop_axis(self._wcs, 2)
+        meta = self._meta
+
+        spectral_axis = self.spectral_axis
+        channels = np.arange(self.shape[0])
+        position = np.where(index >= 0, index + offset, np.nan)
+        coordinate = np.interp(position, channels, spectral_axis.value,
+                               left=np.nan, right=np.nan)
+
+        peak = Projection(peak, unit=self.unit, copy=False, wcs=new_wcs,
+                          meta=meta, header=self._nowcs_header)
+        coordinate = Projection(coordinate, unit=spectral_axis.unit,
+                                copy=False, wcs=new_wcs, meta=meta,
+                                header=self._nowcs_header)
+
+        return peak, index, coordinate
+
+    def peak_map(self, refine=False):
+        """
+        Find the peak intensity of every spectrum, its channel and its
+        spectral coordinate (e.g., the velocity at the peak).
+
+        All three are found in a single pass through the channels of the
+        cube, keeping only running maximum and argmax planes.
+
+        Parameters
+        ----------
+        refine : bool
+            Fit a parabola through the peak channel and its neighbours to
+            find the peak intensity and spectral coordinate to a fraction of
+            a channel.  Peaks at the edges of the spectra or next to masked
+            channels are not refined.
+
+        Returns
+        -------
+        peak : `~spectral_cube.lower_dimensional_structures.Projection`
+            The peak intensity.  Spectra that are entirely masked are NaN.
+        channel : `~numpy.ndarray`
+            The channel of the peak, or -1 for spectra that are entirely
+            masked.
+        spectral_coordinate : `~spectral_cube.lower_dimensional_structures.Projection`
+            The spectral coordinate of the peak.
+        """
+        planes = (self._get_filled_data(view=(index,), fill=np.nan)
+                  for index in range(self.shape[0]))
+
+        return self._peak_projections(*cube_utils.peak_search(planes,
+                                                              refine=refine))
+
     def chunked(self, chunksize=1000):
         """
         Not Implemented.
@@ -832,13 +974,17 @@ class BaseSpectralCube(BaseNDClass, MaskableArrayMixinClass,
         ny = self.shape[iteraxes[1]]
         return nx, ny
 
-    @warn_slow
     def _apply_everywhere(self, function, *args):
         """
         Return a new cube with ``function`` applied to all pixels
 
         Private because this doesn't have an obvious and easy-to-use API
 
+        For cubes backed by numpy arrays, the arithmetic operators are not
+        computed straight away.  The new cube holds a
+        `~spectral_cube._arithmetic.LazyArithmeticArray` that is evaluated,
+        one view or slab at a time, when its data are requested.
+
         Examples
         --------
         >>> newcube = cube.apply_everywhere(np.add, 0.5*u.Jy)
@@ -852,18 +998,48 @@ class BaseSpectralCube(BaseNDClass, MaskableArrayMixinClass,
             raise AssertionError("Function could not be applied to a simple "
                                  "cube.  The error was: {0}".format(ex))
 
+        if (function in _LAZY_OPERATORS and len(args) == 1 and
+                not isinstance(self._data, da.Array)):
+            value = args[0]
+            if hasattr(value, 'unit'):
+                if function in (operator.add, operator.sub):
+                    value = value.to_value(self.unit)
+                elif function is operator.pow:
+                    value = value.to_value(u.dimensionless_unscaled)
+                else:
+                    value = value.value
+            if np.ndim(value) > 0:
+                value = np.asarray(value)
+
+            data = self._data if self._mask is None else \
+                FilledData(self, self._fill_value)
+            data = LazyArithmeticArray(function, [data, value])
+            if data.shape == self.shape:
+                return self._new_cube_with(data=data, unit=test_result.unit)
+
+        return self._apply_function_everywhere(function, *args)
+
+    @warn_slow
+    def _apply_function_everywhere(self, function, *args):
+        """
+        Apply ``function`` to the whole cube at once; see `_apply_everywhere`.
+        """
         data = function(u.Quantity(self._get_filled_data(fill=self._fill_value),
                                    self.unit, copy=False),
                         *args)
 
         return self._new_cube_with(data=data, unit=data.unit)
 
-    @warn_slow
     def _cube_on_cube_operation(self, function, cube, equivalencies=[], **kwargs):
         """
         Apply an operation between two cubes.  Inherits the metadata of the
         left cube.
 
+        The units and WCS are checked here, once.  For cubes backed by numpy
+        arrays, the arithmetic operators then give a cube holding a
+        `~spectral_cube._arithmetic.LazyArithmeticArray`, as in
+        `_apply_everywhere`.
+
         Parameters
         ----------
         function : function
@@ -894,15 +1070,31 @@ class BaseSpectralCube(BaseNDClass, MaskableArrayMixinClass,
                                  "cube.  The error was: {0}".format(ex,
                                                                     function))
 
-        cube = cube.to(self.unit)
-        data = function(self._data, cube._data)
         try:
             # multiplication, division, etc. are valid inter-unit operations
-            unit = function(self.unit, cube.unit)
+            unit = function(self.unit, self.unit)
         except TypeError:
             # addition, subtraction are not
             unit = self.unit
 
+        if (function in _LAZY_OPERATORS and
+                not isinstance(self._data, da.Array) and
+                not isinstance(cube._data, da.Array)):
+            cube = cube.to(self.unit)
+            data = LazyArithmeticArray(function, [self._data, cube._data])
+            return self._new_cube_with(data=data, unit=unit)
+
+        return self._cube_on_cube_function(function, cube, unit)
+
+    @warn_slow
+    def _cube_on_cube_function(self, function, cube, unit):
+        """
+        Apply ``function`` to the whole of both cubes at once; see
+        `_cube_on_cube_operation`.
+        """
+        cube = cube.to(self.unit)
+        data = function(self._data, cube._data)
+
         return self._new_cube_with(data=data, unit=unit)
 
     def apply_function(self, function, axis=None, weights=None, unit=None,
@@ -1200,10 +1392,7 @@ class BaseSpectralCube(BaseNDClass, MaskableArrayMixinClass,
         slice_data = [(s.start, s.stop, s.step)
                       if hasattr(s,'start') else s
                       for s in view]
-        if 'slice' in meta:
-            meta['slice'].append(slice_data)
-        else:
-            meta['slice'] = [slice_data]
+        meta['slice'] = meta.get('slice', []) + [slice_data]
 
         intslices = [2-ii for ii,s in enumerate(view) if not hasattr(s,'start')]
 
@@ -1222,15 +1411,14 @@ class BaseSpectralCube(BaseNDClass, MaskableArrayMixinClass,
                     bmarg = {'beams': self.beams}
                 else:
                     bmarg = {}
-                return self._oned_spectrum(value=self._data[view],
-                                           wcs=newwcs,
-                                           copy=False,
-                                           unit=self.unit,
-                                           spectral_unit=self._spectral_unit,
-                                           mask=self.mask[view] if self.mask is not None else None,
-                                           meta=meta,
-                                           **bmarg
-                                          )
+                newmask = self.mask[view] if self.mask is not None else None
+                return self._oned_spectrum._from_parts(
+                    self._data[view], self.unit,
+                    wcs=newwcs,
+                    spectral_unit=self._spectral_unit,
+                    mask=newmask,
+                    meta=meta,
+                    **bmarg)
 
             # only one element, so drop an axis
             newwcs = wcs_utils.drop_axis(self._wcs, intslices[0])
@@ -1242,13 +1430,15 @@ class BaseSpectralCube(BaseNDClass, MaskableArrayMixinClass,
                 header['CDELT3'] = self.wcs.sub([wcs.WCSSUB_SPECTRAL]).wcs.cdelt[0]
                 header['CUNIT3'] = self._spectral_unit.to_string(format='FITS')
 
-            return Slice(value=self.filled_data[view],
-                         mask=self.mask[view] if self.mask is not None else None,
-                         wcs=newwcs,
-                         copy=False,
-                         unit=self.unit,
-                         header=header,
-                         meta=meta)
+            return Slice._from_parts(self.filled_data[view], self.unit,
+                                     mask=self.mask[view] if self.mask is not None else None,
+                                     wcs=newwcs,
+                                     header=header,
+                                     meta=meta)
+
+        newcube = self._new_view_with(view, meta)
+        if newcube is not None:
+            return newcube
 
         newmask = self._mask[view] if self._mask is not None else None
 
@@ -1259,6 +1449,56 @@ class BaseSpectralCube(BaseNDClass, MaskableArrayMixinClass,
                                    mask=newmask,
                                    meta=meta)
 
+    def _new_view_with(self, view, meta, **kwargs):
+        """
+        Return the sub-cube given by a tuple of slices with positive steps,
+        or `None` for any other ``view``.
+
+        This is a cheap version of ``_new_cube_with``: the new cube shares the
+        data and mask of this one, and its WCS is only sliced when it is first
+        needed.  A cube made this way remembers the cube it was sliced from,
+        so slicing it again composes the two views and slices that cube once.
+
+        kwargs are passed to `~spectral_cube.wcs_utils.LazySlicedWCS`
+        """
+        state = self._view_state
+        if (state is not None and state.data is self._data and
+                state.wcs is self._wcs_view and state.mask is self._mask):
+            base = state.base
+            view = cube_utils.compose_views(state.view, view, base.shape)
+        else:
+            base = _ViewBase(self._data, self._wcs, self._mask, self.shape)
+            view = cube_utils.compose_views((), view, base.shape)
+
+        if view is None or not all(isinstance(item, slice) and item.step > 0
+                                   for item in view):
+            return None
+
+        newwcs = wcs_utils.LazySlicedWCS(base.wcs, view, shape=base.shape,
+                                         **kwargs)
+        if base.mask is None:
+            newmask = None
+        elif _slices_lazily(base.mask):
+            newmask = SlicedMask(base.mask, view, wcs=newwcs)
+        else:
+            newmask = base.mask[view]
+
+        if self._unit is not None:
+            meta['BUNIT'] = self._unit.to_string(format='FITS')
+
+        newcube = object.__new__(self.__class__)
+        newcube.__dict__.update(self.__dict__)
+        newcube._data = base.data[view]
+        newcube._wcs_view = newwcs
+        newcube._mask = newmask
+        newcube._meta = meta
+        newcube._spectral_axis = None
+        newcube._cache = {}
+        newcube._view_state = _ViewState(base, view, newcube._data, newwcs,
+                                         newmask)
+
+        return newcube
+
     @property
     def unitless(self):
         """Return a copy of self with unit set to None"""
@@ -1354,7 +1594,7 @@ class BaseSpectralCube(BaseNDClass, MaskableArrayMixinClass,
         # Start off by extracting the world coordinates of the pixels
         _, lat, lon = self.world[0, :, :]
         spectral, _, _ = self.world[:, 0, 0]
-        spectral -= spectral[0] # offset from first pixel
+        spectral = spectral - spectral[0] # offset from first pixel
 
         # Convert to radians
         lon = np.radians(lon)
@@ -1649,7 +1889,14 @@ class BaseSpectralCube(BaseNDClass, MaskableArrayMixinClass,
         A `~astropy.units.Quantity` array containing the central values of
         each channel along the spectral axis.
         """
-        return self.world[:, 0, 0][0].ravel()
+        return self._cached_metadata('spectral_axis', self._make_spectral_axis,
+                                     self._wcs, self.shape,
+                                     self._spectral_unit).copy()
+
+    def _make_spectral_axis(self):
+        spec_axis = u.Quantity(self.world[:, 0, 0][0].ravel(), copy=True)
+        spec_axis.flags.writeable = False
+        return spec_axis
 
     @property
     def velocity_convention(self):
@@ -1960,7 +2207,7 @@ class BaseSpectralCube(BaseNDClass, MaskableArrayMixinClass,
         regs = []
         for x in region_list:
             if isinstance(x, regions.SkyRegion):
-                regs.append(x.to_pixel(self.wcs.celestial))
+                regs.append(x.to_pixel(self._celestial_wcs))
             elif isinstance(x, regions.PixelRegion):
                 regs.append(x)
             else:
@@ -2016,6 +2263,172 @@ class BaseSpectralCube(BaseNDClass, MaskableArrayMixinClass,
         # that we can now crop out
         return masked_subcube.minimal_subcube(spatial_only=True)
 
+    def extract_spectra(self, positions, aperture=None):
+        """
+        Extract the spectra at many positions in a single pass over the cube.
+
+        All positions are converted to pixels with one vectorized call, and
+        the data are read once, in storage order, for the union of the pixels
+        needed by all of the positions.
+
+        Parameters
+        ----------
+        positions : `~astropy.coordinates.SkyCoord` or array-like
+            The positions to extract: sky coordinates, an ``(N, 2)`` array of
+            ``(x, y)`` pixel coordinates, or a pair ``(x, y)`` of arrays of
+            pixel coordinates.
+        aperture : None, float, `~astropy.units.Quantity` or tuple
+            If `None`, the spectrum of the pixel containing each position is
+            returned.  A scalar gives the radius of a circular aperture and a
+            tuple ``(a, b, pa)`` the semi-major axis, semi-minor axis and
+            position angle (anticlockwise from the +y pixel axis) of an
+            elliptical aperture.  Sizes are in pixels unless given as angular
+            quantities (quantities in ``u.pix`` are also accepted).  Aperture
+            spectra are the average of the unmasked pixels in the aperture.
+
+        Returns
+        -------
+        spectra : `~spectral_cube.lower_dimensional_structures.SpectrumCollection`
+            The spectra, in the order of ``positions``, with the pixel and
+            world coordinates of each position (and the number of pixels in
+            each aperture) stored in the ``positions`` table.
+        """
+
+        self._raise_wcs_no_celestial()
+
+        celwcs = self._celestial_wcs
+
+        if isinstance(positions, SkyCoord):
+            xpos, ypos = skycoord_to_pixel(positions, celwcs, origin=0)
+            xpos, ypos = np.atleast_1d(xpos), np.atleast_1d(ypos)
+        else:
+            if isinstance(positions, (tuple, list)) and len(positions) == 2:
+                xpos, ypos = positions
+            else:
+                positions = np.asarray(positions)
+                if positions.ndim != 2 or positions.shape[1] != 2:
+                    raise ValueError("Pixel positions must be given as an "
+                                     "(N, 2) array or an (x, y) pair of "
+                                     "arrays.")
+                xpos, ypos = positions.T
+            xpos = np.atleast_1d(np.asarray(xpos, dtype='float'))
+            ypos = np.atleast_1d(np.asarray(ypos, dtype='float'))
+
+        if aperture is None:
+            semimajor = semiminor = None
+        else:
+            if np.isscalar(aperture) or isinstance(aperture, u.Quantity):
+                semimajor = semiminor = aperture
+                pa = 0 * u.deg
+            else:
+                semimajor, semiminor, pa = aperture
+
+            pixscale = wcs.utils.proj_plane_pixel_area(celwcs)**0.5 * u.deg
+
+            def _to_pix(size):
+                if isinstance(size, u.Quantity):
+                    if size.unit.is_equivalent(u.pix):
+                        return size.to_value(u.pix)
+                    if size.unit.physical_type == 'angle':
+                        return (size / pixscale).to(u.one).value
+                return u.Quantity(size, u.one).value
+
+            semimajor, semiminor = _to_pix(semimajor), _to_pix(semiminor)
+            if semiminor > semimajor:
+                raise ValueError("The semi-minor axis of the aperture cannot "
+                                 "be larger than the semi-major axis.")
+            pa = u.Quantity(pa, u.deg).to(u.rad).value
+
+        # Pixel offsets covered by the aperture around the nearest pixel
+        xcen = np.round(xpos).astype('int')
+        ycen = np.round(ypos).astype('int')
+        if semimajor is None:
+            xx, yy = xcen[:, None], ycen[:, None]
+            inside = np.ones(xx.shape, dtype='bool')
+        else:
+            half = int(np.ceil(semimajor))
+            offy, offx = np.mgrid[-half:half+1, -half:half+1]
+            xx = xcen[:, None] + offx.ravel()[None, :]
+            yy = ycen[:, None] + offy.ravel()[None, :]
+            dx = xx - xpos[:, None]
+            dy = yy - ypos[:, None]
+            along = -dx * np.sin(pa) + dy * np.cos(pa)
+            across = dx * np.cos(pa) + dy * np.sin(pa)
+            inside = (along / semimajor)**2 + (across / max(semiminor, 1e-10))**2 <= 1
+            # always include the central pixel, even for tiny apertures
+            inside[:, offx.size // 2] = True
+
+        ny, nx = self.shape[1:]
+        inside &= (xx >= 0) & (xx < nx) & (yy >= 0) & (yy < ny)
+
+        # Entries are grouped by source because ``inside`` is row-major
+        source = np.broadcast_to(np.arange(xpos.size)[:, None], inside.shape)[inside]
+        flatpix = (yy * nx + xx)[inside]
+
+        nchan = self.shape[0]
+        spectra = np.full((xpos.size, nchan), np.nan)
+        npix = np.bincount(source, minlength=xpos.size)
+
+        if flatpix.size > 0:
+            uniqpix, inverse = np.unique(flatpix, return_inverse=True)
+            pixspec = self._extract_pixel_spectra(uniqpix // nx, uniqpix % nx)
+            values = pixspec[:, inverse]
+            valid = np.isfinite(values)
+            values[~valid] = 0
+            valid = valid.astype('int')
+
+            has_pixels = npix > 0
+            starts = np.concatenate([[0], np.cumsum(npix)[:-1]])[has_pixels]
+            with np.errstate(invalid='ignore', divide='ignore'):
+                spectra[has_pixels] = (np.add.reduceat(values, starts, axis=1) /
+                                       np.add.reduceat(valid, starts, axis=1)).T
+
+        lon, lat = celwcs.wcs_pix2world(xpos, ypos, 0)
+        lonname, latname = [ctype.split('-')[0].lower()
+                            for ctype in celwcs.wcs.ctype]
+        columns = {'x': xpos, 'y': ypos,
+                   lonname: lon * u.Unit(celwcs.wcs.cunit[0]),
+                   latname: lat * u.Unit(celwcs.wcs.cunit[1])}
+        names = ['x', 'y', lonname, latname]
+        if semimajor is not None:
+            columns['npix'] = npix
+            names.append('npix')
+
+        meta = {}
+        meta.update(self._meta)
+        if hasattr(self, '_beam') and self._beam is not None:
+            bmarg = {'beam': self._beam}
+        else:
+            bmarg = {}
+
+        return SpectrumCollection(value=spectra, unit=self.unit, copy=False,
+                                  wcs=self._wcs.sub([wcs.WCSSUB_SPECTRAL]),
+                                  meta=meta, header=self._nowcs_header,
+                                  spectral_unit=self._spectral_unit,
+                                  positions=Table(columns, names=names),
+                                  **bmarg)
+
+    def _extract_pixel_spectra(self, ypix, xpix):
+        """
+        Return the filled spectra at the given spatial pixels as an
+        ``(nchan, npix)`` array, reading the data plane-sequentially over the
+        bounding box of the pixels.
+        """
+        ylo, yhi = ypix.min(), ypix.max() + 1
+        xlo, xhi = xpix.min(), xpix.max() + 1
+        boxsize = (yhi - ylo) * (xhi - xlo)
+
+        nchan = self.shape[0]
+        out = np.empty((nchan, ypix.size))
+        step = max(1, int(cube_utils.MEMORY_THRESHOLD // 10 // boxsize))
+
+        for start in range(0, nchan, step):
+            view = (slice(start, start + step), slice(ylo, yhi), slice(xlo, xhi))
+            planes = self._get_filled_data(view=view, fill=np.nan)
+            out[start:start + step] = planes[:, ypix - ylo, xpix - xlo]
+
+        return out
+
     def _velocity_freq_conversion_regions(self, ranges, veltypes, restfreqs):
         """
         Makes the spectral range of the regions compatible with the spectral
@@ -2356,11 +2769,10 @@ class BaseSpectralCube(BaseNDClass, MaskableArrayMixinClass,
         return dd
 
 
-    @property
-    def header(self):
+    def _make_header(self):
         log.debug("Creating header")
 
-        header = super(BaseSpectralCube, self).header
+        header = super(BaseSpectralCube, self)._make_header()
 
         # Preserve the cube's spectral units
         # (if CUNIT3 is not in the header, it is whatever that type's default unit is)
@@ -2469,9 +2881,87 @@ class BaseSpectralCube(BaseNDClass, MaskableArrayMixinClass,
 
         return result
 
-    @warn_slow
+    def _reproject_tilesize(self, wcs_out, shape_out, nthreads=1):
+        """
+        The size of the square output tiles used to reproject this cube onto
+        ``wcs_out``, chosen so that each of ``nthreads`` threads holds a small
+        input subcube.
+        """
+        pixel_ratio = (wcs.utils.proj_plane_pixel_area(wcs_out.celestial) /
+                       wcs.utils.proj_plane_pixel_area(self._celestial_wcs))
+        return int(max(1, np.sqrt(cube_utils.MEMORY_THRESHOLD // 10 /
+                                  (nthreads * max(self.shape[0], shape_out[0]) *
+                                   max(pixel_ratio, 1)))))
+
+    def _reproject_tiles(self, wcs_out, shape_out, order='bilinear',
+                         nthreads=1, tilesize=None):
+        """
+        Split the spatial grid of a reprojection into tiles and find the
+        smallest spatial region of this cube that each tile needs.
+
+        Parameters
+        ----------
+        wcs_out : `~astropy.wcs.WCS`
+            The WCS of the output cube
+        shape_out : tuple
+            The shape of the output cube
+        order : int or str
+            The interpolation order, which sets how many pixels beyond the
+            footprint of a tile are needed
+        nthreads : int
+            The number of tiles that are reprojected at the same time
+        tilesize : int or None
+            The size of the tiles.  The default is `_reproject_tilesize`.
+
+        Returns
+        -------
+        tiles : list of list of tuple
+            For each row of tiles, a list of ``(outview, inview)`` pairs of
+            the spatial slices of each output tile and of the input region
+            covering it.  ``inview`` is `None` for tiles that do not overlap
+            the cube.
+        """
+        from astropy.wcs.utils import pixel_to_pixel
+
+        # Spline interpolation depends (weakly) on a wider neighbourhood
+        if order in ('nearest-neighbor', 'bilinear', 0, 1):
+            margin = 1
+        else:
+            margin = 10
+
+        if tilesize is None:
+            tilesize = self._reproject_tilesize(wcs_out, shape_out,
+                                                nthreads=nthreads)
+
+        nspec, ny, nx = self.shape
+        ny_out, nx_out = shape_out[1:]
+        wcs_in = self._celestial_wcs
+        wcs_out = wcs_out.celestial
+
+        tiles = []
+        for ystart in range(0, ny_out, tilesize):
+            row = []
+            for xstart in range(0, nx_out, tilesize):
+                outview = (slice(ystart, min(ystart + tilesize, ny_out)),
+                           slice(xstart, min(xstart + tilesize, nx_out)))
+                yy, xx = np.mgrid[outview]
+                xin, yin = pixel_to_pixel(wcs_out, wcs_in, xx, yy)
+                good = np.isfinite(xin) & np.isfinite(yin)
+                inview = None
+                if good.any():
+                    xlo = max(int(np.floor(xin[good].min())) - margin, 0)
+                    xhi = min(int(np.ceil(xin[good].max())) + margin + 1, nx)
+                    ylo = max(int(np.floor(yin[good].min())) - margin, 0)
+                    yhi = min(int(np.ceil(yin[good].max())) + margin + 1, ny)
+                    if xlo < xhi and ylo < yhi:
+                        inview = (slice(ylo, yhi), slice(xlo, xhi))
+                row.append((outview, inview))
+            tiles.append(row)
+
+        return tiles
+
     def reproject(self, header, order='bilinear', use_memmap=False,
-                  filled=True):
+                  filled=True, num_cores=None, memmap_dir=None):
         """
         Spatially reproject the cube into a new header.  Fills the data with
         the cube's ``fill_value`` to replace bad values before reprojection.
@@ -2479,10 +2969,10 @@ class BaseSpectralCube(BaseNDClass, MaskableArrayMixinClass,
         If you want to reproject a cube both spatially and spectrally, you need
         to use `spectral_interpolate` as well.
 
-        .. warning::
-            The current implementation of ``reproject`` requires that the whole
-            cube be loaded into memory.  Issue #506 notes that this is a
-            problem, and it is on our to-do list to fix.
+        The output is built in spatial tiles.  For each tile, only the region
+        of the cube that overlaps it (plus a small margin for the
+        interpolation) is read, so the whole cube is never loaded into memory
+        at once.
 
         Parameters
         ----------
@@ -2502,68 +2992,74 @@ class BaseSpectralCube(BaseNDClass, MaskableArrayMixinClass,
             interpolation.
         use_memmap : bool
             If specified, a memory mapped temporary file on disk will be
-            written to rather than storing the intermediate spectra in memory.
+            written to rather than storing the output cube in memory.
         filled : bool
             Fill the masked values with the cube's fill value before
             reprojection?  Note that setting ``filled=False`` will use the raw
             data array, which can be a workaround that prevents loading large
             data into memory.
+        num_cores : int or None
+            The number of threads used to reproject tiles at the same time.
+        memmap_dir : str or None
+            The directory in which to write the memory mapped output.
         """
 
-        try:
-            from reproject.version import version
-        except ImportError:
-            raise ImportError("Requires the reproject package to be"
-                              " installed.")
-
-        # Need version > 0.2 to work with cubes, >= 0.5 for memmap
-        from distutils.version import LooseVersion
-        if LooseVersion(version) < "0.5":
-            raise Warning("Requires version >=0.5 of reproject. The current "
-                          "version is: {}".format(version))
-        elif LooseVersion(version) >= "0.6":
-            reproj_kwargs = {}
-        else:
-            reproj_kwargs = {'independent_celestial_slices': True}
-
-        from reproject import reproject_interp
-
-        # TODO: Find the minimal subcube that contains the header and only reproject that
-        # (see FITS_tools.regrid_cube for a guide on how to do this)
+        reproj_kwargs = _reproject_kwargs()
 
         newwcs = wcs.WCS(header)
         shape_out = tuple([header['NAXIS{0}'.format(i + 1)] for i in
                            range(header['NAXIS'])][::-1])
 
-        if filled:
-            data = self.unitless_filled_data[:]
-        else:
-            data = self._data
+        dtype = 'float32' if self._data.dtype.itemsize == 4 else 'float64'
 
         if use_memmap:
-            if data.dtype.itemsize not in (4,8):
-                raise ValueError("Data must be float32 or float64 to be "
-                                 "reprojected.  Other data types need some "
-                                 "kind of additional memory handling.")
-            # note: requires reproject from December 2018 or later
-            outarray = np.memmap(filename='output.np', mode='w+',
-                                 shape=tuple(shape_out),
-                                 dtype='float64' if data.dtype.itemsize == 8 else 'float32')
-        else:
-            outarray = None
-
-        newcube, newcube_valid = reproject_interp((data,
-                                                   self.header),
-                                                  newwcs,
-                                                  output_array=outarray,
-                                                  shape_out=shape_out,
-                                                  order=order,
-                                                  **reproj_kwargs)
-
-        return self._new_cube_with(data=newcube,
+            ntf = tempfile.NamedTemporaryFile(dir=memmap_dir)
+            outarray = np.memmap(ntf, mode='w+', shape=shape_out, dtype=dtype)
+            ntf2 = tempfile.NamedTemporaryFile(dir=memmap_dir)
+            footprint = np.memmap(ntf2, mode='w+', shape=shape_out,
+                                  dtype='bool')
+        else:
+            outarray = np.empty(shape_out, dtype=dtype)
+            footprint = np.empty(shape_out, dtype='bool')
+
+        nthreads = num_cores if num_cores is not None and num_cores > 1 else 1
+        tiles = self._reproject_tiles(newwcs, shape_out, order=order,
+                                      nthreads=nthreads)
+
+        def reproject_tile(tile):
+            outview, inview = tile
+            outview = (slice(None),) + outview
+            if inview is None:
+                outarray[outview] = np.nan
+                footprint[outview] = False
+                return
+            inview = (slice(None),) + inview
+
+            if filled:
+                data = self._get_filled_data(view=inview, fill=self._fill_value)
+            else:
+                data = self._data[inview]
+
+            tile_shape = outarray[outview].shape
+            tile_wcs = wcs_utils.slice_wcs(self.wcs, inview, shape=self.shape)
+            result, valid = _reproject_tile(data, tile_wcs,
+                                            newwcs[outview], tile_shape,
+                                            order, **reproj_kwargs)
+            outarray[outview] = result
+            footprint[outview] = valid > 0
+
+        tiles = [tile for row in tiles for tile in row]
+        if nthreads > 1:
+            from concurrent.futures import ThreadPoolExecutor
+            with ThreadPoolExecutor(max_workers=nthreads) as executor:
+                list(executor.map(reproject_tile, tiles))
+        else:
+            for tile in tiles:
+                reproject_tile(tile)
+
+        return self._new_cube_with(data=outarray,
                                    wcs=newwcs,
-                                   mask=BooleanArrayMask(newcube_valid.astype('bool'),
-                                                         newwcs),
+                                   mask=BooleanArrayMask(footprint, newwcs),
                                    meta=self.meta,
                                   )
 
@@ -2611,8 +3107,19 @@ class BaseSpectralCube(BaseNDClass, MaskableArrayMixinClass,
             `astropy.convolution.convolve_fft`
         kwargs : dict
             Passed to the convolve function
+
+        Notes
+        -----
+        Kernels that are separable (e.g., Gaussians aligned with the pixel
+        grid) are applied as two 1D convolutions over batches of planes.
+        With ``convolve=astropy.convolution.convolve_fft``, other kernels are
+        transformed once and the planes are convolved in batches using
+        `scipy.fft` (see `_apply_convolution_engine`).
         """
 
+        if engine_supported(convolve, kernel, kwargs):
+            return self._apply_convolution_engine(kernel, convolve, **kwargs)
+
         def _gsmooth_image(img, **kwargs):
             """
             Helper function to smooth an image
@@ -2639,13 +3146,36 @@ class BaseSpectralCube(BaseNDClass, MaskableArrayMixinClass,
             Size of the median filter (scipy.ndimage.filters.median_filter)
         verbose : int
             Verbosity level to pass to joblib
+        num_cores : int or None
+            The number of threads used to filter slabs of the cube
         kwargs : dict
-            Not used at the moment.
+            Passed to `scipy.ndimage.median_filter`
+
+        Notes
+        -----
+        The filter is applied with ``size=(ksize, 1, 1)`` to whole slabs of
+        the cube at once (see `_apply_spectral_slab_filter`).
         """
 
         if not scipyOK:
             raise ImportError("Scipy could not be imported: this function won't work.")
 
+        if not any(key in kwargs for key in ('size', 'footprint')):
+            apply_kwargs = {key: kwargs.pop(key)
+                            for key in ('parallel', 'memmap_dir',
+                                        'update_function')
+                            if key in kwargs}
+
+            def median_filter_slab(data, include):
+                return ndimage.median_filter(data, size=(ksize, 1, 1),
+                                             **kwargs)
+
+            return self._apply_spectral_slab_filter(median_filter_slab,
+                                                    num_cores=num_cores,
+                                                    use_memmap=use_memmap,
+                                                    verbose=verbose,
+                                                    **apply_kwargs)
+
         return self.apply_function_parallel_spectral(ndimage.filters.median_filter,
                                                      size=ksize,
                                                      verbose=verbose,
@@ -2718,15 +3248,7 @@ class BaseSpectralCube(BaseNDClass, MaskableArrayMixinClass,
                                  "override this restriction.")
             outcube = np.empty(shape=self.shape, dtype=np.float)
 
-        if num_cores == 1 and parallel:
-            warnings.warn("parallel=True was specified but num_cores=1. "
-                          "Joblib will be used to run the task with a "
-                          "single thread.")
-        elif num_cores is not None and num_cores > 1 and not parallel:
-            raise ValueError("parallel execution was not requested, but "
-                             "multiple cores were: these are incompatible "
-                             "options.  Either specify num_cores=1 or "
-                             "parallel=True")
+        _check_parallel_options(num_cores, parallel)
 
         if parallel and use_memmap:
 
@@ -2796,6 +3318,83 @@ class BaseSpectralCube(BaseNDClass, MaskableArrayMixinClass,
 
         return newcube
 
+    def _apply_convolution_engine(self, kernel, convolve, num_cores=None,
+                                  verbose=0, use_memmap=True, parallel=True,
+                                  memmap_dir=None, update_function=None,
+                                  **kwargs):
+        """
+        Convolve each spatial plane with ``kernel`` using the engine from
+        `~spectral_cube._convolution.make_convolver`, which works on batches
+        of planes.  The result matches that of
+        ``apply_function_parallel_spatial`` with ``convolve``.
+
+        Parameters
+        ----------
+        kernel : `~astropy.convolution.Kernel2D` or `~numpy.ndarray`
+            The 2D convolution kernel
+        convolve : function
+            `~astropy.convolution.convolve` or
+            `~astropy.convolution.convolve_fft`
+        num_cores : int or None
+            The number of threads used for the FFTs
+        verbose : int
+            Show a progressbar if > 0
+        use_memmap : bool
+            If specified, a memory mapped temporary file on disk will be
+            written to rather than storing the output cube in memory.
+        parallel : bool
+            If set to ``False``, the FFTs use a single thread.
+        update_function : function
+            A callback function called once per convolved plane.
+        kwargs : dict
+            Passed to `~spectral_cube._convolution.make_convolver`; these have
+            the same meaning as for ``convolve``.
+        """
+        if use_memmap:
+            ntf = tempfile.NamedTemporaryFile(dir=memmap_dir)
+            outcube = np.memmap(ntf, mode='w+', shape=self.shape, dtype=np.float64)
+        else:
+            if self._is_huge and not self.allow_huge_operations:
+                raise ValueError("Applying a function without ``use_memmap`` "
+                                 "requires loading the whole array into "
+                                 "memory *twice*, which can overload the "
+                                 "machine's memory for large cubes.  Either "
+                                 "set ``use_memmap=True`` or set "
+                                 "``cube.allow_huge_operations=True`` to "
+                                 "override this restriction.")
+            outcube = np.empty(shape=self.shape, dtype=np.float64)
+
+        convolver = make_convolver(convolve, kernel, self.shape[1:],
+                                   workers=num_cores if parallel else None,
+                                   **kwargs)
+
+        if update_function is not None:
+            pbu = update_function
+        elif verbose > 0:
+            progressbar = ProgressBar(self.shape[0])
+            pbu = progressbar.update
+        else:
+            pbu = object
+
+        nplanes = convolver.batch_size(self.shape[0])
+        for start in range(0, self.shape[0], nplanes):
+            view = (slice(start, start + nplanes),)
+            img = self._get_filled_data(view=view, fill=self._fill_value)
+            anyincluded = np.any(self.mask.include(view=view), axis=(1, 2))
+
+            outcube[view] = img
+            if np.any(anyincluded):
+                outcube[view][anyincluded] = convolver.convolve(img[anyincluded])
+
+            for ii in range(img.shape[0]):
+                pbu()
+
+        newcube = self._new_cube_with(data=outcube, wcs=self.wcs,
+                                      mask=self.mask, meta=self.meta,
+                                      fill_value=self.fill_value)
+
+        return newcube
+
     def apply_function_parallel_spatial(self,
                                         function,
                                         num_cores=None,
@@ -2922,16 +3521,241 @@ class BaseSpectralCube(BaseNDClass, MaskableArrayMixinClass,
             to the number of sigma above which to cut.
         verbose : int
             Verbosity level to pass to joblib
+        num_cores : int or None
+            The number of threads used to clip slabs of the cube
+        kwargs : dict
+            Passed to the sigma clipper (e.g., ``sigma_lower``,
+            ``sigma_upper``, ``maxiters``, ``cenfunc`` or ``stdfunc``)
 
-        """
-
-        return self.apply_function_parallel_spectral(stats.sigma_clip,
+        Notes
+        -----
+        The spectra of whole slabs of the cube are clipped at once (see
+        `_apply_spectral_slab_filter` and `cube_utils.sigma_clip_spectra`),
+        iterating only over the spectra that have not converged.  Keyword
+        arguments of `astropy.stats.sigma_clip` that this does not support
+        make the slabs be clipped with `astropy.stats.sigma_clip` instead.
+        """
+
+        apply_kwargs = {key: kwargs.pop(key)
+                        for key in ('parallel', 'memmap_dir',
+                                    'update_function')
+                        if key in kwargs}
+
+        if all(key in cube_utils._SIGMA_CLIP_KWARGS for key in kwargs):
+            def sigma_clip_slab(data, include):
+                return cube_utils.sigma_clip_spectra(np.where(include, data,
+                                                              np.nan),
                                                      sigma=threshold,
-                                                     axis=0, # changes behavior of sigmaclip
-                                                     num_cores=num_cores,
-                                                     use_memmap=use_memmap,
-                                                     verbose=verbose,
                                                      **kwargs)
+        else:
+            def sigma_clip_slab(data, include):
+                result = stats.sigma_clip(np.where(include, data, np.nan),
+                                          sigma=threshold, axis=0, **kwargs)
+                return result.filled(np.nan)
+
+        return self._apply_spectral_slab_filter(sigma_clip_slab,
+                                                num_cores=num_cores,
+                                                use_memmap=use_memmap,
+                                                verbose=verbose,
+                                                **apply_kwargs)
+
+    def _baseline_channels(self, exclude=None):
+        """
+        The channels to fit baselines to: those outside of all of the
+        ``exclude`` windows of `subtract_baseline`.
+        """
+        fit_channels = np.ones(self.shape[0], dtype='bool')
+        if exclude is None:
+            return fit_channels
+
+        # the spectral axis in the units of each window
+        spectral_axes = {self._spectral_unit: self.spectral_axis}
+        for window in exclude:
+            if len(window) != 2:
+                raise ValueError("Each excluded window must be a (lower, "
+                                 "upper) pair of spectral values.")
+            window = u.Quantity(window)
+            spectral_axis = spectral_axes[self._spectral_unit]
+            if window.unit.is_equivalent(spectral_axis.unit, u.spectral()):
+                window = window.to(spectral_axis.unit, u.spectral())
+            else:
+                # e.g. velocity windows on a frequency cube: convert the
+                # spectral axis with the cube's convention and rest value
+                if window.unit not in spectral_axes:
+                    converted = self.with_spectral_unit(
+                        window.unit,
+                        velocity_convention=self.velocity_convention)
+                    spectral_axes[window.unit] = converted.spectral_axis
+                spectral_axis = spectral_axes[window.unit]
+            lower, upper = sorted(window)
+            fit_channels &= (spectral_axis < lower) | (spectral_axis > upper)
+
+        return fit_channels
+
+    @parallel_docstring
+    def subtract_baseline(self, order, exclude=None,
+                          return_coefficients=False, verbose=0,
+                          use_memmap=True, num_cores=None, **kwargs):
+        """
+        Fit and subtract a polynomial baseline from every spectrum.
+
+        The baselines are fit to the channels outside of the ``exclude``
+        windows, ignoring masked values.  Because all spectra share the same
+        channels, the least-squares design matrix is built once, spectra with
+        the same valid channels are fit together, and whole slabs of the cube
+        are processed at once (see `cube_utils.polynomial_baselines`).
+
+        Parameters
+        ----------
+        order : int
+            The order of the polynomial baseline
+        exclude : list of tuple, optional
+            ``(lower, upper)`` pairs of spectral values (e.g., velocities)
+            bounding the windows that are excluded from the fit, such as
+            those containing lines.  Velocity windows on a frequency cube (and
+            vice versa) are converted with the cube's velocity convention and
+            rest value.
+        return_coefficients : bool
+            Also return the fit coefficients
+        verbose : int
+            Show a progressbar if > 0
+
+        Returns
+        -------
+        cube : SpectralCube
+            The baseline-subtracted cube.  Spectra with no more valid channels
+            to fit than ``order`` are NaN.
+        coefficients : `~astropy.units.Quantity`
+            If ``return_coefficients`` is set, the ``(order + 1, ny, nx)``
+            polynomial coefficients, in increasing order of power.  The
+            polynomials are in terms of the channel index scaled onto
+            [-1, 1], i.e. ``np.linspace(-1, 1, cube.shape[0])``.
+        """
+        fit_channels = self._baseline_channels(exclude)
+
+        coefficients = np.full((order + 1,) + self.shape[1:], np.nan)
+
+        def subtract_slab(data, include, view):
+            data = np.where(include, data, np.nan)
+            baselines, coefficients[(slice(None),) + view[1:]] = \
+                cube_utils.polynomial_baselines(data, order, fit_channels)
+            return data - baselines
+
+        newcube = self._apply_spectral_slab_filter(subtract_slab,
+                                                   num_cores=num_cores,
+                                                   use_memmap=use_memmap,
+                                                   verbose=verbose,
+                                                   pass_view=True, **kwargs)
+
+        if return_coefficients:
+            return newcube, u.Quantity(coefficients, self.unit, copy=False)
+        return newcube
+
+    def _gaussian_fit_projections(self, parameters, uncertainties):
+        """
+        Turn the arrays of `cube_utils.fit_gaussians` into dictionaries of
+        Projections named after the parameters of each component.
+        """
+        new_wcs = wcs_utils.drop_axis(self._wcs, 2)
+        spectral_unit = self.spectral_axis.unit
+        meta = {'fit_function': 'gaussian'}
+        meta.update(self._meta)
+
+        fits = ({}, {})
+        for index in range(parameters.shape[0]):
+            component, param = divmod(index, 3)
+            name = '{0}_{1}'.format(('amplitude', 'mean', 'stddev')[param],
+                                    component)
+            unit = self.unit if param == 0 else spectral_unit
+            for fit, values in zip(fits, (parameters, uncertainties)):
+                fit[name] = Projection(values[index], unit=unit, copy=False,
+                                       wcs=new_wcs, meta=meta,
+                                       header=self._nowcs_header)
+
+        return fits
+
+    def fit_gaussians(self, ncomponents=1, guesses=None, maxiter=100,
+                      tolerance=1e-8, num_cores=None, verbose=0):
+        """
+        Fit a sum of Gaussian components to every spectrum in the cube.
+
+        Whole slabs of spectra are fit at once with a batched
+        Levenberg-Marquardt solver (see `cube_utils.fit_gaussians`), seeded
+        from the peak and moments of each spectrum.  Masked values are
+        ignored.
+
+        Parameters
+        ----------
+        ncomponents : int
+            The number of Gaussian components to fit
+        guesses : array, optional
+            The initial amplitude, mean and standard deviation of each
+            component, in the units of the cube and its spectral axis, with
+            shape ``(3 * ncomponents,)`` or ``(3 * ncomponents, ny, nx)``.
+            By default these are found from the moments of each spectrum.
+        maxiter : int
+            The maximum number of iterations
+        tolerance : float
+            The fit has converged when a step reduces the sum of squared
+            residuals by less than this fraction.
+        num_cores : int or None
+            The number of threads used to fit slabs of the cube.
+        verbose : int
+            Show a progressbar if > 0
+
+        Returns
+        -------
+        parameters : dict
+            The fit parameters as `~spectral_cube.lower_dimensional_structures.Projection`
+            objects, with keys ``amplitude_0``, ``mean_0``, ``stddev_0``,
+            ``amplitude_1``, etc.  The components are ordered by their mean.
+            Spectra with no more valid values than parameters are NaN.
+        uncertainties : dict
+            The standard errors of the parameters, with the same keys.
+        """
+        nparams = 3 * ncomponents
+        spectral_axis = self.spectral_axis.value
+        if guesses is not None:
+            guesses = np.asarray(guesses, dtype='float')
+
+        parameters = np.full((nparams,) + self.shape[1:], np.nan)
+        uncertainties = np.full((nparams,) + self.shape[1:], np.nan)
+
+        nspec, ny, nx = self.shape
+        # The Jacobians hold nparams copies of each slab
+        nthreads = num_cores if num_cores is not None and num_cores > 1 else 1
+        nrows = int(max(1, min(-(-ny // nthreads),
+                               cube_utils.MEMORY_THRESHOLD // 10 //
+                               (8 * nthreads * nparams * nspec * nx))))
+        views = [(slice(None), slice(start, start + nrows))
+                 for start in range(0, ny, nrows)]
+
+        if verbose > 0:
+            progressbar = ProgressBar(len(views))
+            pbu = progressbar.update
+        else:
+            pbu = object
+
+        def fit_slab(view):
+            data = self._get_filled_data(view=view, fill=np.nan)
+            slab_guesses = guesses
+            if guesses is not None and guesses.ndim > 1:
+                slab_guesses = guesses[view]
+            parameters[view], uncertainties[view] = \
+                cube_utils.fit_gaussians(spectral_axis, data, ncomponents,
+                                         guesses=slab_guesses,
+                                         maxiter=maxiter, tolerance=tolerance)
+            pbu()
+
+        if nthreads > 1:
+            from concurrent.futures import ThreadPoolExecutor
+            with ThreadPoolExecutor(max_workers=nthreads) as executor:
+                list(executor.map(fit_slab, views))
+        else:
+            for view in views:
+                fit_slab(view)
+
+        return self._gaussian_fit_projections(parameters, uncertainties)
 
     @parallel_docstring
     def spectral_smooth(self, kernel,
@@ -2957,12 +3781,36 @@ class BaseSpectralCube(BaseNDClass, MaskableArrayMixinClass,
             Verbosity level to pass to joblib
         kwargs : dict
             Passed to the convolve function
+
+        Notes
+        -----
+        When `scipy` is available and the kernel has an odd size, the
+        spectra are convolved along the spectral axis of whole slabs of the
+        cube at once, using ``num_cores`` threads (see
+        `_apply_spectral_slab_filter`).  Masked pixels are then given zero
+        weight and the convolution is renormalized by the convolved weights.
         """
 
         if isinstance(kernel.array, u.Quantity):
             raise u.UnitsError("The convolution kernel should be defined "
                                "without a unit.")
 
+        if engine_supported(convolve, kernel, kwargs):
+            apply_kwargs = {key: kwargs.pop(key)
+                            for key in ('parallel', 'memmap_dir',
+                                        'update_function')
+                            if key in kwargs}
+            convolver = make_convolver(convolve, kernel, axes=(0,), **kwargs)
+
+            def convolve_slab(data, include):
+                return convolver.convolve(data, valid=include)
+
+            return self._apply_spectral_slab_filter(convolve_slab,
+                                                    num_cores=num_cores,
+                                                    use_memmap=use_memmap,
+                                                    verbose=verbose,
+                                                    **apply_kwargs)
+
         return self.apply_function_parallel_spectral(convolve,
                                                      kernel=kernel,
                                                      normalize_kernel=True,
@@ -2971,12 +3819,116 @@ class BaseSpectralCube(BaseNDClass, MaskableArrayMixinClass,
                                                      verbose=verbose,
                                                      **kwargs)
 
+    def _apply_spectral_slab_filter(self, function, num_cores=None,
+                                    use_memmap=True, memmap_dir=None,
+                                    parallel=True, verbose=0,
+                                    update_function=None, pass_view=False):
+        """
+        Apply a filter along the spectral axis of whole slabs of the cube,
+        rather than one spectrum at a time.  Spectra that are entirely masked
+        are copied unchanged, as in ``apply_function_parallel_spectral``.
+
+        Parameters
+        ----------
+        function : function
+            Called as ``function(data, include)`` with a ``(nspec, ny_block,
+            nx)`` slab of the data, with masked values replaced by the cube's
+            fill value, and the corresponding include mask.  It must return
+            an array of the same shape.
+        num_cores : int or None
+            The number of threads used to process slabs.  The filters are
+            expected to release the GIL, as those in `scipy.ndimage` do.
+        use_memmap : bool
+            If specified, a memory mapped temporary file on disk will be
+            written to rather than storing the output cube in memory.
+        parallel : bool
+            If set to ``False``, a single thread is used.
+        verbose : int
+            Show a progressbar if > 0
+        update_function : function
+            A callback function called once per spectrum.
+        pass_view : bool
+            If set, ``function`` is called as ``function(data, include,
+            view)``, where ``view`` is the slice of the cube the slab covers,
+            so that it can store additional per-spectrum results.
+        """
+        if use_memmap:
+            ntf = tempfile.NamedTemporaryFile(dir=memmap_dir)
+            outcube = np.memmap(ntf, mode='w+', shape=self.shape, dtype=np.float64)
+        else:
+            if self._is_huge and not self.allow_huge_operations:
+                raise ValueError("Applying a function without ``use_memmap`` "
+                                 "requires loading the whole array into "
+                                 "memory *twice*, which can overload the "
+                                 "machine's memory for large cubes.  Either "
+                                 "set ``use_memmap=True`` or set "
+                                 "``cube.allow_huge_operations=True`` to "
+                                 "override this restriction.")
+            outcube = np.empty(shape=self.shape, dtype=np.float64)
+
+        _check_parallel_options(num_cores, parallel)
+
+        nspec, ny, nx = self.shape
+        # Each thread holds a few temporary copies of its slab
+        nthreads = num_cores if num_cores is not None and num_cores > 1 else 1
+        nrows = int(max(1, min(-(-ny // nthreads),
+                               cube_utils.MEMORY_THRESHOLD // 10 //
+                               (4 * nthreads * nspec * nx))))
+        views = [(slice(None), slice(start, start + nrows))
+                 for start in range(0, ny, nrows)]
+
+        if update_function is not None:
+            pbu = update_function
+        elif verbose > 0:
+            progressbar = ProgressBar(ny * nx)
+            pbu = progressbar.update
+        else:
+            pbu = object
+
+        def filter_slab(view):
+            data = self._get_filled_data(view=view, fill=self._fill_value)
+            if self._mask is None:
+                include = np.ones(data.shape, dtype='bool')
+            else:
+                include = self._mask.include(data=self._data, wcs=self._wcs,
+                                             view=view,
+                                             wcs_tolerance=self._wcs_tolerance)
+            if pass_view:
+                result = function(data, include, view)
+            else:
+                result = function(data, include)
+            outcube[view] = np.where(include.any(axis=0), result, data)
+            # one update per spectrum, as in apply_function_parallel_spectral
+            for ii in range(data.shape[1] * data.shape[2]):
+                pbu()
+
+        if nthreads > 1:
+            from concurrent.futures import ThreadPoolExecutor
+            with ThreadPoolExecutor(max_workers=nthreads) as executor:
+                list(executor.map(filter_slab, views))
+        else:
+            for view in views:
+                filter_slab(view)
+
+        newcube = self._new_cube_with(data=outcube, wcs=self.wcs,
+                                      mask=self.mask, meta=self.meta,
+                                      fill_value=self.fill_value)
+
+        return newcube
+
     def spectral_interpolate(self, spectral_grid,
                              suppress_smooth_warning=False,
                              fill_value=None,
-                             update_function=None):
+                             update_function=None,
+                             num_cores=None):
         """Resample the cube spectrally onto a specific grid
 
+        Because all spectra share the same input and output grids, the
+        interpolation indices and weights are computed once, and each output
+        channel is built as the weighted sum of (at most) two input channels.
+        Only those channels are held in memory while building a channel of
+        the output.
+
         Parameters
         ----------
         spectral_grid : array
@@ -2993,6 +3945,9 @@ class BaseSpectralCube(BaseNDClass, MaskableArrayMixinClass,
         update_function : method
             Method that is called to update an external progressbar
             If provided, it disables the default `astropy.utils.console.ProgressBar`
+        num_cores : int or None
+            The number of threads to use to compute the output channels.
+            Defaults to one.
 
         Returns
         -------
@@ -3013,7 +3968,6 @@ class BaseSpectralCube(BaseNDClass, MaskableArrayMixinClass,
         else:
             outslice = slice(None, None, 1)
 
-        cubedata = self.filled_data
         specslice = slice(None) if indiff >= 0 else slice(None, None, -1)
         inaxis = inaxis[specslice]
         indiff = np.mean(np.diff(inaxis))
@@ -3034,35 +3988,71 @@ class BaseSpectralCube(BaseNDClass, MaskableArrayMixinClass,
                          SmoothingWarning
                          )
 
+        lower, upper, weight, outside = \
+            cube_utils.linear_interpolation_weights(spectral_grid.value,
+                                                    inaxis.value)
+
+        # convert to indices into the cube and the output array
+        nin, nout = self.shape[0], spectral_grid.size
+        if specslice.step is not None:
+            lower, upper = nin - 1 - lower, nin - 1 - upper
+        outindex = np.arange(nout)[outslice]
+
+        # spectra that are entirely masked are NaN in the output
+        anyincluded = np.zeros(self.shape[1:], dtype='bool')
+        for index in range(nin):
+            anyincluded |= self.mask.include(view=(index,))
 
-        newcube = np.empty([spectral_grid.size, self.shape[1], self.shape[2]],
-                           dtype=cubedata[:1, 0, 0].dtype)
-        newmask = np.empty([spectral_grid.size, self.shape[1], self.shape[2]],
+        newcube = np.empty([nout, self.shape[1], self.shape[2]],
+                           dtype=self._get_filled_data(view=(0, 0, slice(0, 1))).dtype)
+        newmask = np.empty([nout, self.shape[1], self.shape[2]],
                            dtype='bool')
 
-        yy,xx = np.indices(self.shape[1:])
         if update_function is None:
-            pb = ProgressBar(xx.size)
+            pb = ProgressBar(nout)
             update_function = pb.update
 
-        for ix, iy in (zip(xx.flat, yy.flat)):
-            mask = self.mask.include(view=(specslice, iy, ix))
-            if any(mask):
-                newcube[outslice,iy,ix] = \
-                    np.interp(spectral_grid.value, inaxis.value,
-                              cubedata[specslice,iy,ix].value,
-                              left=fill_value, right=fill_value)
-                if all(mask):
-                    newmask[:,iy,ix] = True
+        def interpolate_channels(channels):
+            # keep the most recently read input channels; consecutive output
+            # channels mostly share their input channels
+            planes = {}
+
+            def get_plane(index):
+                if index not in planes:
+                    if len(planes) >= 2:
+                        planes.pop(min(planes))
+                    planes[index] = (self._get_filled_data(view=(index,),
+                                                           fill=self._fill_value),
+                                     self.mask.include(view=(index,)))
+                return planes[index]
+
+            for channel in channels:
+                data_lo, mask_lo = get_plane(lower[channel])
+                wt = weight[channel]
+                if wt == 0:
+                    plane = data_lo.copy()
+                    planemask = mask_lo.copy()
                 else:
-                    interped = np.interp(spectral_grid.value,
-                                         inaxis.value, mask) > 0
-                    newmask[outslice,iy,ix] = interped
-            else:
-                newmask[:, iy, ix] = False
-                newcube[:, iy, ix] = np.NaN
-
-            update_function()
+                    data_up, mask_up = get_plane(upper[channel])
+                    plane = data_lo * (1 - wt) + data_up * wt
+                    planemask = mask_lo | mask_up
+                if outside[channel] and fill_value is not None:
+                    plane[:] = fill_value
+                plane[~anyincluded] = np.nan
+                planemask &= anyincluded
+
+                newcube[outindex[channel]] = plane
+                newmask[outindex[channel]] = planemask
+
+                update_function()
+
+        if num_cores is not None and num_cores > 1:
+            from concurrent.futures import ThreadPoolExecutor
+            blocks = np.array_split(np.arange(nout), num_cores)
+            with ThreadPoolExecutor(max_workers=num_cores) as executor:
+                list(executor.map(interpolate_channels, blocks))
+        else:
+            interpolate_channels(range(nout))
 
         newwcs = self.wcs.deepcopy()
         newwcs.wcs.crpix[2] = 1
@@ -3081,15 +4071,206 @@ class BaseSpectralCube(BaseNDClass, MaskableArrayMixinClass,
 
         return newcube
 
-    @warn_slow
+    def _spectral_resampling(self, spectral_grid, kernel=None):
+        """
+        Set up `spectral_resample`: compute the weights of the input channels
+        contributing to each output channel and the output WCS.
+
+        Returns
+        -------
+        rows : list of tuple
+            See `~spectral_cube.cube_utils.resampling_weights`
+        outside : `~numpy.ndarray`
+            Whether each row lies outside of the input spectral range
+        outindex : `~numpy.ndarray`
+            The output channel of each row
+        newwcs : `~astropy.wcs.WCS`
+            The WCS of the output cube
+        """
+        nin = self.shape[0]
+
+        if not hasattr(spectral_grid, 'unit') and np.isscalar(spectral_grid):
+            if not float(spectral_grid).is_integer() or spectral_grid < 1:
+                raise ValueError("The downsampling factor must be a positive "
+                                 "integer.")
+            factor = int(spectral_grid)
+
+            rows = cube_utils.resampling_weights(nin, factor=factor,
+                                                 kernel=kernel)
+
+            # slicing a WCS with a step puts the new pixels at the centres
+            # of the blocks
+            view = (slice(0, None, factor), slice(None), slice(None))
+            newwcs = wcs_utils.slice_wcs(self.wcs, view, shape=self.shape)
+            newwcs._naxis = list(self.shape)
+
+            return (rows, np.zeros(len(rows), dtype='bool'),
+                    np.arange(len(rows)), newwcs)
+
+        inaxis = self.spectral_axis.to(spectral_grid.unit)
+
+        indiff = np.mean(np.diff(inaxis))
+        outdiff = np.mean(np.diff(spectral_grid))
+
+        # account for reversed axes
+        if outdiff < 0:
+            spectral_grid = spectral_grid[::-1]
+            outdiff = np.mean(np.diff(spectral_grid))
+            outslice = slice(None, None, -1)
+        else:
+            outslice = slice(None, None, 1)
+
+        specslice = slice(None) if indiff >= 0 else slice(None, None, -1)
+        inaxis = inaxis[specslice]
+        indiff = np.mean(np.diff(inaxis))
+
+        np.testing.assert_allclose(np.diff(spectral_grid), outdiff,
+                                   err_msg="Output grid must be linear")
+
+        if kernel is None and outdiff > indiff:
+            # Smooth to the output resolution with a Gaussian
+            fwhm = (outdiff**2 - indiff**2)**0.5 / indiff
+            kernel = convolution.Gaussian1DKernel(fwhm.decompose().value /
+                                                  SIGMA2FWHM)
+
+        lower, upper, weight, outside = \
+            cube_utils.linear_interpolation_weights(spectral_grid.value,
+                                                    inaxis.value)
+        if specslice.step is not None:
+            lower, upper = nin - 1 - lower, nin - 1 - upper
+
+        rows = cube_utils.resampling_weights(nin, lower=lower, upper=upper,
+                                             weight=weight, kernel=kernel)
+        outindex = np.arange(len(rows))[outslice]
+
+        newwcs = self.wcs.deepcopy()
+        newwcs.wcs.crpix[2] = 1
+        newwcs.wcs.crval[2] = spectral_grid[0].value if outslice.step > 0 \
+            else spectral_grid[-1].value
+        newwcs.wcs.cunit[2] = spectral_grid.unit.to_string('FITS')
+        newwcs.wcs.cdelt[2] = outdiff.value if outslice.step > 0 \
+            else -outdiff.value
+        newwcs.wcs.set()
+
+        return rows, outside, outindex, newwcs
+
+    def spectral_resample(self, spectral_grid, kernel=None, fill_value=None,
+                          use_memmap=True, update_function=None):
+        """
+        Smooth and resample the cube spectrally in a single pass.
+
+        Each output channel is computed directly as a weighted sum of input
+        channels, with weights combining the smoothing kernel with either
+        block averaging (for an integer downsampling factor) or linear
+        interpolation (for a spectral grid).  This is equivalent to
+        `spectral_smooth` followed by `downsample_axis` or
+        `spectral_interpolate`, without writing the smoothed cube.
+
+        Masked values are given zero weight and the remaining weights are
+        renormalized, so output channels are only masked if none of their
+        input channels are included.
+
+        Parameters
+        ----------
+        spectral_grid : int or `~astropy.units.Quantity`
+            Either an integer factor by which to downsample the spectral axis,
+            averaging blocks of channels as `downsample_axis` does, or an
+            array of the spectral positions to resample onto.  The grid must
+            be linear.
+        kernel : `~astropy.convolution.Kernel1D`, optional
+            A kernel, with an odd size, to smooth the input channels with.
+            When resampling onto a coarser grid, the default is a Gaussian
+            with a FWHM of ``sqrt(outdiff**2 - indiff**2)``, which smooths to
+            the resolution of the output grid.
+        fill_value : float
+            Value for output channels that lie outside of the spectral range
+            of the cube.  The default is to use the nearest spectral channel.
+        use_memmap : bool
+            If specified, a memory mapped temporary file on disk will be
+            written to rather than storing the output cube in memory.
+        update_function : method
+            Method that is called for each output channel to update an
+            external progressbar.
+
+        Returns
+        -------
+        cube : SpectralCube
+        """
+
+        if kernel is not None and isinstance(getattr(kernel, 'array', kernel),
+                                             u.Quantity):
+            raise u.UnitsError("The convolution kernel should be defined "
+                               "without a unit.")
+
+        rows, outside, outindex, newwcs = self._spectral_resampling(spectral_grid,
+                                                                    kernel=kernel)
+
+        nout = len(rows)
+        newshape = (nout,) + self.shape[1:]
+        if use_memmap:
+            ntf = tempfile.NamedTemporaryFile()
+            newcube = np.memmap(ntf, mode='w+', shape=newshape, dtype=np.float64)
+        else:
+            if self._is_huge and not self.allow_huge_operations:
+                raise ValueError("Applying a function without ``use_memmap`` "
+                                 "requires loading the whole array into "
+                                 "memory *twice*, which can overload the "
+                                 "machine's memory for large cubes.  Either "
+                                 "set ``use_memmap=True`` or set "
+                                 "``cube.allow_huge_operations=True`` to "
+                                 "override this restriction.")
+            newcube = np.empty(newshape, dtype=np.float64)
+        newmask = np.empty(newshape, dtype='bool')
+
+        if update_function is None:
+            pb = ProgressBar(nout)
+            update_function = pb.update
+
+        # Compute the output channels in order of their first input channel,
+        # so that input planes can be dropped as soon as they are not needed
+        planes = {}
+        for row in np.argsort([indices[0] for indices, _ in rows],
+                              kind='mergesort'):
+            indices, weights = rows[row]
+            for index in [index for index in planes if index < indices[0]]:
+                del planes[index]
+
+            numerator = np.zeros(self.shape[1:])
+            denominator = np.zeros(self.shape[1:])
+            for index, wt in zip(indices, weights):
+                if index not in planes:
+                    plane = self._get_filled_data(view=(index,), fill=np.nan)
+                    valid = np.isfinite(plane)
+                    planes[index] = (np.where(valid, plane, 0), valid)
+                plane, valid = planes[index]
+                numerator += wt * plane
+                denominator += wt * valid
+
+            with np.errstate(divide='ignore', invalid='ignore'):
+                result = numerator / denominator
+            result[denominator == 0] = np.nan
+            if outside[row] and fill_value is not None:
+                result[:] = fill_value
+
+            newcube[outindex[row]] = result
+            newmask[outindex[row]] = np.isfinite(result)
+
+            update_function()
+
+        newbmask = BooleanArrayMask(newmask, wcs=newwcs)
+
+        return self._new_cube_with(data=newcube, wcs=newwcs, mask=newbmask,
+                                   meta=self.meta, fill_value=self.fill_value)
+
     def convolve_to(self, beam, convolve=convolution.convolve_fft, update_function=None, **kwargs):
         """
         Convolve each channel in the cube to a specified beam
 
-        .. warning::
-            The current implementation of ``convolve_to`` creates an in-memory
-            copy of the whole cube to store the convolved data.  Issue #506
-            notes that this is a problem, and it is on our to-do list to fix.
+        The cube is read a batch of channels at a time, and by default the
+        convolved data are written to a memory-mapped array
+        (``use_memmap=True``).  With ``use_memmap=False`` the output is held
+        in memory, which is refused for large cubes unless
+        ``allow_huge_operations`` is set.
 
         Parameters
         ----------
@@ -3103,12 +4284,23 @@ class BaseSpectralCube(BaseNDClass, MaskableArrayMixinClass,
             Method that is called to update an external progressbar
             If provided, it disables the default `astropy.utils.console.ProgressBar`
         kwargs : dict
-            Keyword arguments to pass to the convolution function
+            Keyword arguments to pass to the convolution function, except
+            for ``use_memmap``, ``memmap_dir``, ``num_cores`` and
+            ``parallel``, which have the same meaning as for
+            `apply_function_parallel_spatial`
 
         Returns
         -------
         cube : `SpectralCube`
             A SpectralCube with a single ``beam``
+
+        Notes
+        -----
+        With the default ``convolve=astropy.convolution.convolve_fft``, the
+        kernel is transformed once and the planes are convolved in batches
+        using `scipy.fft`; ``num_cores`` sets the number of FFT threads.
+        Separable kernels, such as those of circular beams, are instead
+        applied as two 1D convolutions.
         """
 
         # Check if the beams are the same.
@@ -3117,10 +4309,15 @@ class BaseSpectralCube(BaseNDClass, MaskableArrayMixinClass,
                           "Skipping convolution.")
             return self
 
-        pixscale = wcs.utils.proj_plane_pixel_area(self.wcs.celestial)**0.5*u.deg
+        pixscale = wcs.utils.proj_plane_pixel_area(self._celestial_wcs)**0.5*u.deg
 
         convolution_kernel = beam.deconvolve(self.beam).as_kernel(pixscale)
 
+        if engine_supported(convolve, convolution_kernel, kwargs):
+            return self._apply_convolution_engine(convolution_kernel, convolve,
+                                                  update_function=update_function,
+                                                  **kwargs).with_beam(beam)
+
         # See #631: kwargs get passed within self.apply_function_parallel_spatial
         def convfunc(img, **kwargs):
             return convolve(img, convolution_kernel, normalize_kernel=True,
@@ -3158,7 +4355,6 @@ class BaseSpectralCube(BaseNDClass, MaskableArrayMixinClass,
         return self.with_mask(goodchannels[:,None,None])
 
 
-    @warn_slow
     def downsample_axis(self, factor, axis, estimator=np.nanmean,
                         truncate=False, use_memmap=True, progressbar=True):
         """
@@ -3168,19 +4364,28 @@ class BaseSpectralCube(BaseNDClass, MaskableArrayMixinClass,
         The WCS will be 'downsampled' by the specified factor as well.
         If the downsample factor is odd, there will be an offset in the WCS.
 
-        There is both an in-memory and a memory-mapped implementation; the
-        default is to use the memory-mapped version.  Technically, the 'large
-        data' warning doesn't apply when using the memory-mapped version, but
-        the warning is still there anyway.
+        Several axes can be downsampled at once by giving a sequence of axes
+        (and optionally one factor per axis), e.g. ``factor=(2, 2),
+        axis=(1, 2)`` bins the cube 2x2 spatially.
+
+        The cube is reduced a slab of output channels at a time, with each
+        slab of the input reshaped into blocks so that the common numpy
+        estimators (sum, mean, max, etc., and their nan-ignoring variants)
+        are applied without copying the data.  The output has the same dtype
+        as the (filled) input data.  There is both an in-memory and a
+        memory-mapped implementation of the output array; the default is to
+        use the memory-mapped version.  The in-memory version is refused for
+        large cubes unless ``allow_huge_operations`` is set.
 
         Parameters
         ----------
         myarr : `~numpy.ndarray`
             The array to downsample
-        factor : int
-            The factor to downsample by
-        axis : int
-            The axis to downsample along
+        factor : int or sequence of int
+            The factor to downsample by, either a single value for all of the
+            axes or one value per axis
+        axis : int or sequence of int
+            The axis or axes to downsample along
         estimator : function
             defaults to mean.  You can downsample by summing or
             something else if you want a different estimator
@@ -3190,98 +4395,69 @@ class BaseSpectralCube(BaseNDClass, MaskableArrayMixinClass,
             e.g., if you downsample [1,2,3,4] by a factor of 3, you could get either
             [2] or [2,4] if truncate is True or False, respectively.
         use_memmap : bool
-            Use a memory map on disk to avoid loading the whole cube into memory
-            (several times)?  If set, the warning about large cubes can be ignored
-            (though you still have to override the warning)
+            Use a memory map on disk to store the output rather than holding
+            it in memory?
         progressbar : bool
-            Include a progress bar?  Only works with ``use_memmap=True``
-        """
-        def makeslice(startpoint,axis=axis,step=factor):
-            # make empty slices
-            view = [slice(None) for ii in range(self.ndim)]
-            # then fill the appropriate slice
-            view[axis] = slice(startpoint,None,step)
-            return tuple(view)
-
-        # size of the dimension of interest
-        xs = self.shape[axis]
-
-        if not use_memmap:
-            if xs % int(factor) != 0:
-                if truncate:
-                    view = [slice(None) for ii in range(self.ndim)]
-                    view[axis] = slice(None,xs-(xs % int(factor)))
-                    view = tuple(view)
-                    crarr = self.unitless_filled_data[view]
-                    mask = self.mask[view].include()
-                else:
-                    extension_shape = list(self.shape)
-                    extension_shape[axis] = (factor - xs % int(factor))
-                    extension = np.empty(extension_shape) * np.nan
-                    crarr = np.concatenate((self.unitless_filled_data[:],
-                                            extension), axis=axis)
-                    extension[:] = 0
-                    mask = np.concatenate((self.mask.include(), extension), axis=axis)
-            else:
-                crarr = self.unitless_filled_data[:]
-                mask = self.mask.include()
-
-            # The extra braces here are crucial: We're adding an extra dimension so we
-            # can average across it
-            stacked_array = np.concatenate([[crarr[makeslice(ii)]]
-                                            for ii in range(factor)])
+            Include a progress bar?
+        """
+        if not use_memmap and self._is_huge and not self.allow_huge_operations:
+            raise ValueError("Downsampling without ``use_memmap`` requires "
+                             "holding the whole output array in memory, "
+                             "which can overload the machine's memory for "
+                             "large cubes.  Either set ``use_memmap=True`` "
+                             "or set ``cube.allow_huge_operations=True`` to "
+                             "override this restriction.")
 
-            dsarr = estimator(stacked_array, axis=0)
+        blocks = cube_utils.downsample_blocks(factor, axis, self.ndim)
 
-            if not isinstance(mask, np.ndarray):
-                raise TypeError("Mask is of wrong data type")
+        shape = self.shape
+        if truncate:
+            shape = tuple(size - size % block
+                          for size, block in zip(shape, blocks))
+        newshape = tuple(-(-size // block)
+                         for size, block in zip(shape, blocks))
 
-            stacked_mask = np.concatenate([[mask[makeslice(ii)]] for ii in
-                                           range(factor)])
+        # Number of output channels to compute from each slab of the input
+        planesize = blocks[0] * shape[1] * shape[2] * self._data.dtype.itemsize
+        nout = int(max(1, cube_utils.MEMORY_THRESHOLD // 10 // planesize))
+        starts = range(0, newshape[0], nout)
 
-            mask = np.any(stacked_mask, axis=0)
-        else:
-            def makeslice_local(startpoint, axis=axis, nsteps=factor):
-                # make empty slices
-                view = [slice(None) for ii in range(self.ndim)]
-                # then fill the appropriate slice
-                view[axis] = slice(startpoint,startpoint+nsteps,1)
-                return tuple(view)
+        if progressbar:
+            starts = ProgressBar(starts)
 
-            newshape = list(self.shape)
-            newshape[axis] = (newshape[axis]//factor +
-                              ((1-int(truncate)) * (xs % int(factor) != 0)))
-            newshape = tuple(newshape)
+        dsarr = mask = None
+        for start in starts:
+            stop = min(start + nout, newshape[0])
+            view = (slice(start * blocks[0], min(stop * blocks[0], shape[0])),
+                    slice(0, shape[1]), slice(0, shape[2]))
 
-            if progressbar:
-                progressbar = ProgressBar
+            data = self._get_filled_data(view=view, fill=self._fill_value)
+            if self._mask is None:
+                include = np.ones(data.shape, dtype='bool')
             else:
-                progressbar = lambda x: x
-
-            # Create a view that will add a blank newaxis at the right spot
-            view_newaxis = [slice(None) for ii in range(self.ndim)]
-            view_newaxis[axis] = None
-            view_newaxis = tuple(view_newaxis)
-
-            ntf = tempfile.NamedTemporaryFile()
-            dsarr = np.memmap(ntf, mode='w+', shape=newshape, dtype=np.float)
-            ntf2 = tempfile.NamedTemporaryFile()
-            mask = np.memmap(ntf2, mode='w+', shape=newshape, dtype=np.bool)
-            for ii in progressbar(range(newshape[axis])):
-                view_fulldata = makeslice_local(ii*factor)
-                view_newdata = makeslice_local(ii, nsteps=1)
-
-                to_average = self.unitless_filled_data[view_fulldata]
-                to_anyfy = self.mask[view_fulldata].include()
-
-                dsarr[view_newdata] = estimator(to_average, axis)[view_newaxis]
-                mask[view_newdata] = np.any(to_anyfy, axis).astype('bool')[view_newaxis]
+                include = self._mask.include(view=view)
+
+            reduced = cube_utils.block_reduce(data, blocks, estimator)
+
+            if dsarr is None:
+                if use_memmap:
+                    ntf = tempfile.NamedTemporaryFile()
+                    dsarr = np.memmap(ntf, mode='w+', shape=newshape,
+                                      dtype=reduced.dtype)
+                    ntf2 = tempfile.NamedTemporaryFile()
+                    mask = np.memmap(ntf2, mode='w+', shape=newshape,
+                                     dtype='bool')
+                else:
+                    dsarr = np.empty(newshape, dtype=reduced.dtype)
+                    mask = np.empty(newshape, dtype='bool')
 
+            dsarr[start:stop] = reduced
+            mask[start:stop] = cube_utils.block_reduce(include, blocks, np.any)
 
         # the slice should just start at zero; we had factor//2 here earlier,
         # and that was an error that probably half-compensated for an error in
         # wcs_utils
-        view = makeslice(0)
+        view = tuple(slice(0, None, block) for block in blocks)
         newwcs = wcs_utils.slice_wcs(self.wcs, view, shape=self.shape)
         newwcs._naxis = list(self.shape)
 
@@ -3498,6 +4674,36 @@ class SpectralCube(BaseSpectralCube, BeamMixinClass):
 
         return newcube
 
+def _beam_areas_method(function):
+    """
+    Wrap a method of a `VaryingResolutionSpectralCube` so that the beam
+    sameness checks of ``_handle_beam_areas_wrapper`` are performed before the
+    operation.
+    """
+
+    @wraps(function)
+    def wrapper(self, *args, **kwargs):
+        method = function.__get__(self, type(self))
+        return self._handle_beam_areas_wrapper(method)(*args, **kwargs)
+
+    wrapper.handles_beam_areas = True
+
+    return wrapper
+
+
+def _checks_beam_areas(cls):
+    """
+    Class decorator that wraps the methods listed in ``_beam_area_methods``
+    with `_beam_areas_method`, unless they are already wrapped.
+    """
+    for name in cls._beam_area_methods:
+        function = getattr(cls, name)
+        if not getattr(function, 'handles_beam_areas', False):
+            setattr(cls, name, _beam_areas_method(function))
+    return cls
+
+
+@_checks_beam_areas
 class VaryingResolutionSpectralCube(BaseSpectralCube, MultiBeamMixinClass):
     """
     A variant of the SpectralCube class that has PSF (beam) information on a
@@ -3506,6 +4712,17 @@ class VaryingResolutionSpectralCube(BaseSpectralCube, MultiBeamMixinClass):
 
     __name__ = "VaryingResolutionSpectralCube"
 
+    # For any functions that operate over the spectral axis, perform beam
+    # sameness checks before performing the operation to avoid unexpected
+    # results.  The methods are wrapped once, when the class (or a subclass
+    # overriding them) is created, so other attribute lookups are unaffected.
+    _beam_area_methods = ('moment', 'apply_numpy_function', 'apply_function',
+                          'apply_function_parallel_spectral')
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        _checks_beam_areas(cls)
+
     _oned_spectrum = VaryingResolutionOneDSpectrum
 
     def __new__(cls, *args, **kwargs):
@@ -3619,10 +4836,7 @@ class VaryingResolutionSpectralCube(BaseSpectralCube, MultiBeamMixinClass):
         slice_data = [(s.start, s.stop, s.step)
                       if hasattr(s,'start') else s
                       for s in view]
-        if 'slice' in meta:
-            meta['slice'].append(slice_data)
-        else:
-            meta['slice'] = [slice_data]
+        meta['slice'] = meta.get('slice', []) + [slice_data]
 
         # intslices identifies the slices that are given by integers, i.e.
         # indices.  Other slices are slice objects, e.g. obj[5:10], and have
@@ -3647,18 +4861,17 @@ class VaryingResolutionSpectralCube(BaseSpectralCube, MultiBeamMixinClass):
                     bmarg = {'beams': self.unmasked_beams[specslice]}
                 else:
                     bmarg = {}
-                return self._oned_spectrum(value=self._data[view],
-                                           wcs=newwcs,
-                                           copy=False,
-                                           unit=self.unit,
-                                           spectral_unit=self._spectral_unit,
-                                           mask=self.mask[view],
-                                           meta=meta,
-                                           goodbeams_mask=self.goodbeams_mask[specslice]
-                                           if hasattr(self, '_goodbeams_mask')
-                                           else None,
-                                           **bmarg
-                                          )
+                goodbeams_mask = (self.goodbeams_mask[specslice]
+                                  if hasattr(self, '_goodbeams_mask')
+                                  else None)
+                return self._oned_spectrum._from_parts(
+                    self._data[view], self.unit,
+                    wcs=newwcs,
+                    spectral_unit=self._spectral_unit,
+                    mask=self.mask[view],
+                    meta=meta,
+                    goodbeams_mask=goodbeams_mask,
+                    **bmarg)
 
             # only one element, so drop an axis
             newwcs = wcs_utils.drop_axis(self._wcs, intslices[0])
@@ -3677,12 +4890,18 @@ class VaryingResolutionSpectralCube(BaseSpectralCube, MultiBeamMixinClass):
                                      "position-spectral slicing.")
 
             meta['beam'] = self.unmasked_beams[specslice]
-            return Slice(value=self.filled_data[view],
-                         wcs=newwcs,
-                         copy=False,
-                         unit=self.unit,
-                         header=header,
-                         meta=meta)
+            return Slice._from_parts(self.filled_data[view], self.unit,
+                                     wcs=newwcs,
+                                     header=header,
+                                     meta=meta)
+
+        newcube = self._new_view_with(view, meta, naxis=self.shape)
+        if newcube is not None:
+            # Like ``_new_cube_with``, reset the good beams to the finite ones
+            newcube.__dict__.pop('_goodbeams_mask', None)
+            newcube.beams = self.unmasked_beams[specslice]
+            newcube.goodbeams_mask = np.isfinite(newcube.beams)
+            return newcube
 
         newmask = self._mask[view] if self._mask is not None else None
 
@@ -3807,27 +5026,6 @@ class VaryingResolutionSpectralCube(BaseSpectralCube, MultiBeamMixinClass):
         if errormessage != "":
             raise ValueError(errormessage)
 
-
-    def __getattribute__(self, attrname):
-        """
-        For any functions that operate over the spectral axis, perform beam
-        sameness checks before performing the operation to avoid unexpected
-        results
-        """
-
-        # short name to avoid long lines below
-        VRSC = VaryingResolutionSpectralCube
-
-        # what about apply_numpy_function, apply_function?  since they're
-        # called by some of these, maybe *only* those should be wrapped to
-        # avoid redundant calls
-        if attrname in ('moment', 'apply_numpy_function', 'apply_function',
-                        'apply_function_parallel_spectral'):
-            origfunc = super(VRSC, self).__getattribute__(attrname)
-            return self._handle_beam_areas_wrapper(origfunc)
-        else:
-            return super(VRSC, self).__getattribute__(attrname)
-
     @property
     def hdu(self):
         raise ValueError("For VaryingResolutionSpectralCube's, use hdulist "
@@ -3851,6 +5049,7 @@ class VaryingResolutionSpectralCube(BaseSpectralCube, MultiBeamMixinClass):
     def convolve_to(self, beam, allow_smaller=False,
                     convolve=convolution.convolve_fft,
                     update_function=None,
+                    kernel_tolerance=0.,
                     **kwargs):
         """
         Convolve each channel in the cube to a specified beam
@@ -3880,18 +5079,22 @@ class VaryingResolutionSpectralCube(BaseSpectralCube, MultiBeamMixinClass):
         update_function : method
             Method that is called to update an external progressbar
             If provided, it disables the default `astropy.utils.console.ProgressBar`
+        kernel_tolerance : float
+            Channels whose convolution kernels agree to within this relative
+            tolerance share a single kernel (see
+            `~spectral_cube._convolution.group_beam_kernels`).  The default
+            only groups channels with identical beams.
         kwargs : dict
             Keyword arguments to pass to the convolution function
 
-
         Returns
         -------
         cube : `SpectralCube`
             A SpectralCube with a single ``beam``
         """
 
-        if ((self.wcs.celestial.wcs.get_pc()[0,1] != 0 or
-             self.wcs.celestial.wcs.get_pc()[1,0] != 0)):
+        if ((self._celestial_wcs.wcs.get_pc()[0,1] != 0 or
+             self._celestial_wcs.wcs.get_pc()[1,0] != 0)):
             warnings.warn("The beams will produce convolution kernels "
                           "that are not aware of any misaligment "
                           "between pixel and world coordinates, "
@@ -3901,49 +5104,57 @@ class VaryingResolutionSpectralCube(BaseSpectralCube, MultiBeamMixinClass):
                           BeamWarning
                          )
 
-        pixscale = wcs.utils.proj_plane_pixel_area(self.wcs.celestial)**0.5*u.deg
+        pixscale = wcs.utils.proj_plane_pixel_area(self._celestial_wcs)**0.5*u.deg
 
-        convolution_kernels = []
-        for bm,valid in zip(self.unmasked_beams, self.goodbeams_mask):
-            if not valid:
-                # just skip masked-out beams
-                convolution_kernels.append(None)
-                continue
-            elif beam == bm:
-                # Point response when beams are equal, don't convolve.
-                convolution_kernels.append(None)
-                continue
-            try:
-                cb = beam.deconvolve(bm)
-                ck = cb.as_kernel(pixscale)
-                convolution_kernels.append(ck)
-            except ValueError:
-                if allow_smaller:
-                    convolution_kernels.append(None)
-                else:
-                    raise
+        # Each kernel is built once and applied to its whole group of channels
+        kernels, groups = group_beam_kernels(beam, self.unmasked_beams,
+                                             pixscale,
+                                             goodbeams=self.goodbeams_mask,
+                                             allow_smaller=allow_smaller,
+                                             tolerance=kernel_tolerance)
 
         if update_function is None:
             pb = ProgressBar(self.shape[0])
             update_function = pb.update
 
         newdata = np.empty(self.shape)
-        for ii,kernel in enumerate(convolution_kernels):
-
-            # load each image from a slice to avoid loading whole cube into
-            # memory
-            img = self[ii,:,:].filled_data[:]
+        for igroup in range(-1, len(kernels)):
+            channels = np.flatnonzero(groups == igroup)
+            if channels.size == 0:
+                continue
 
             # Kernel can only be None when `allow_smaller` is True,
             # or if the beams are equal. Only the latter is really valid.
-            if kernel is None:
-                newdata[ii, :, :] = img
+            kernel = kernels[igroup] if igroup >= 0 else None
+            use_engine = (kernel is not None and
+                          engine_supported(convolve, kernel, kwargs,
+                                           extra_kwargs=()))
+            if use_engine:
+                convolver = make_convolver(convolve, kernel, self.shape[1:],
+                                           **kwargs)
+                nbatch = convolver.batch_size(channels.size)
             else:
-                # See #631: kwargs get passed within self.apply_function_parallel_spatial
-                newdata[ii, :, :] = convolve(img, kernel,
-                                             normalize_kernel=True,
-                                             **kwargs)
-            update_function()
+                nbatch = 1
+
+            for start in range(0, channels.size, nbatch):
+                chans = channels[start:start + nbatch]
+
+                # load each image from a slice to avoid loading whole cube
+                # into memory
+                img = np.array([self._get_filled_data(view=(ii,),
+                                                      fill=self._fill_value)
+                                for ii in chans])
+
+                if kernel is None:
+                    newdata[chans] = img
+                elif use_engine:
+                    newdata[chans] = convolver.convolve(img)
+                else:
+                    newdata[chans] = convolve(img[0], kernel,
+                                              normalize_kernel=True,
+                                              **kwargs)
+                for ii in chans:
+                    update_function()
 
         newcube = SpectralCube(data=newdata, wcs=self.wcs, mask=self.mask,
                                meta=self.meta, fill_value=self.fill_value,
@@ -4032,6 +5243,12 @@ class VaryingResolutionSpectralCube(BaseSpectralCube, MultiBeamMixinClass):
                              "common resolution with `convolve_to` before "
                              "attempting spectral smoothed.")
 
+    def spectral_resample(self, *args, **kwargs):
+        raise AttributeError("VaryingResolutionSpectralCubes can't be "
+                             "spectrally resampled.  Convolve to a "
+                             "common resolution with `convolve_to` before "
+                             "attempting spectral resampling.")
+
 
 def _regionlist_to_single_region(region_list):
     """
@@ -3,9 +3,15 @@ import pytest
 import warnings
 import numpy as np
 import astropy.units as u
+from astropy.io import fits
+from astropy.wcs import WCS
 # from astropy.modeling import models, fitting
 
-from ..analysis_utilities import stack_spectra, fourier_shift
+from ..analysis_utilities import (stack_spectra, fourier_shift, mosaic_cubes,
+                                  shuffle_cube, stack_cube)
+from .. import cube_utils
+from ..spectral_cube import SpectralCube
+from ..masks import BooleanArrayMask
 from .utilities import generate_gaussian_cube, gaussian
 from ..utils import BadVelocitiesWarning
 
@@ -358,6 +364,248 @@ def test_stacking_noisy(use_dask):
     #                                atol=fit_err)
 
 
+@pytest.mark.parametrize(('stack_function', 'num_cores'),
+                         ((np.nanmean, 1), (np.nansum, 2), (np.nanmedian, 1),
+                          (np.nanmedian, 2)))
+def test_stacking_batched(stack_function, num_cores, use_dask, monkeypatch):
+    '''
+    Stacking in slabs and chunks of spectra should match shifting each
+    spectrum with fourier_shift, including masked channels and padding.
+    '''
+
+    test_cube, test_vels = \
+        generate_gaussian_cube(shape=(40, 6, 5), amp=1., sigma=4.,
+                               noise=0.1, use_dask=use_dask)
+
+    np.random.seed(1)
+    mask = np.random.random(test_cube.shape) > 0.2
+    mask[:, 2, 3] = False
+    test_cube = test_cube.with_mask(mask)
+
+    v0 = 0. * u.km / u.s
+
+    # Read slabs of two rows, in chunks of three spectra
+    monkeypatch.setattr(cube_utils, 'MEMORY_THRESHOLD',
+                        10 * test_cube.shape[0] * test_cube.shape[2] * 2)
+
+    stacked = stack_spectra(test_cube, test_vels, v0=v0,
+                            stack_function=stack_function,
+                            num_cores=num_cores, chunk_size=3,
+                            pad_edges=True)
+
+    spec_axis = test_cube.spectral_axis.to(u.km / u.s)
+    vdiff = np.diff(spec_axis[:2])[0]
+    pix_shifts = -((test_vels - v0) / vdiff).to(u.one).value
+    pad_size = (-min(int(np.ceil(pix_shifts.min())), 0),
+                max(int(np.ceil(pix_shifts.max())), 0))
+
+    data = test_cube.filled_data[:].value
+    shifted = [fourier_shift(data[:, y, x], pix_shifts[y, x],
+                             add_pad=True, pad_size=pad_size)
+               for y in range(data.shape[1]) for x in range(data.shape[2])]
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        expected = stack_function(np.array(shifted), axis=0)
+
+    assert stacked.shape == expected.shape
+    np.testing.assert_allclose(stacked.value, expected, atol=1e-10)
+
+
+def test_stacking_shift_methods(use_dask):
+    '''
+    Rolling and linear interpolation agree with the FFT shift for whole
+    channel shifts, and linear interpolation is close for smooth profiles.
+    '''
+
+    test_cube, test_vels = \
+        generate_gaussian_cube(shape=(60, 5, 5), amp=1., sigma=6.,
+                               noise=None, use_dask=use_dask)
+    v0 = 0. * u.km / u.s
+    vdiff = np.diff(test_cube.spectral_axis[:2])[0].to(u.km / u.s)
+
+    int_vels = np.round((test_vels / vdiff).to(u.one)) * vdiff
+
+    stacked = {method: stack_spectra(test_cube, int_vels, v0=v0,
+                                     chunk_size=4, method=method)
+               for method in ('fft', 'roll', 'linear')}
+    np.testing.assert_allclose(stacked['roll'].value, stacked['fft'].value,
+                               atol=1e-10)
+    np.testing.assert_allclose(stacked['linear'].value, stacked['fft'].value,
+                               atol=1e-6)
+
+    stacked_fft = stack_spectra(test_cube, test_vels, v0=v0, method='fft')
+    stacked_linear = stack_spectra(test_cube, test_vels, v0=v0,
+                                   method='linear')
+    np.testing.assert_allclose(stacked_linear.value, stacked_fft.value,
+                               atol=1e-2)
+
+    # Masked channels are rolled with the spectra
+    mask = np.ones(test_cube.shape, dtype=bool)
+    mask[25:30, 1] = False
+    masked_cube = test_cube.with_mask(mask)
+    stacked_fft = stack_spectra(masked_cube, int_vels, v0=v0,
+                                stack_function=np.nanmax, method='fft')
+    stacked_roll = stack_spectra(masked_cube, int_vels, v0=v0,
+                                 stack_function=np.nanmax, method='roll')
+    np.testing.assert_allclose(stacked_roll.value, stacked_fft.value,
+                               atol=1e-10)
+
+    with pytest.raises(ValueError, match='method must be one of'):
+        stack_spectra(test_cube, test_vels, v0=v0, method='cubic')
+
+
+@pytest.mark.parametrize('method', ('fft', 'roll'))
+def test_shuffle_cube(method, use_dask):
+
+    test_cube, test_vels = \
+        generate_gaussian_cube(shape=(40, 4, 5), amp=1., sigma=4.,
+                               noise=0.1, use_dask=use_dask)
+    v0 = 0. * u.km / u.s
+
+    xy_posns = np.where(np.arange(20).reshape(4, 5) % 3 != 0)
+
+    shuffled = shuffle_cube(test_cube, test_vels, v0=v0, xy_posns=xy_posns,
+                            chunk_size=4, method=method, use_memmap=False)
+    stacked = stack_spectra(test_cube, test_vels, v0=v0, xy_posns=xy_posns,
+                            method=method)
+
+    assert shuffled.shape == (stacked.size,) + test_cube.shape[1:]
+    np.testing.assert_allclose(shuffled.spectral_axis.value,
+                               stacked.spectral_axis.value)
+
+    data = shuffled.filled_data[:].value
+    assert np.isnan(data[:, 0, 0]).all()
+    assert np.isfinite(data[:, xy_posns[0], xy_posns[1]]).any(axis=0).all()
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        np.testing.assert_allclose(np.nanmean(data[:, xy_posns[0],
+                                                   xy_posns[1]], axis=1),
+                                   stacked.value, atol=1e-10)
+
+
+def test_shuffle_cube_varying_resolution(data_vda_beams):
+
+    cube = SpectralCube.read(data_vda_beams)
+    vels = np.zeros(cube.shape[1:]) * u.km / u.s
+
+    with pytest.raises(ValueError, match="before shuffling"):
+        shuffle_cube(cube, vels, v0=0 * u.km / u.s, use_memmap=False)
+
+
+@pytest.mark.parametrize(('average', 'num_cores'),
+                         ((np.nanmean, None), (np.mean, 2),
+                          (np.nanmedian, None), (np.nanmedian, 2)))
+def test_stack_cube(average, num_cores):
+
+    header = fits.Header({'NAXIS': 3, 'NAXIS1': 4, 'NAXIS2': 3,
+                          'NAXIS3': 120,
+                          'CTYPE1': 'RA---TAN', 'CTYPE2': 'DEC--TAN',
+                          'CTYPE3': 'FREQ', 'CUNIT1': 'deg', 'CUNIT2': 'deg',
+                          'CUNIT3': 'Hz', 'CDELT1': -1e-3, 'CDELT2': 1e-3,
+                          'CDELT3': 5e5, 'CRPIX1': 1, 'CRPIX2': 1,
+                          'CRPIX3': 1, 'CRVAL1': 10, 'CRVAL2': 10,
+                          'CRVAL3': 99.97e9, 'RESTFRQ': 1e11})
+    np.random.seed(3)
+    data = np.random.randn(120, 3, 4)
+    mask = np.random.random(data.shape) > 0.1
+    cube = SpectralCube(data=data, wcs=WCS(header),
+                        mask=BooleanArrayMask(mask, WCS(header)))
+
+    linelist = [100.0e9 * u.Hz, 99.99e9 * u.Hz, 100.013e9 * u.Hz]
+    vmin, vmax = -20 * u.km / u.s, 20 * u.km / u.s
+
+    stacked = stack_cube(cube, linelist, vmin, vmax, average=average,
+                         num_cores=num_cores, use_memmap=False)
+
+    # Compare to regridding each line cutout as a whole
+    cutouts = [cube.with_spectral_unit(u.km / u.s, velocity_convention='radio',
+                                       rest_value=restval).spectral_slab(vmin, vmax)
+               for restval in linelist]
+    expected = [cutouts[0].filled_data[:].value]
+    for cutout in cutouts[1:]:
+        regridded = cutout.spectral_interpolate(cutouts[0].spectral_axis,
+                                                suppress_smooth_warning=True)
+        expected.append(regridded.filled_data[:].value)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        expected = average(expected, axis=0)
+
+    assert isinstance(stacked, SpectralCube)
+    assert stacked.shape == cutouts[0].shape
+    np.testing.assert_allclose(stacked.spectral_axis.value,
+                               cutouts[0].spectral_axis.value)
+    np.testing.assert_allclose(stacked.filled_data[:].value, expected,
+                               atol=1e-10)
+
+
+@pytest.mark.parametrize('num_cores', (None, 2))
+def test_mosaic_cubes(num_cores, use_dask, monkeypatch):
+
+    pytest.importorskip('reproject')
+
+    test_cube, _ = generate_gaussian_cube(shape=(4, 8, 10), use_dask=use_dask)
+
+    # Two overlapping cubes, the second with a different unit, that do not
+    # cover the last column of the output
+    left = test_cube[:, :, :6]
+    right = (test_cube[:, :, 4:9] * 3).to(u.mK)
+
+    # Use 5x5 pixel tiles
+    monkeypatch.setattr(cube_utils, 'MEMORY_THRESHOLD',
+                        10 * 25 * 4 * (num_cores or 1))
+
+    primary_beam = np.ones(right.shape[1:])
+    primary_beam[:, -1] = 0.5
+    mosaic, weight = mosaic_cubes([left, right], test_cube.header,
+                                  weights=[1., 3 * primary_beam],
+                                  num_cores=num_cores)
+
+    assert mosaic.shape == weight.shape == test_cube.shape
+    assert mosaic.unit == test_cube.unit
+
+    data = test_cube.filled_data[:].value
+    expected = data.copy()
+    expected[:, :, 4:6] = (data[:, :, 4:6] + 9 * data[:, :, 4:6]) / 4
+    expected[:, :, 6:] *= 3
+    expected[:, :, -1] = np.nan
+    np.testing.assert_allclose(mosaic.filled_data[:].value, expected)
+
+    expected_weight = np.ones(test_cube.shape)
+    expected_weight[:, :, 4:6] = 4
+    expected_weight[:, :, 6:] = 3
+    expected_weight[:, :, -2] = 1.5
+    expected_weight[:, :, -1] = 0
+    np.testing.assert_allclose(weight.unmasked_data[:].value, expected_weight)
+    np.testing.assert_equal(mosaic.mask.include(), expected_weight > 0)
+
+    with pytest.raises(ValueError, match="A weight is required for each cube"):
+        mosaic_cubes([left, right], test_cube.header, weights=[1.])
+
+    # weight cubes must match their cube
+    with pytest.raises(ValueError, match="same shape and WCS"):
+        mosaic_cubes([left, right], test_cube.header,
+                     weights=[test_cube, 1.])
+    with pytest.raises(ValueError, match="same shape and WCS"):
+        mosaic_cubes([left, right], test_cube.header,
+                     weights=[test_cube[:, :, 1:7], 1.])
+
+
+def test_mosaic_cubes_in_memory_wcs(use_dask):
+
+    pytest.importorskip('reproject')
+
+    test_cube, _ = generate_gaussian_cube(shape=(4, 8, 10), use_dask=use_dask)
+
+    # A WCS built from a header without NAXISn keywords has no _naxis
+    cube = test_cube._new_cube_with(wcs=WCS(test_cube.wcs.to_header()))
+
+    data = test_cube.filled_data[:].value
+    for weight in (1., np.ones(cube.shape[1:]), np.ones(cube.shape)):
+        mosaic, _ = mosaic_cubes([cube], test_cube.header, weights=[weight])
+        np.testing.assert_allclose(mosaic.filled_data[:].value, data)
+
+
 # def fit_gaussian(vels, data):
 #     g_init = models.Gaussian1D()
 
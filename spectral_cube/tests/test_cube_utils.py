@@ -4,7 +4,10 @@ from astropy.io import fits
 from astropy import units as u
 
 from .test_spectral_cube import cube_and_raw, path
-from ..cube_utils import largest_beam, smallest_beam, beams_to_bintable
+import pytest
+
+from ..cube_utils import (largest_beam, smallest_beam, beams_to_bintable,
+                          compose_views)
 
 
 def test_largest_beam(data_522_delta_beams, use_dask):
@@ -48,3 +51,25 @@ def test_beams_to_bintable():
     beamhdu = beams_to_bintable(beamlist)
 
     assert beamhdu.header['NPOL'] == 0
+
+
+@pytest.mark.parametrize(('view1', 'view2'),
+                         [((), (slice(1, None), 2)),
+                          ((slice(None, None, 2),), (slice(1, None), Ellipsis, -1)),
+                          ((slice(None, None, -1), 1), (slice(1, 3), slice(None, None, -2))),
+                          ((slice(5, 1, -2), slice(2, 6)), (slice(None, None, -1), 0, slice(1, 2))),
+                          ((Ellipsis, slice(1, 100)), (slice(10, None),)),
+                          ])
+def test_compose_views(view1, view2):
+    data = np.arange(7 * 6 * 5).reshape((7, 6, 5))
+    view = compose_views(view1, view2, data.shape)
+    assert len(view) == 3
+    np.testing.assert_array_equal(data[view], data[view1][view2])
+
+
+def test_compose_views_unsupported():
+    shape = (7, 6, 5)
+    assert compose_views((slice(None),), ([0, 2],), shape) is None
+    assert compose_views((slice(None),) * 4, (), shape) is None
+    with pytest.raises(IndexError):
+        compose_views((slice(None, 3),), (3,), shape)
@@ -11,7 +11,7 @@ from astropy import units as u
 
 from .test_spectral_cube import cube_and_raw
 from .. import (BooleanArrayMask, LazyMask, LazyComparisonMask,
-                FunctionMask, CompositeMask)
+                FunctionMask, CompositeMask, SlicedMask)
 from ..masks import is_broadcastable_and_smaller, dims_to_skip, view_of_subset
 
 from distutils.version import LooseVersion
@@ -377,6 +377,32 @@ def test_view_of_subset(shp1, shp2, inview, outview):
     assert view_of_subset(shp1,shp2,inview) == outview
 
 
+def test_sliced_mask():
+
+    data = np.arange(120).reshape((4, 5, 6))
+    wcs = WCS(naxis=3)
+    wcs.wcs.ctype = ['RA---TAN', 'DEC--TAN', 'VELO-HEL']
+
+    m = BooleanArrayMask(data % 3 == 0, wcs)
+    sm = ~m
+    view1 = (slice(1, None), slice(None, None, 2), slice(4, 0, -1))
+    view2 = (slice(None, None, 2), 1, slice(1, None))
+
+    sliced = SlicedMask(sm, (slice(1, 4, 1), slice(0, 5, 2), slice(4, 0, -1)))
+    assert sliced.shape == (3, 3, 4)
+    np.testing.assert_array_equal(sliced.include(), ~(data[view1] % 3 == 0))
+    np.testing.assert_array_equal(sliced.include(view=(0, slice(1, 3))),
+                                  ~(data[view1][0, 1:3] % 3 == 0))
+
+    # slicing again gives a view of the original mask
+    twice = sliced[view2]
+    assert isinstance(twice, SlicedMask)
+    assert twice._mask is sm
+    assert twice.shape == (2, 3)
+    np.testing.assert_array_equal(twice.include(),
+                                  ~(data[view1][view2] % 3 == 0))
+
+
 def test_flat_mask(data_adv, use_dask):
     cube, data = cube_and_raw(data_adv, use_dask=use_dask)
 
@@ -590,3 +616,52 @@ def test_boolean_array_composite_mask(data_adv, use_dask):
 
     # not doing assert_almost_equal because I don't want to worry about precision
     assert (mcube.sum() > 9.0 * u.K) & (mcube.sum() < 9.1*u.K)
+
+
+def test_wcs_validation_cache(monkeypatch):
+
+    from .. import masks, wcs_utils
+
+    mask = np.ones((2, 3, 4), dtype=bool)
+    mask_wcs = WCS(naxis=3)
+    m = BooleanArrayMask(mask, mask_wcs)
+    lm = LazyMask(lambda x: x > 0, data=mask.astype(int), wcs=mask_wcs)
+
+    # an equal but distinct WCS object
+    wcs = mask_wcs.deepcopy()
+
+    calls = []
+    check_equality = wcs_utils.check_equality
+
+    def counting_check_equality(*args, **kwargs):
+        calls.append(args)
+        return check_equality(*args, **kwargs)
+
+    monkeypatch.setattr(wcs_utils, 'check_equality', counting_check_equality)
+    masks._wcs_validation_cache.clear()
+
+    for ii in range(3):
+        m.include(mask, wcs)
+        lm.include(mask, wcs)
+        # a fresh copy has the same fingerprint and does not need re-checking
+        m.include(mask, wcs.deepcopy())
+
+    assert len(calls) == 1
+
+    # different comparison options are cached separately
+    m.include(mask, wcs, wcs_tolerance=1e-3)
+    assert len(calls) == 2
+
+    # a mismatched WCS is rejected every time, but only compared once
+    bad_wcs = wcs.deepcopy()
+    bad_wcs.wcs.crval[0] = 10.
+    for ii in range(2):
+        with pytest.raises(ValueError, match='WCS does not match mask WCS'):
+            lm.include(mask, bad_wcs)
+    assert len(calls) == 3
+
+    # a WCS that was checked and then modified in-place is checked again
+    wcs.wcs.crval[0] = 10.
+    wcs.wcs.set()
+    with pytest.raises(ValueError, match='WCS does not match mask WCS'):
+        m.include(mask, wcs)
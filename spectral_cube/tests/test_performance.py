@@ -27,6 +27,8 @@ NPY_VERSION_CHECK = LooseVersion(np.version.version) >= "1.13"
 from .test_moments import moment_cube
 from .helpers import assert_allclose
 from ..spectral_cube import SpectralCube
+from ..lower_dimensional_structures import Projection, OneDSpectrum
+from .. import wcs_utils
 from . import utilities
 
 from astropy import convolution, units as u
@@ -249,3 +251,81 @@ def test_memory_usage_coordinates():
     snap3 = tracemalloc.take_snapshot()
     diff = snap3.compare_to(snap2, 'lineno')
     assert sum([dd.size_diff for dd in diff])*u.B < 100*u.kB
+
+
+def _lower_dimensional_parts():
+    """
+    A projection and a spectrum, and functions that build the same slices of
+    them as ``obj[view]`` through ``__new__``.
+    """
+    sc = SpectralCube.read(moment_cube())
+    proj = sc.moment0()
+    spec = sc[:, 1, 1]
+
+    def new_projection():
+        view = (slice(0, 2), slice(0, 2))
+        return Projection(proj.value[view], unit=proj.unit, copy=False,
+                          wcs=proj._wcs[view], mask=proj._mask[view],
+                          meta=proj._meta, header=proj._header)
+
+    def new_spectrum():
+        view = slice(0, 2)
+        return OneDSpectrum(spec.value[view], unit=spec.unit, copy=False,
+                            wcs=wcs_utils.slice_wcs(spec._wcs, view,
+                                                    shape=spec.shape),
+                            mask=spec._mask[view], meta=spec._meta,
+                            header=spec._header)
+
+    return ((proj, (slice(0, 2), slice(0, 2)), new_projection),
+            (spec, slice(0, 2), new_spectrum))
+
+
+def test_lower_dimensional_construction(monkeypatch):
+    """
+    Slices of projections and spectra are built from the parts of the
+    original object with ``_from_parts``, which does not re-validate the mask
+    against the WCS (the expensive part of ``__new__``).
+    """
+    calls = []
+    wcs_fingerprint = wcs_utils.wcs_fingerprint
+
+    def counting_fingerprint(mywcs):
+        calls.append(mywcs)
+        return wcs_fingerprint(mywcs)
+
+    monkeypatch.setattr(wcs_utils, 'wcs_fingerprint', counting_fingerprint)
+
+    for obj, view, new in _lower_dimensional_parts():
+
+        del calls[:]
+        slow = new()
+        # __new__ compares the WCSes of the mask and of the new object
+        assert len(calls) > 0
+
+        del calls[:]
+        fast = obj[view]
+        assert len(calls) == 0
+
+        assert type(fast) is type(slow)
+        assert_allclose(fast.value, slow.value)
+        assert fast.unit == slow.unit
+        assert fast.wcs.wcs.compare(slow.wcs.wcs)
+
+
+@pytest.mark.skipif('True')
+def test_lower_dimensional_construction_cost():
+    """
+    Compare the time taken to slice projections and spectra with the time
+    taken to construct the same objects with ``__new__``; typically, slicing
+    is more than ten times faster.
+    """
+    import timeit
+
+    for obj, view, new in _lower_dimensional_parts():
+
+        fast_time = min(timeit.repeat(lambda: obj[view], number=20, repeat=3))
+        slow_time = min(timeit.repeat(new, number=20, repeat=3))
+
+        print("{0}: {1:.1f} us to slice, {2:.1f} us with __new__"
+              .format(type(obj).__name__, fast_time / 20 * 1e6,
+                      slow_time / 20 * 1e6))
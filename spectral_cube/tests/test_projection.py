@@ -15,7 +15,8 @@ from .test_spectral_cube import cube_and_raw
 from ..spectral_cube import SpectralCube
 from ..masks import BooleanArrayMask
 from ..lower_dimensional_structures import (Projection, Slice, OneDSpectrum,
-                                            VaryingResolutionOneDSpectrum)
+                                            VaryingResolutionOneDSpectrum,
+                                            SpectrumCollection)
 from ..utils import SliceWarning, WCSCelestialError
 from . import path
 
@@ -371,6 +372,26 @@ def test_projection_with_beam(data_55):
     assert new_proj[:1, :1].beam == exp_beam
 
 
+def test_projection_convolve_to_fft_engine():
+    from astropy.convolution import convolve_fft
+    from .utilities import generate_gaussian_cube
+
+    cube, _ = generate_gaussian_cube(shape=(4, 14, 11), noise=0.1)
+    proj = cube[1]
+    proj[4, 5] = np.nan
+
+    target = Beam(6 * u.arcsec)
+    kernel = target.deconvolve(proj.beam).as_kernel(1 * u.arcsec)
+
+    for kwargs in ({}, {'preserve_nan': True}, {'fill_value': np.nan}):
+        convolved = proj.convolve_to(target, **kwargs)
+        expected = convolve_fft(proj.value, kernel, normalize_kernel=True,
+                                **kwargs)
+
+        assert convolved.beam == target
+        np.testing.assert_allclose(convolved.value, expected, atol=1e-10)
+
+
 def test_ondespectrum_with_beam():
 
     exp_beam = Beam(1.0 * u.arcsec)
@@ -790,3 +811,96 @@ def test_spatial_world(view, data_adv, use_dask):
     for result, expected in zip(w2_flat, world):
         print(result.shape, expected.flatten().shape)
         assert_allclose(result, expected.flatten())
+
+
+def test_spectrum_collection():
+
+    wcs = WCS(naxis=1)
+    wcs.wcs.ctype = ['VELO-LSR']
+    wcs.wcs.cunit = ['m/s']
+    wcs.wcs.cdelt = [1000]
+    wcs.wcs.crval = [0]
+    wcs.wcs.crpix = [1]
+    wcs.wcs.set()
+
+    beam = Beam(1 * u.arcsec)
+    data = np.arange(12.).reshape(3, 4) * u.K
+
+    spectra = SpectrumCollection(data, wcs=wcs, beam=beam,
+                                 spectral_unit=u.km / u.s,
+                                 positions={'x': [1, 2, 3]})
+
+    assert len(spectra) == 3
+    assert spectra.beam == beam
+    assert_allclose(spectra.spectral_axis, [0, 1, 2, 3] * u.km / u.s)
+
+    spec = spectra[1]
+    assert isinstance(spec, OneDSpectrum)
+    assert spec.beam == beam
+    assert_allclose(spec.quantity, data[1])
+    assert_allclose(spec.spectral_axis, spectra.spectral_axis)
+
+    subset = spectra[::2, 1:]
+    assert isinstance(subset, SpectrumCollection)
+    assert_allclose(subset.quantity, data[::2, 1:])
+    assert list(subset.positions['x']) == [1, 3]
+    assert_allclose(subset.spectral_axis, [1, 2, 3] * u.km / u.s)
+
+    converted = spectra.to(u.mK)
+    assert isinstance(converted, SpectrumCollection)
+    assert_allclose(converted.quantity, data.to(u.mK))
+    assert converted.beam == beam
+    assert list(converted.positions['x']) == [1, 2, 3]
+
+    with pytest.raises(ValueError):
+        SpectrumCollection(data, wcs=wcs, positions={'x': [1, 2]})
+
+
+def test_spectrum_collection_operations(tmpdir):
+
+    from astropy.convolution import Gaussian1DKernel
+
+    wcs = WCS(naxis=1)
+    wcs.wcs.ctype = ['VRAD']
+    wcs.wcs.cunit = ['m/s']
+    wcs.wcs.cdelt = [1000]
+    wcs.wcs.crval = [0]
+    wcs.wcs.crpix = [1]
+    wcs.wcs.restfrq = 1e11
+    wcs.wcs.set()
+
+    np.random.seed(0)
+    data = np.random.randn(4, 20) * u.K
+    data[1, 5] = np.nan
+    spectra = SpectrumCollection(data, wcs=wcs, spectral_unit=u.km / u.s,
+                                 beam=Beam(1 * u.arcsec),
+                                 positions={'x': np.arange(4.),
+                                            'ra': np.arange(4.) * u.deg})
+
+    # each operation matches the equivalent OneDSpectrum operation
+    grid = np.linspace(-2, 21, 30) * u.km / u.s
+    interped = spectra.spectral_interpolate(grid, fill_value=0,
+                                            suppress_smooth_warning=True)
+    smoothed = spectra.spectral_smooth(Gaussian1DKernel(1))
+    freq = spectra.with_spectral_unit(u.GHz)
+    for ii in range(len(spectra)):
+        spec = spectra[ii]
+        assert_allclose(interped[ii].quantity,
+                        spec.spectral_interpolate(grid, fill_value=0,
+                                                  suppress_smooth_warning=True).quantity)
+        assert_allclose(smoothed[ii].quantity,
+                        spec.spectral_smooth(Gaussian1DKernel(1)).quantity)
+        assert_allclose(freq[ii].spectral_axis,
+                        spec.with_spectral_unit(u.GHz).spectral_axis)
+    assert_allclose(interped.spectral_axis, grid)
+
+    # FITS table round trip
+    filename = str(tmpdir.join('spectra.fits'))
+    spectra.write(filename)
+    newspectra = SpectrumCollection.read(filename)
+
+    assert_allclose(newspectra.quantity, spectra.quantity)
+    assert_allclose(newspectra.spectral_axis, spectra.spectral_axis)
+    assert newspectra.beam == spectra.beam
+    assert list(newspectra.positions['x']) == list(spectra.positions['x'])
+    assert newspectra.positions['ra'].unit == u.deg
@@ -24,6 +24,7 @@ NPY_VERSION_CHECK = LooseVersion(np.version.version) >= "1.13"
 from radio_beam import beam, Beam
 
 from .. import SpectralCube
+from .. import cube_utils
 from ..utils import WCSCelestialError
 from .test_spectral_cube import cube_and_raw
 from .test_projection import load_projection
@@ -122,6 +123,68 @@ def test_reproject(use_memmap, data_adv, use_dask):
     assert result_wcs_from_header.wcs.compare(wcs_out.wcs)
 
 
+@pytest.mark.parametrize('num_cores', (None, 2))
+def test_reproject_tiled(data_adv, use_dask, num_cores, monkeypatch):
+
+    pytest.importorskip('reproject')
+    from reproject import reproject_interp
+
+    cube, data = cube_and_raw(data_adv, use_dask=use_dask)
+
+    # Shift the output grid so that some of it lies off the cube
+    wcs_out = cube.wcs.deepcopy()
+    wcs_out.wcs.crpix = [wcs_out.wcs.crpix[0] + 1.5,
+                         wcs_out.wcs.crpix[1] - 2.5, wcs_out.wcs.crpix[2]]
+    header_out = cube.header
+    header_out['NAXIS1'] = 6
+    header_out['NAXIS2'] = 7
+    header_out.update(wcs_out.to_header())
+
+    expected, footprint = reproject_interp((cube.filled_data[:].value,
+                                            cube.wcs), wcs_out,
+                                           shape_out=(cube.shape[0], 7, 6))
+
+    # Use 2x2 pixel tiles
+    monkeypatch.setattr(cube_utils, 'MEMORY_THRESHOLD', 40 * cube.shape[0] *
+                        (num_cores or 1))
+
+    tiles = cube._reproject_tiles(wcs_out, (cube.shape[0], 7, 6),
+                                  nthreads=num_cores or 1)
+    assert len(tiles) == 4 and len(tiles[0]) == 3
+    # The tiles beyond the top of the cube do not read anything
+    assert tiles[-1][0][1] is None
+
+    result = cube.reproject(header_out, num_cores=num_cores)
+
+    assert result.shape == (cube.shape[0], 7, 6)
+    np.testing.assert_allclose(result.unmasked_data[:].value, expected)
+    np.testing.assert_equal(result.mask.include(), footprint > 0)
+
+
+def test_reproject_in_memory_wcs(use_dask):
+
+    pytest.importorskip('reproject')
+
+    from ..dask_spectral_cube import DaskSpectralCube
+
+    # A WCS built in memory rather than read from a header has no _naxis
+    mywcs = WCS(naxis=3)
+    mywcs.wcs.ctype = ['RA---TAN', 'DEC--TAN', 'VRAD']
+    mywcs.wcs.cunit = ['deg', 'deg', 'm/s']
+    mywcs.wcs.cdelt = [-0.01, 0.01, 1000]
+    mywcs.wcs.crpix = [3, 3, 1]
+    mywcs.wcs.crval = [10, 20, 0]
+
+    data = np.random.RandomState(0).random_sample((4, 5, 6))
+    cube_class = DaskSpectralCube if use_dask else SpectralCube
+    cube = cube_class(data=data * u.K, wcs=mywcs)
+
+    result = cube.reproject(cube.header)
+
+    assert result.shape == cube.shape
+    np.testing.assert_allclose(result.unmasked_data[:].value, data)
+
+
 def test_spectral_smooth(data_522_delta, use_dask):
 
     cube, data = cube_and_raw(data_522_delta, use_dask=use_dask)
@@ -232,6 +295,40 @@ def test_spectral_interpolate_with_fillvalue(data_522_delta, use_dask):
                                    np.ones(4)*42)
 
 
+@pytest.mark.parametrize('num_cores', (None, 2))
+def test_spectral_interpolate_matches_interp(data_adv, num_cores):
+
+    # Compare the plane-wise interpolation to np.interp along each spectrum
+    cube, data = cube_and_raw(data_adv, use_dask=False)
+
+    mask = np.ones(cube.shape, dtype=bool)
+    mask[1, 0, 0] = False
+    mask[:, 1, 1] = False
+    cube = cube.with_mask(mask)
+
+    inaxis = cube.spectral_axis
+    step = (inaxis[1] - inaxis[0]) / 3.
+    sg = inaxis[0] - step + np.arange(12) * step
+
+    result = cube.spectral_interpolate(spectral_grid=sg, fill_value=-1,
+                                       suppress_smooth_warning=True,
+                                       num_cores=num_cores)
+
+    filled = cube.filled_data[:].value
+    expected = np.empty((sg.size,) + cube.shape[1:])
+    for iy, ix in np.ndindex(cube.shape[1:]):
+        if mask[:, iy, ix].any():
+            expected[:, iy, ix] = np.interp(sg.value, inaxis.value,
+                                            filled[:, iy, ix],
+                                            left=-1, right=-1)
+        else:
+            expected[:, iy, ix] = np.nan
+
+    np.testing.assert_allclose(result.unmasked_data[:].value, expected)
+    assert not result.mask.include()[:, 1, 1].any()
+    assert result.mask.include()[:, 0, 1].all()
+
+
 def test_spectral_interpolate_fail(data_522_delta_beams, use_dask):
 
     cube, data = cube_and_raw(data_522_delta_beams, use_dask=use_dask)
@@ -290,6 +387,52 @@ def test_spectral_interpolate_reversed(data_522_delta, use_dask):
     np.testing.assert_almost_equal(sg.value, result.spectral_axis.value)
 
 
+def test_spectral_resample(use_dask):
+
+    cube, _ = utilities.generate_gaussian_cube(shape=(20, 5, 4), noise=0.1,
+                                               use_dask=use_dask)
+    mask = np.ones(cube.shape, dtype='bool')
+    mask[3:6, 2, 2] = False
+    masked_cube = cube.with_mask(mask)
+
+    # An integer factor averages blocks of channels, like downsample_axis
+    result = masked_cube.spectral_resample(3)
+    expected = masked_cube.downsample_axis(3, axis=0)
+    assert result.shape == expected.shape
+    np.testing.assert_allclose(result.unitless_filled_data[:],
+                               expected.unitless_filled_data[:])
+    np.testing.assert_allclose(result.spectral_axis.value,
+                               expected.spectral_axis.value)
+
+    # Smoothing and interpolation in one pass match the two-step result
+    # away from the edges
+    kernel = convolution.Gaussian1DKernel(1)
+    grid = cube.spectral_axis[2:18:2]
+    result = cube.spectral_resample(grid, kernel=kernel)
+    expected = cube.spectral_smooth(kernel).spectral_interpolate(grid)
+    np.testing.assert_allclose(result.unitless_filled_data[1:-1],
+                               expected.unitless_filled_data[1:-1])
+    np.testing.assert_allclose(result.spectral_axis.value, grid.value)
+
+    result = cube.spectral_resample(grid[::-1], kernel=kernel)
+    np.testing.assert_allclose(result.spectral_axis.value, grid[::-1].value)
+    np.testing.assert_allclose(result.unitless_filled_data[::-1][1:-1],
+                               expected.unitless_filled_data[1:-1])
+
+    with pytest.raises(ValueError, match="positive integer"):
+        cube.spectral_resample(1.5)
+
+
+def test_spectral_resample_fail(data_522_delta_beams, use_dask):
+
+    cube, data = cube_and_raw(data_522_delta_beams, use_dask=use_dask)
+
+    with pytest.raises(AttributeError,
+                       match=("VaryingResolutionSpectralCubes can't be "
+                              "spectrally resampled.")):
+        cube.spectral_resample(2)
+
+
 def test_convolution_2D(data_55_delta):
 
     proj, hdu = load_projection(data_55_delta)
@@ -436,6 +579,70 @@ def test_downsample_wcs(use_memmap, data_255):
     np.testing.assert_almost_equal(xpixnew_ypixnew, (0.75, 0.75))
 
 
+@pytest.mark.parametrize('use_memmap', (True,False))
+def test_downsample_multiple_axes(use_memmap, data_255, monkeypatch):
+
+    # Use several slabs of output channels
+    monkeypatch.setattr(cube_utils, 'MEMORY_THRESHOLD', 1000)
+
+    cube, data = cube_and_raw(data_255, use_dask=False)
+    cube = cube.with_mask(cube > 0.2 * cube.unit)
+
+    dscube = cube.downsample_axis(factor=(1, 2, 2), axis=(0, 1, 2),
+                                  use_memmap=use_memmap)
+    wcscube = (cube
+               .downsample_axis(factor=2, axis=1, use_memmap=use_memmap)
+               .downsample_axis(factor=2, axis=2, use_memmap=use_memmap))
+
+    # The incomplete blocks at the edges are averaged over fewer pixels
+    padded = np.pad(cube.filled_data[:].value, ((0, 0), (0, 1), (0, 1)),
+                    mode='constant', constant_values=np.nan)
+    expected = np.nanmean(padded.reshape(2, 3, 2, 3, 2), axis=(2, 4))
+
+    assert dscube.shape == (2, 3, 3)
+    np.testing.assert_almost_equal(dscube.filled_data[:].value, expected)
+    np.testing.assert_equal(dscube.mask.include(), np.isfinite(expected))
+    assert dscube.wcs.wcs.compare(wcscube.wcs.wcs)
+
+    # The input dtype is preserved and a generic estimator is supported
+    cube32 = cube._new_cube_with(data=data.astype('float32'))
+    dscube = cube32.downsample_axis(2, axis=(1, 2), estimator=np.nansum,
+                                    truncate=True, use_memmap=use_memmap)
+    assert dscube.filled_data[:].dtype == np.float32
+    np.testing.assert_allclose(dscube.filled_data[:].value,
+                               np.nansum(cube.filled_data[:, :4, :4].value
+                                         .reshape(2, 2, 2, 2, 2),
+                                         axis=(2, 4)), rtol=1e-6)
+
+    dscube = cube.downsample_axis(2, axis=(1, 2), use_memmap=use_memmap,
+                                  estimator=lambda x, axis: np.nanmedian(x, axis=axis))
+    np.testing.assert_almost_equal(dscube[:, -1, -1].value,
+                                   np.nanmedian(cube.filled_data[:, 4, 4].value
+                                                .reshape(2, 1), axis=1))
+
+    with pytest.raises(ValueError, match="one value per axis"):
+        cube.downsample_axis((2, 2), axis=(0, 1, 2))
+
+
+def test_downsample_huge(data_255, monkeypatch):
+
+    cube, data = cube_and_raw(data_255, use_dask=False)
+
+    monkeypatch.setattr(cube_utils, 'MEMORY_THRESHOLD', 10)
+    assert cube._is_huge
+
+    # the memory-mapped output is reduced a slab at a time
+    dscube = cube.downsample_axis(2, axis=0)
+    assert dscube.shape == (1, 5, 5)
+
+    with pytest.raises(ValueError, match="use_memmap"):
+        cube.downsample_axis(2, axis=0, use_memmap=False)
+
+    cube.allow_huge_operations = True
+    dscube = cube.downsample_axis(2, axis=0, use_memmap=False)
+    assert dscube.shape == (1, 5, 5)
+
+
 @pytest.mark.skipif('not tracemallocOK or (sys.version_info.major==3 and sys.version_info.minor<6) or not NPY_VERSION_CHECK')
 def test_reproject_3D_memory():
 
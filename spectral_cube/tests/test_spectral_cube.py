@@ -110,9 +110,15 @@ def test_arithmetic_warning(data_vda_jybeam_lower, recwarn, use_dask):
 
     assert not cube._is_huge
 
-    # make sure the small cube raises a warning about loading into memory
-    with pytest.warns(UserWarning, match='requires loading the entire'):
-        cube + 5*cube.unit
+    if use_dask:
+        # make sure the small cube raises a warning about loading into memory
+        with pytest.warns(UserWarning, match='requires loading the entire'):
+            cube + 5*cube.unit
+    else:
+        # arithmetic on numpy-backed cubes is lazy
+        with warnings.catch_warnings():
+            warnings.simplefilter("error", utils.PossiblySlowWarning)
+            cube + 5*cube.unit
 
 
 def test_huge_disallowed(data_vda_jybeam_lower, use_dask):
@@ -131,10 +137,9 @@ def test_huge_disallowed(data_vda_jybeam_lower, use_dask):
 
         assert cube._is_huge
 
-        with pytest.raises(ValueError, match='entire cube into memory'):
-            cube + 5*cube.unit
-
         if use_dask:
+            with pytest.raises(ValueError, match='entire cube into memory'):
+                cube + 5*cube.unit
             with pytest.raises(ValueError, match='entire cube into memory'):
                 cube.mad_std()
         else:
@@ -521,6 +526,43 @@ class TestArithmetic(object):
         assert c2.unit == u.K
         self.c1 = self.d1 = None
 
+    def test_lazy_expression(self, use_dask, monkeypatch):
+        from .. import cube_utils
+        from .._arithmetic import LazyArithmeticArray, FilledData
+
+        # evaluate one channel at a time
+        monkeypatch.setattr(cube_utils, 'MEMORY_THRESHOLD',
+                            10 * self.d1[0].size * 8)
+
+        masked = self.c1.with_mask(self.c1 > 0.3 * u.K)
+        dmasked = np.where(self.d1 > 0.3, self.d1, np.nan)
+        rms = np.arange(1, 1 + self.d1[0].size).reshape(self.d1.shape[1:])
+
+        c2 = (masked - self.c1 * 0.5) * 2 / (rms * u.K) + 1 * u.one
+        d2 = (dmasked - self.d1 * 0.5) * 2 / rms + 1
+
+        assert c2.unit == u.one
+        assert isinstance(c2._data, LazyArithmeticArray) != use_dask
+        assert_allclose(c2.filled_data[:].value, d2)
+        assert_allclose(c2.unitless_filled_data[1:, 1, :], d2[1:, 1, :])
+        assert_allclose(c2[:, 0, 1].value, d2[:, 0, 1])
+        assert_allclose(c2.hdu.data, d2)
+
+        # masks built from the lazy cube are lazy too
+        assert_allclose((c2 > 1.5 * u.one).include(),
+                        np.nan_to_num(d2) > 1.5)
+
+        # scalar operations on a masked cube read its filled data lazily
+        c3 = masked * 2
+        assert c3.unit == u.K
+        if not use_dask:
+            assert isinstance(c3._data._operands[0], FilledData)
+            assert c3._data.dtype == np.float64
+        assert_allclose(c3.filled_data[:].value, dmasked * 2)
+        assert_allclose(c3.unitless_filled_data[:, 1, :], dmasked[:, 1, :] * 2)
+
+        self.c1 = self.d1 = None
+
 
 
 class TestFilters(BaseTest):
@@ -1111,6 +1153,42 @@ def test_slice_wcs_reversal(data_advs, use_dask):
                                   cube.spatial_coordinate_map[1].value)
 
 
+def test_slice_view(data_advs, use_dask):
+    from ..masks import SlicedMask
+    from ..wcs_utils import slice_wcs, check_equality
+
+    cube, data = cube_and_raw(data_advs, use_dask=use_dask)
+    data = cube.unmasked_data[:].value
+    cube = cube.with_mask(cube > 0.5 * cube.unit)
+
+    view1 = (slice(None), slice(1, None), slice(None, None, 2))
+    view2 = (slice(1, None), slice(None), slice(1, None))
+    sub = cube[view1][view2]
+
+    # chained slices are applied to the original cube in one step and share
+    # its data and mask
+    assert sub._view_state.base.data is cube._data
+    assert sub._view_state.view == (slice(1, 2, 1), slice(1, 3, 1),
+                                    slice(2, 4, 2))
+    if not use_dask:
+        assert np.shares_memory(sub._data, cube._data)
+    assert isinstance(sub.mask, SlicedMask)
+    assert sub.mask._mask is cube.mask
+
+    expected = data[view1][view2]
+    assert sub.shape == expected.shape
+    assert_allclose(sub.filled_data[:].value,
+                    np.where(expected > 0.5, expected, np.nan))
+    assert check_equality(sub.wcs,
+                          slice_wcs(slice_wcs(cube.wcs, view1,
+                                              shape=cube.shape),
+                                    view2, shape=data[view1].shape))
+    assert sub.mask._wcs is sub.wcs
+
+    assert len(sub.meta['slice']) == 2
+    assert 'slice' not in cube.meta
+
+
 def test_spectral_slice_preserve_units(data_advs, use_dask):
     cube, data = cube_and_raw(data_advs, use_dask=use_dask)
     cube = cube.with_spectral_unit(u.km/u.s)
@@ -1332,6 +1410,52 @@ def test_preserves_header_meta_values(data_advs, use_dask):
         assert 'too_long_keyword=too_long_information' in ldo.header['COMMENT']
 
 
+def test_cached_metadata(data_advs, use_dask):
+
+    cube, data = cube_and_raw(data_advs, use_dask=use_dask)
+
+    # each access returns a copy of the cached header
+    header = cube.header
+    header['FOO'] = 'bar'
+    assert 'FOO' not in cube.header
+
+    # the header is rebuilt when its inputs change
+    cube.meta['foo'] = 'baz'
+    assert cube.header['FOO'] == 'baz'
+    cube._header['OBJECT'] = 'TestName'
+    assert cube.header['OBJECT'] == 'TestName'
+    assert cube._nowcs_header['OBJECT'] == 'TestName'
+    cube._unit = u.Jy
+    assert cube.header['BUNIT'] == 'Jy'
+
+    # each access returns a copy of the cached spectral axis
+    spectral_axis = cube.spectral_axis
+    spectral_axis += 1 * spectral_axis.unit
+    assert_quantity_allclose(cube.spectral_axis,
+                             spectral_axis - 1 * spectral_axis.unit)
+    spectral_axis = cube.spectral_axis
+    kms_cube = cube.with_spectral_unit(u.km/u.s)
+    assert kms_cube.spectral_axis.unit == u.km/u.s
+
+    assert cube._celestial_wcs is cube._celestial_wcs
+    assert cube._celestial_wcs.naxis == 2
+
+    # cubes derived with the same WCS and metadata share the cached values
+    masked = cube.with_mask(cube > 0 * cube.unit).with_fill_value(0)
+    assert masked.wcs is cube.wcs
+    assert masked._metadata_cache is cube._metadata_cache
+    assert_quantity_allclose(masked.spectral_axis, spectral_axis)
+    assert masked.header == cube.header
+
+    # modifying the WCS in-place invalidates the cached values
+    crval3 = cube.header['CRVAL3']
+    cube.wcs.wcs.crval[2] = 5000
+    cube.wcs.wcs.set()
+    assert_quantity_allclose(cube.spectral_axis, cube.world[:, 0, 0][0])
+    assert cube.spectral_axis[0] != spectral_axis[0]
+    assert cube.header['CRVAL3'] != crval3
+
+
 
 @pytest.mark.parametrize(('func', 'filename'),
                          itertools.product(('sum','std','max','min','mean'),
@@ -1608,6 +1732,11 @@ def test_multibeam_slice(data_vda_beams, use_dask):
     np.testing.assert_almost_equal(scube.beams[1].major.value, 0.3)
     np.testing.assert_almost_equal(scube.beams[1].minor.value, 0.2)
 
+    # slicing a slice gets the beams of the original channels
+    sscube = scube[1:,:,:]
+    assert len(sscube.beams) == 1
+    assert sscube.beams[0] == scube.beams[1]
+
     flatslice = cube[0,:,:]
 
     np.testing.assert_almost_equal(flatslice.header['BMAJ'],
@@ -1865,6 +1994,37 @@ def test_varyres_moment_logic_issue364(data_vda_beams, use_dask):
     assert_quantity_allclose(m0.meta['beam'].major, 0.35*u.arcsec)
 
 
+def test_varyres_cached_average_beam(data_vda_beams, use_dask):
+    cube, data = cube_and_raw(data_vda_beams, use_dask=use_dask)
+
+    # the spectral reductions are wrapped once on the class, not on every
+    # attribute lookup
+    assert 'moment' not in vars(cube)
+    assert type(cube).moment.handles_beam_areas
+
+    cube.beam_threshold = 1.0
+
+    with pytest.warns(UserWarning, match="Arithmetic beam averaging is being performed"):
+        m0 = cube.moment0()
+
+    # the average beam is cached, but the warning is still raised
+    with pytest.warns(UserWarning, match="Arithmetic beam averaging is being performed"):
+        beam = cube.average_beams(1.0, warn=True)
+    assert beam is m0.meta['beam']
+
+    # changing the good beams invalidates the cached average
+    cube.goodbeams_mask = np.array([False, True, True, False])
+    with pytest.warns(UserWarning, match="Arithmetic beam averaging is being performed"):
+        beam = cube.average_beams(1.0, warn=True)
+    assert beam is not m0.meta['beam']
+    assert beam == cube[1:3].average_beams(1.0)
+
+    # the beam checks still apply to a different threshold
+    cube.goodbeams_mask = np.ones(4, dtype='bool')
+    with pytest.raises(ValueError, match="Beam srs differ"):
+        cube.average_beams(0.01)
+
+
 def test_mask_bad_beams(data_vda_beams, use_dask):
     """
     Prior to #543, this tested two different scenarios of beam masking.  After
@@ -1930,6 +2090,105 @@ def test_convolve_to(data_vda_beams, use_dask):
                                  nan_treatment='fill')
 
 
+def test_convolve_to_fft_engine():
+    # The batched FFT engine should match per-channel convolve_fft,
+    # including the handling of masked and NaN pixels
+    from astropy.convolution import convolve_fft
+    from .utilities import generate_gaussian_cube
+
+    cube, _ = generate_gaussian_cube(shape=(8, 12, 9), noise=0.1)
+    mask = np.ones(cube.shape, dtype='bool')
+    mask[2, 3:5, 4] = False
+    mask[5] = False
+    cube = cube.with_mask(mask)
+
+    target = Beam(5 * u.arcsec)
+    pixscale = 1 * u.arcsec
+    kernel = target.deconvolve(cube.beam).as_kernel(pixscale)
+
+    for kwargs in ({}, {'preserve_nan': True}, {'nan_treatment': 'fill'}):
+        convolved = cube.convolve_to(target, **kwargs)
+
+        filled = cube.filled_data[:].value
+        expected = np.array([convolve_fft(img, kernel, normalize_kernel=True,
+                                          **kwargs) for img in filled])
+        # fully masked channels are not convolved
+        expected[5] = filled[5]
+
+        assert convolved.beam == target
+        np.testing.assert_allclose(convolved.unitless_filled_data[:],
+                                   np.where(mask, expected, np.nan),
+                                   atol=1e-10)
+
+    smoothed = cube.spatial_smooth(kernel, convolve=convolve_fft, num_cores=2)
+    np.testing.assert_allclose(smoothed.unitless_filled_data[:],
+                               cube.convolve_to(target).unitless_filled_data[:],
+                               atol=1e-10)
+
+
+def test_convolve_to_huge(monkeypatch):
+    # The convolved cube is written to a memory map, so large cubes are only
+    # refused if the output is to be held in memory
+    from .. import cube_utils
+    from .utilities import generate_gaussian_cube
+
+    cube, _ = generate_gaussian_cube(shape=(4, 12, 9), noise=0.1)
+    target = Beam(5 * u.arcsec)
+
+    monkeypatch.setattr(cube_utils, 'MEMORY_THRESHOLD', 10)
+    assert cube._is_huge
+
+    convolved = cube.convolve_to(target)
+    assert convolved.beam == target
+
+    with pytest.raises(ValueError, match="use_memmap"):
+        cube.convolve_to(target, use_memmap=False)
+
+    cube.allow_huge_operations = True
+    in_memory = cube.convolve_to(target, use_memmap=False)
+    np.testing.assert_allclose(in_memory.unitless_filled_data[:],
+                               convolved.unitless_filled_data[:])
+
+
+def test_convolve_to_beam_groups(data_vda_beams, use_dask):
+    from astropy.convolution import convolve_fft
+    from astropy.wcs.utils import proj_plane_pixel_area
+    from .._convolution import group_beam_kernels
+
+    cube, data = cube_and_raw(data_vda_beams, use_dask=use_dask)
+
+    beams = Beams(major=[0.2, 0.2, 0.3, 0.2001] * u.arcsec,
+                  minor=[0.1, 0.1, 0.2, 0.1] * u.arcsec,
+                  pa=[0, 0, 30, 0] * u.deg)
+    cube = cube._new_cube_with(beams=beams)
+
+    target = Beam(0.5 * u.arcsec)
+    pixscale = proj_plane_pixel_area(cube.wcs.celestial)**0.5 * u.deg
+
+    kernels, groups = group_beam_kernels(target, beams, pixscale)
+    assert len(kernels) == 3
+    assert_array_equal(groups, [0, 0, 1, 2])
+
+    kernels, groups = group_beam_kernels(target, beams, pixscale,
+                                         tolerance=1e-2)
+    assert len(kernels) == 2
+    assert_array_equal(groups, [0, 0, 1, 0])
+
+    kernels, groups = group_beam_kernels(target, beams, pixscale,
+                                         goodbeams=[True, False, True, True])
+    assert_array_equal(groups, [0, -1, 1, 2])
+
+    convolved = cube.convolve_to(target)
+    filled = cube.unitless_filled_data[:]
+    expected = [convolve_fft(img, target.deconvolve(bm).as_kernel(pixscale),
+                             normalize_kernel=True)
+                for img, bm in zip(filled, beams)]
+
+    assert convolved.beam == target
+    np.testing.assert_allclose(convolved.unitless_filled_data[:], expected,
+                               atol=1e-10)
+
+
 def test_convolve_to_with_bad_beams(data_vda_beams, use_dask):
     cube, data = cube_and_raw(data_vda_beams, use_dask=use_dask)
 
@@ -2042,6 +2301,93 @@ def test_caching(data_adv, use_dask):
                                    cube.world_extrema.value)
 
 
+def test_separable_world(data_adv, use_dask):
+
+    cube, data = cube_and_raw(data_adv, use_dask=use_dask)
+
+    assert cube._world_is_separable()
+
+    views = [(slice(None),) * 3, (0, slice(None), slice(None)),
+             (slice(None), 0, 0), (slice(None, None, 2), 1, slice(1, 3)),
+             (1, 2, 1)]
+
+    fast = [cube.world[view] for view in views]
+    fast_map = cube.spatial_coordinate_map
+    fast_pix_cen = cube._pix_cen()
+
+    # the full cube of coordinates is a view of the cached axes
+    assert not fast[0][0].flags.writeable
+    assert fast[0][0].base is not None
+
+    # compare against direct evaluation of every pixel
+    cube._cache.clear()
+    cube._world_is_separable = lambda: False
+    for view, world in zip(views, fast):
+        for w1, w2 in zip(world, cube.world[view]):
+            assert w1.unit == w2.unit
+            np.testing.assert_allclose(w1.value, w2.value)
+    for w1, w2 in zip(fast_map, cube.spatial_coordinate_map):
+        np.testing.assert_allclose(w1, w2)
+    for p1, p2 in zip(fast_pix_cen, cube._pix_cen()):
+        np.testing.assert_allclose(p1, p2)
+
+
+def test_separable_world_inplace_wcs(data_adv, use_dask):
+
+    cube, data = cube_and_raw(data_adv, use_dask=use_dask)
+
+    cube.world[:, :, :]
+    spectral_axis = cube.spectral_axis
+
+    cube.wcs.wcs.crval[2] = 5000
+    cube.wcs.wcs.set()
+
+    nspec = cube.shape[0]
+    expected = cube.wcs.sub([3]).wcs_pix2world(np.arange(nspec), 0)[0]
+    expected = u.Quantity(expected, cube.wcs.wcs.cunit[2])
+
+    assert not np.allclose(expected.value, spectral_axis.to_value(expected.unit))
+    np.testing.assert_allclose(cube.world[:, 0, 0][0].to_value(expected.unit),
+                               expected.value)
+    np.testing.assert_allclose(cube.spectral_axis.to_value(expected.unit),
+                               expected.value)
+
+
+def test_separable_smoothing(use_dask):
+    # Separable kernels are applied as 1D passes; the results should match
+    # astropy's convolve, including the NaN-aware normalization
+    from astropy.convolution import convolve, Gaussian1DKernel, Box2DKernel
+    from .._convolution import separable_factors
+    from .utilities import generate_gaussian_cube
+
+    assert separable_factors(Gaussian2DKernel(1.5, 2.5)) is not None
+    assert separable_factors(Box2DKernel(3)) is not None
+    assert separable_factors(Tophat2DKernel(2)) is None
+    assert separable_factors(np.ones((2, 3))) is None
+
+    cube, _ = generate_gaussian_cube(shape=(20, 9, 8), noise=0.1,
+                                     use_dask=use_dask)
+    mask = np.ones(cube.shape, dtype='bool')
+    mask[3:6, 2, 2] = False
+    mask[:, 4, 4] = False
+    cube = cube.with_mask(mask)
+    filled = cube.filled_data[:].value
+
+    kernel = Gaussian2DKernel(1.2, 2.)
+    smoothed = cube.spatial_smooth(kernel)
+    expected = np.array([convolve(img, kernel) for img in filled])
+    assert_allclose(smoothed.unitless_filled_data[:],
+                    np.where(mask, expected, np.nan))
+
+    kernel = Gaussian1DKernel(2)
+    smoothed = cube.spectral_smooth(kernel)
+    expected = np.apply_along_axis(convolve, 0, filled, kernel)
+    # fully masked spectra are left unchanged
+    expected[:, 4, 4] = filled[:, 4, 4]
+    assert_allclose(smoothed.unitless_filled_data[:],
+                    np.where(mask, expected, np.nan))
+
+
 def test_spatial_smooth_g2d(data_adv, use_dask):
 
     cube, data = cube_and_raw(data_adv, use_dask=use_dask)
@@ -2156,6 +2502,266 @@ def test_spectral_smooth_median_4cores(data_adv, use_dask):
 
     np.testing.assert_almost_equal(cube_spectral_median[:,1,1].value, result)
 
+@pytest.mark.parametrize('num_cores', (None, 3))
+def test_spectral_smooth_slabs(num_cores, monkeypatch):
+
+    # The slab-based filters should match filtering each spectrum separately
+    from scipy import ndimage
+    from astropy.convolution import convolve, Gaussian1DKernel
+    from .. import cube_utils
+    from .utilities import generate_gaussian_cube
+
+    cube, _ = generate_gaussian_cube(shape=(20, 9, 8), noise=0.1)
+    mask = np.ones(cube.shape, dtype='bool')
+    mask[3:6, 2, 2] = False
+    mask[:, 4, 4] = False
+    cube = cube.with_mask(mask)
+    filled = cube.filled_data[:].value
+
+    # force several slabs
+    monkeypatch.setattr(cube_utils, 'MEMORY_THRESHOLD', 2000)
+    median = cube.spectral_smooth_median(5, num_cores=num_cores)
+    smoothed = cube.spectral_smooth(Gaussian1DKernel(2), num_cores=num_cores)
+
+    expected = np.apply_along_axis(ndimage.median_filter, 0, filled, size=5)
+    expected[:, 4, 4] = filled[:, 4, 4]
+    assert_allclose(median.unitless_filled_data[:],
+                    np.where(mask, expected, np.nan))
+
+    expected = np.apply_along_axis(convolve, 0, filled, Gaussian1DKernel(2))
+    expected[:, 4, 4] = filled[:, 4, 4]
+    assert_allclose(smoothed.unitless_filled_data[:],
+                    np.where(mask, expected, np.nan))
+
+
+@pytest.mark.parametrize(('use_dask', 'num_cores'),
+                         ((False, None), (False, 2), (True, None)))
+def test_sigma_clip_spectrally(use_dask, num_cores, monkeypatch):
+
+    # The slab-based clipper should match astropy's sigma_clip along axis 0
+    from astropy.stats import sigma_clip
+    from .. import cube_utils
+    from .utilities import generate_gaussian_cube
+
+    cube, _ = generate_gaussian_cube(shape=(30, 9, 8), noise=0.1, amp=0.,
+                                     use_dask=use_dask)
+    data = cube.unitless_filled_data[:].copy()
+    data[5, 1, 1] = 3.
+    data[[2, 7], 3, 3] = -2., 1.
+    mask = np.ones(cube.shape, dtype='bool')
+    mask[:, 4, 4] = False
+    mask[10, 2, 2] = False
+    cube = cube._new_cube_with(data=data).with_mask(mask)
+    filled = np.where(mask, data, np.nan)
+
+    # force several slabs
+    monkeypatch.setattr(cube_utils, 'MEMORY_THRESHOLD', 2000)
+
+    kwargs = {} if use_dask else {'num_cores': num_cores}
+    for clip_kwargs in ({}, {'sigma_upper': 2, 'maxiters': None,
+                             'cenfunc': 'mean'}, {'copy': True}):
+        clipped = cube.sigma_clip_spectrally(2.5, **clip_kwargs, **kwargs)
+
+        expected = sigma_clip(filled, sigma=2.5, axis=0, **clip_kwargs).filled(np.nan)
+        assert_allclose(clipped.unitless_filled_data[:], expected)
+
+    assert np.isnan(clipped.unitless_filled_data[:][5, 1, 1])
+
+
+@pytest.mark.parametrize(('use_dask', 'num_cores'),
+                         ((False, None), (False, 2), (True, None)))
+def test_subtract_baseline(use_dask, num_cores, monkeypatch):
+
+    from .. import cube_utils
+    from .utilities import generate_gaussian_cube
+
+    cube, _ = generate_gaussian_cube(shape=(40, 6, 5), sigma=2., noise=0.01,
+                                     vel_surface=np.zeros((6, 5)),
+                                     use_dask=use_dask)
+    channels = np.linspace(-1, 1, cube.shape[0])
+    rng = np.random.RandomState(0)
+    coeffs = rng.uniform(-1, 1, (3,) + cube.shape[1:])
+    baselines = np.polynomial.polynomial.polyval(channels, coeffs).transpose(2, 0, 1)
+    data = cube.unitless_filled_data[:] + baselines
+
+    mask = np.ones(cube.shape, dtype='bool')
+    mask[:5, 1, 1] = False
+    mask[[0, 3, 8], 2, 3] = False
+    mask[:, 4, 4] = False
+    cube = cube._new_cube_with(data=data).with_mask(mask)
+
+    # force several slabs
+    monkeypatch.setattr(cube_utils, 'MEMORY_THRESHOLD', 2000)
+
+    spectral_axis = cube.spectral_axis
+    window = (spectral_axis[12], spectral_axis[27])
+    fit_channels = np.ones(cube.shape[0], dtype='bool')
+    fit_channels[12:28] = False
+
+    kwargs = {} if use_dask else {'num_cores': num_cores}
+    subtracted, fit_coeffs = cube.subtract_baseline(2, exclude=[window],
+                                                    return_coefficients=True,
+                                                    **kwargs)
+
+    assert fit_coeffs.shape == (3,) + cube.shape[1:]
+    assert fit_coeffs.unit == cube.unit
+    # With noise, the fit coefficients are close to the true ones
+    assert_allclose(fit_coeffs.value[:, :4], coeffs[:, :4], atol=0.05)
+    assert np.all(np.isnan(fit_coeffs.value[:, 4, 4]))
+
+    for jj, ii in ((0, 0), (1, 1), (2, 3)):
+        good = fit_channels & mask[:, jj, ii]
+        expected = np.polyfit(channels[good], data[good, jj, ii], 2)[::-1]
+        assert_allclose(fit_coeffs.value[:, jj, ii], expected, atol=1e-10)
+        assert_allclose(subtracted.unitless_filled_data[:, jj, ii],
+                        np.where(mask[:, jj, ii],
+                                 data[:, jj, ii] -
+                                 np.polynomial.polynomial.polyval(channels,
+                                                                  expected),
+                                 np.nan), atol=1e-10)
+
+    with pytest.raises(ValueError, match="Each excluded window"):
+        cube.subtract_baseline(1, exclude=[(1 * u.km / u.s,)])
+
+    # velocity windows on a frequency cube use the cube's convention and
+    # rest frequency (the windows are widened by a fraction of a channel to
+    # avoid rounding at their edges)
+    freq_cube = cube.with_spectral_unit(u.GHz, rest_value=100 * u.GHz)
+    margin = np.abs(np.diff(spectral_axis[:2])) * 0.1
+    vel_window = (spectral_axis[12] - margin, spectral_axis[27] + margin)
+    assert_allclose(freq_cube._baseline_channels([vel_window]), fit_channels)
+    freq_subtracted = freq_cube.subtract_baseline(2, exclude=[vel_window],
+                                                  **kwargs)
+    assert_allclose(freq_subtracted.unitless_filled_data[:],
+                    subtracted.unitless_filled_data[:], atol=1e-10)
+
+    # and frequency windows on a velocity cube with a rest frequency
+    vel_cube = freq_cube.with_spectral_unit(u.km / u.s,
+                                            velocity_convention='radio')
+    # (the frequencies decrease with channel)
+    freq_axis = freq_cube.spectral_axis
+    margin = np.abs(np.diff(freq_axis[:2])) * 0.1
+    freq_window = (freq_axis[27] - margin, freq_axis[12] + margin)
+    assert_allclose(vel_cube._baseline_channels([freq_window]), fit_channels)
+
+
+@pytest.mark.parametrize('num_cores', (None, 2))
+def test_fit_gaussians(use_dask, num_cores, monkeypatch):
+
+    from astropy.modeling import models, fitting
+    from .. import cube_utils
+    from .utilities import generate_gaussian_cube
+
+    cube, means = generate_gaussian_cube(shape=(40, 6, 5), sigma=3., amp=2.,
+                                         noise=0.05, use_dask=use_dask)
+    means = means.to(u.km / u.s).value
+
+    mask = np.ones(cube.shape, dtype='bool')
+    mask[:5, 1, 1] = False
+    mask[:, 4, 4] = False
+    cube = cube.with_mask(mask)
+
+    # force several slabs
+    monkeypatch.setattr(cube_utils, 'MEMORY_THRESHOLD', 40000)
+
+    kwargs = {} if use_dask else {'num_cores': num_cores}
+    parameters, uncertainties = cube.fit_gaussians(**kwargs)
+
+    assert list(parameters) == ['amplitude_0', 'mean_0', 'stddev_0']
+    assert parameters['amplitude_0'].unit == cube.unit
+    assert parameters['mean_0'].unit == cube.spectral_axis.unit
+    assert parameters['mean_0'].shape == cube.shape[1:]
+
+    fit_means = parameters['mean_0'].to(u.km / u.s).value
+    assert np.isnan(fit_means[4, 4])
+    assert np.isnan(uncertainties['mean_0'][4, 4])
+    fit_means[4, 4] = means[4, 4]
+    assert_allclose(fit_means, means, atol=0.2)
+
+    # The same fits and uncertainties as astropy's fitter
+    spectral_axis = cube.spectral_axis.to(u.km / u.s).value
+    data = cube.unitless_filled_data[:]
+    fitter = fitting.LevMarLSQFitter()
+    for jj, ii in ((0, 0), (1, 1), (5, 2)):
+        good = mask[:, jj, ii]
+        model = fitter(models.Gaussian1D(2, means[jj, ii], 3),
+                       spectral_axis[good], data[good, jj, ii])
+        errors = np.sqrt(np.diag(fitter.fit_info['param_cov']))
+        for index, name in enumerate(('amplitude_0', 'mean_0', 'stddev_0')):
+            unit = cube.unit if index == 0 else u.km / u.s
+            assert_allclose(parameters[name][jj, ii].to(unit).value,
+                            model.parameters[index], rtol=1e-5)
+            assert_allclose(uncertainties[name][jj, ii].to(unit).value,
+                            errors[index], rtol=1e-3)
+
+    # Two components, with guesses for every spectrum
+    cube, _ = generate_gaussian_cube(shape=(40, 3, 2), sigma=3., amp=2.,
+                                     noise=0.05,
+                                     vel_surface=np.full((3, 2), -6.),
+                                     use_dask=use_dask)
+    data = cube.unitless_filled_data[:]
+    twocomp = cube._new_cube_with(data=data + np.roll(data, 12, axis=0) / 2)
+
+    spectral_unit = cube.spectral_axis.unit
+    dv = np.abs(np.diff(cube.spectral_axis[:2]))[0]
+    guesses = np.array([2, (-5 * u.km / u.s).to_value(spectral_unit),
+                        2 * dv.value,
+                        1, (5 * u.km / u.s).to_value(spectral_unit),
+                        2 * dv.value])
+    parameters, _ = twocomp.fit_gaussians(ncomponents=2,
+                                          guesses=np.tile(guesses[:, None, None],
+                                                          (1,) + cube.shape[1:]))
+    assert list(parameters)[3:] == ['amplitude_1', 'mean_1', 'stddev_1']
+    assert_allclose(parameters['mean_0'].to(u.km / u.s).value, -6, atol=0.2)
+    assert_allclose(parameters['mean_1'].to(u.km / u.s).value,
+                    -6 + 12 * dv.to(u.km / u.s).value, atol=0.3)
+    assert_allclose(parameters['amplitude_1'].value, 1, atol=0.1)
+    assert_allclose(parameters['stddev_1'].to(u.km / u.s).value, 3, atol=0.3)
+
+
+def test_peak_map(use_dask):
+
+    from .utilities import generate_gaussian_cube
+
+    cube, means = generate_gaussian_cube(shape=(40, 6, 5), sigma=3., amp=2.,
+                                         use_dask=use_dask)
+    means = means.to(u.km / u.s).value
+
+    mask = np.ones(cube.shape, dtype='bool')
+    mask[:, 4, 4] = False
+    mask[18:22, 1, 1] = False
+    cube = cube.with_mask(mask)
+
+    data = cube.unitless_filled_data[:]
+    expected_index = np.nanargmax(np.where(mask, data, -np.inf), axis=0)
+    expected_index[4, 4] = -1
+
+    peak, channel, coordinate = cube.peak_map()
+
+    assert isinstance(peak, Projection)
+    assert peak.unit == cube.unit
+    assert coordinate.unit == cube.spectral_axis.unit
+    assert_array_equal(channel, expected_index)
+    assert_allclose(peak.value, cube.max(axis=0).value)
+    good = channel >= 0
+    assert_allclose(coordinate.value[good],
+                    cube.spectral_axis.value[channel[good]])
+    assert np.isnan(peak[4, 4]) and np.isnan(coordinate[4, 4])
+
+    # The refined peaks lie between the channels, at the true line centres
+    peak, refined_channel, coordinate = cube.peak_map(refine=True)
+    assert_array_equal(refined_channel, channel)
+    velocity = coordinate.to(u.km / u.s).value
+    centres = good & mask.all(axis=0)
+    assert_allclose(velocity[centres], means[centres], atol=0.05)
+    assert np.all(np.abs(velocity[centres] - means[centres]) <=
+                  np.abs(cube.spectral_axis.to(u.km / u.s).value[channel[centres]]
+                         - means[centres]) + 1e-10)
+    assert np.all(peak.value[centres] >= data[channel[centres],
+                                              np.nonzero(centres)[0],
+                                              np.nonzero(centres)[1]])
+
+
 def update_function():
     print("Update Function Call")
 
@@ -2363,3 +2969,54 @@ def test_minimal_subcube(use_dask):
     subcube = cube.minimal_subcube()
 
     assert subcube.shape == (3, 5, 2)
+
+
+def test_extract_spectra(use_dask):
+
+    from .utilities import generate_gaussian_cube
+    from astropy.wcs.utils import pixel_to_skycoord
+
+    cube, _ = generate_gaussian_cube(shape=(10, 6, 5), use_dask=use_dask)
+    data = cube.unmasked_data[:].value
+    from ..lower_dimensional_structures import SpectrumCollection
+
+    xpix = np.array([0, 2, 3])
+    ypix = np.array([1, 3, 2])
+
+    spectra = cube.extract_spectra((xpix, ypix))
+
+    assert isinstance(spectra, SpectrumCollection)
+    assert spectra.shape == (3, cube.shape[0])
+    assert spectra.unit == cube.unit
+    assert_quantity_allclose(spectra.spectral_axis, cube.spectral_axis)
+    for ii, (x, y) in enumerate(zip(xpix, ypix)):
+        np.testing.assert_allclose(spectra[ii].value, cube[:, y, x].value)
+        assert spectra.positions['x'][ii] == x
+        assert spectra.positions['y'][ii] == y
+
+    # (N, 2) arrays and sky coordinates give the same result
+    np.testing.assert_allclose(cube.extract_spectra(np.array([xpix, ypix]).T).value,
+                               spectra.value)
+    coords = pixel_to_skycoord(xpix, ypix, cube.wcs.celestial)
+    np.testing.assert_allclose(cube.extract_spectra(coords).value,
+                               spectra.value)
+
+    # circular aperture: the central pixel and its four neighbours
+    apspec = cube.extract_spectra(([1], [1]), aperture=1)
+    expected = np.mean([data[:, y, x] for y, x in
+                        [(0, 1), (1, 0), (1, 1), (1, 2), (2, 1)]], axis=0)
+    np.testing.assert_allclose(apspec[0].value, expected)
+    assert apspec.positions['npix'][0] == 5
+
+    # sizes can also be given as quantities in pixels
+    pixspec = cube.extract_spectra(([1], [1]), aperture=1 * u.pix)
+    np.testing.assert_allclose(pixspec[0].value, expected)
+    pixspec = cube.extract_spectra(([1], [1]),
+                                   aperture=(1 * u.pix, 1 * u.pix, 0 * u.deg))
+    np.testing.assert_allclose(pixspec[0].value, expected)
+
+    # an aperture entirely outside of the cube gives an all-NaN spectrum
+    apspec = cube.extract_spectra(([1, 100], [1, 100]), aperture=(1.5, 1, 30*u.deg))
+    assert np.all(np.isfinite(apspec[0].value))
+    assert np.all(np.isnan(apspec[1].value))
+    assert apspec.positions['npix'][1] == 0
@@ -219,3 +219,26 @@ def test_wcs_downsampling():
 
     nwcs = slice_wcs(wcs, slice(2, None, 4))
     assert nwcs.wcs.crpix[0] == 0.125
+
+
+def test_wcs_fingerprint():
+    from ..wcs_utils import wcs_fingerprint
+
+    wcs = WCS(naxis=3)
+    wcs.wcs.ctype = ['RA---TAN', 'DEC--TAN', 'VELO-LSR']
+    wcs.wcs.crval = [10, 20, 1000]
+
+    fp = wcs_fingerprint(wcs)
+    hash(fp)
+    assert wcs_fingerprint(wcs) is fp
+    assert wcs_fingerprint(wcs.deepcopy()) == fp
+
+    wcs2 = wcs.deepcopy()
+    wcs2.wcs.crval[2] = 1001
+    assert wcs_fingerprint(wcs2) != fp
+
+    # in-place modifications are detected
+    wcs.wcs.crval[2] = 1001
+    wcs.wcs.set()
+    assert wcs_fingerprint(wcs) != fp
+    assert wcs_fingerprint(wcs) == wcs_fingerprint(wcs2)
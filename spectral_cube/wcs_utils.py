@@ -3,6 +3,7 @@ from __future__ import print_function, absolute_import, division
 import numpy as np
 from astropy.wcs import WCS
 import warnings
+import weakref
 from astropy import units as u
 from astropy import log
 from astropy.wcs import InconsistentAxisTypesError
@@ -331,6 +332,96 @@ def slice_wcs(mywcs, view, shape=None, numpy_order=True,
 
     return wcs_new
 
+
+class LazySlicedWCS(object):
+    """
+    A WCS that is sliced with `slice_wcs` only when it is first needed.
+
+    Cubes made by slicing, and their masks, share one of these so that they
+    get the same `~astropy.wcs.WCS` object, and only if it is used.
+
+    Parameters
+    ----------
+    mywcs : `~astropy.wcs.WCS`
+        The WCS to slice
+    view : tuple
+        The slices to apply, in numpy order
+    naxis : list, optional
+        If given, set as the ``_naxis`` of the sliced WCS
+    kwargs : dict
+        Passed to `slice_wcs`
+    """
+
+    def __init__(self, mywcs, view, naxis=None, **kwargs):
+        self._parent = mywcs
+        self._view = view
+        self._naxis = naxis
+        self._kwargs = kwargs
+        self._wcs = None
+
+    @property
+    def wcs(self):
+        if self._wcs is None:
+            wcs_new = slice_wcs(self._parent, self._view, **self._kwargs)
+            if self._naxis is not None:
+                wcs_new._naxis = list(self._naxis)
+            self._wcs = wcs_new
+        return self._wcs
+
+def wcs_state(mywcs):
+    """
+    A snapshot of the parameters of a WCS, to tell whether it has been
+    modified in-place.  ``cunit`` is left out because reading it parses every
+    unit string, which costs far more than the rest;
+    `astropy.wcs.Wcsprm.set` converts the other parameters to the normalized
+    units anyway.
+
+    Parameters
+    ----------
+    mywcs : `astropy.wcs.WCS`
+        The WCS
+    """
+    wcsprm = mywcs.wcs
+    matrix = wcsprm.cd if wcsprm.has_cd() else wcsprm.pc
+    return (tuple(wcsprm.ctype),
+            wcsprm.crval.tobytes(), wcsprm.cdelt.tobytes(),
+            wcsprm.crpix.tobytes(), matrix.tobytes(),
+            wcsprm.restfrq, wcsprm.restwav, wcsprm.specsys)
+
+
+# Per-object memo of WCS fingerprints, stored with the `wcs_state` they were
+# computed from; entries disappear with their WCS
+_fingerprint_memo = weakref.WeakKeyDictionary()
+
+
+def wcs_fingerprint(wcs):
+    """
+    Return a hashable fingerprint of a WCS built from its ``to_header`` cards.
+
+    The fingerprint is memoised per WCS object, and only recomputed if the
+    WCS has been modified in-place since (as detected by `wcs_state`).  Two
+    WCSes with equal fingerprints have identical headers.
+
+    Parameters
+    ----------
+    wcs : `astropy.wcs.WCS`
+        The WCS to fingerprint
+    """
+    try:
+        memo_state, fingerprint = _fingerprint_memo[wcs]
+        if memo_state == wcs_state(wcs):
+            return fingerprint
+    except KeyError:
+        pass
+
+    fingerprint = tuple((card.keyword, card.value)
+                        for card in wcs.to_header().cards)
+    # ``to_header`` normalizes the WCS in-place, so take the state afterwards
+    _fingerprint_memo[wcs] = (wcs_state(wcs), fingerprint)
+
+    return fingerprint
+
+
 def check_equality(wcs1, wcs2, warn_missing=False,
                    ignore_keywords=['MJD-OBS', 'VELOSYS'],
                    wcs_tolerance=0.0):